@@ -0,0 +1,110 @@
+"""
+Microbenchmark for the per-request cost of ``Fastack.__call__``.
+
+Drives a trivial route directly through the ASGI interface (no server, no network)
+and compares plain FastAPI with Fastack (request context, lazy request objects).
+
+Usage:
+
+    $ python benchmarks/entry.py [requests]
+"""
+
+import asyncio
+import sys
+import time
+import tracemalloc
+from types import ModuleType
+
+from fastapi import FastAPI
+
+from fastack import create_app
+
+
+def make_settings(**options) -> ModuleType:
+    settings = ModuleType("settings")
+    settings.DEBUG = False
+    for name, value in options.items():
+        setattr(settings, name, value)
+    return settings
+
+
+def make_apps():
+    fastapi_app = FastAPI()
+    fastack_app = create_app(make_settings())
+    for app in (fastapi_app, fastack_app):
+
+        @app.get("/ping")
+        async def ping():
+            return {"ping": "pong"}
+
+    return {
+        "fastapi": fastapi_app,
+        "fastack": fastack_app,
+    }
+
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/ping",
+    "raw_path": b"/ping",
+    "root_path": "",
+    "query_string": b"",
+    "headers": [(b"host", b"testserver")],
+    "client": ("127.0.0.1", 12345),
+    "server": ("testserver", 80),
+}
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def run(app, n: int) -> float:
+    call = app.__call__
+    start = time.perf_counter()
+    for _ in range(n):
+        await call(dict(SCOPE), receive, send)
+    return time.perf_counter() - start
+
+
+async def measure_memory(app, n: int) -> float:
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        peak_total = 0
+        for _ in range(n):
+            await app(dict(SCOPE), receive, send)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - base
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+    finally:
+        tracemalloc.stop()
+    return peak_total / n
+
+
+async def main(n: int):
+    apps = make_apps()
+    # warm up
+    for app in apps.values():
+        await run(app, 200)
+
+    print(f"{'app':<24}{'us/req':>10}{'req/s':>12}{'peak KiB/req':>15}")
+    for name, app in apps.items():
+        elapsed = await run(app, n)
+        memory = await measure_memory(app, min(n, 500))
+        print(
+            f"{name:<24}{elapsed / n * 1e6:>10.2f}{n / elapsed:>12.0f}{memory / 1024:>15.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
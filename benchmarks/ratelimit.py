@@ -0,0 +1,90 @@
+"""
+Benchmark for the cost of the rate limit decisions.
+
+Measures ``RateLimiter.check`` with the in-process table (``BucketTable``) and the table
+shared by the workers (``SharedBucketTable``), with a growing number of client keys,
+then the requests per second of an application with and without the ``fastack.ratelimit`` plugin.
+
+Usage:
+
+    $ python benchmarks/ratelimit.py [requests]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import ModuleType
+
+from fastack import create_app
+from fastack.benchmark import make_scope, run_benchmark
+from fastack.ratelimit import BucketTable, RateLimiter, RateLimitRule, SharedBucketTable
+
+
+def make_settings(**options) -> ModuleType:
+    settings = ModuleType("settings")
+    settings.DEBUG = False
+    for name, value in options.items():
+        setattr(settings, name, value)
+    return settings
+
+
+def bench_check(limiter: RateLimiter, keys: int, n: int) -> float:
+    scopes = []
+    for idx in range(keys):
+        scope = make_scope("GET", "/ping")
+        scope["client"] = (f"10.{idx >> 16 & 255}.{idx >> 8 & 255}.{idx & 255}", 1000)
+        scopes.append(scope)
+
+    check = limiter.check
+    start = time.perf_counter()
+    for idx in range(n):
+        check(scopes[idx % keys])
+    return (time.perf_counter() - start) / n
+
+
+def make_apps():
+    plain_app = create_app(make_settings())
+    limited_app = create_app(
+        make_settings(
+            PLUGINS=["fastack.ratelimit"],
+            RATE_LIMITS=[{"path": "/", "rate": 1e9}],
+        )
+    )
+    for app in (plain_app, limited_app):
+
+        @app.get("/ping")
+        async def ping():
+            return {"ping": "pong"}
+
+    return {"no rate limit": plain_app, "fastack.ratelimit": limited_app}
+
+
+async def main(n: int):
+    rules = [RateLimitRule("/", 1e9)]
+    with tempfile.TemporaryDirectory() as tmp:
+        shared_table = SharedBucketTable(os.path.join(tmp, "ratelimit"))
+        tables = {"BucketTable": BucketTable(), "SharedBucketTable": shared_table}
+        print(f"{'table':<24}{'keys':>10}{'ns/check':>12}")
+        for name, table in tables.items():
+            limiter = RateLimiter(rules, table)
+            for keys in (1, 1000, 50000):
+                elapsed = bench_check(limiter, keys, max(n * 5, keys))
+                print(f"{name:<24}{keys:>10}{elapsed * 1e9:>12.0f}")
+        shared_table.close()
+
+    print()
+    print(f"{'app':<24}{'req/s':>10}{'p50 us':>10}{'p99 us':>10}")
+    for name, app in make_apps().items():
+        result = await run_benchmark(
+            app, [("GET", "/ping")], total=n, concurrency=10, memory_samples=0
+        )
+        print(
+            f"{name:<24}{result.rps:>10.0f}{result.percentile(50) * 1e6:>10.1f}"
+            f"{result.percentile(99) * 1e6:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,96 @@
+"""
+Benchmark for the middleware error path (e.g. floods of 401 responses).
+
+Every request is rejected by a middleware with ``HTTPException(401)``,
+the response is created by the application exception handler.
+It also compares the resolution of the exception handler with and without the cache.
+
+Usage:
+
+    $ python benchmarks/rejection.py [requests]
+"""
+
+import asyncio
+import sys
+import time
+from types import ModuleType
+
+from fastapi import HTTPException, Request
+
+from fastack import create_app
+from fastack.benchmark import run_benchmark
+from fastack.middleware.base import BaseMiddleware
+from fastack.utils import lookup_exception_handler
+
+
+def make_settings(**options) -> ModuleType:
+    settings = ModuleType("settings")
+    settings.DEBUG = False
+    for name, value in options.items():
+        setattr(settings, name, value)
+    return settings
+
+
+async def reject(request: Request):
+    if "Authorization" not in request.headers:
+        raise HTTPException(401, "Unauthorized")
+
+
+class AuthMiddleware(BaseMiddleware):
+    async def process_request(self, request: Request):
+        await reject(request)
+
+
+def make_apps():
+    hook_app = create_app(make_settings())
+    hook_app.middleware("request")(reject)
+
+    class_app = create_app(make_settings())
+    class_app.add_middleware(AuthMiddleware)
+
+    for app in (hook_app, class_app):
+
+        @app.get("/ping")
+        async def ping():
+            return {"ping": "pong"}
+
+    return {"function middleware": hook_app, "BaseMiddleware": class_app}
+
+
+def bench_lookup(app, n: int):
+    exc = HTTPException(401, "Unauthorized")
+    start = time.perf_counter()
+    for _ in range(n):
+        handler = lookup_exception_handler(app.exception_handlers, exc.status_code)
+        if handler is None:
+            lookup_exception_handler(app.exception_handlers, exc)
+    uncached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n):
+        app.lookup_exception_handler(exc)
+    cached = time.perf_counter() - start
+    return uncached, cached
+
+
+async def main(n: int):
+    print(f"{'middleware':<24}{'req/s':>10}{'p50 us':>10}{'p99 us':>10}{'errors':>8}")
+    for name, app in make_apps().items():
+        result = await run_benchmark(
+            app, [("GET", "/ping")], total=n, concurrency=10, memory_samples=0
+        )
+        print(
+            f"{name:<24}{result.rps:>10.0f}{result.percentile(50) * 1e6:>10.1f}"
+            f"{result.percentile(99) * 1e6:>10.1f}{result.errors:>8}"
+        )
+        assert result.status_codes == {401: n}, result.status_codes
+
+    app = create_app(make_settings())
+    uncached, cached = bench_lookup(app, n * 10)
+    print()
+    print(f"handler lookup (uncached): {uncached / (n * 10) * 1e9:.0f} ns")
+    print(f"handler lookup (cached):   {cached / (n * 10) * 1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,117 @@
+"""
+Benchmark of ``Controller.json`` and ``get_paginated_response`` with each JSON backend.
+
+Compares the default path (``JSONResponse``) with the backends selected by
+the ``JSON_BACKEND`` setting, on a list of pydantic models.
+It also compares ``jsonable_encoder`` with the compiled serializers
+(``fastack.serializers``) per item.
+
+Usage:
+
+    $ python benchmarks/serialization.py [items] [rounds]
+"""
+
+import datetime
+import sys
+import time
+import uuid
+from decimal import Decimal
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from fastack import ListController
+from fastack.encoders import json_response_class
+from fastack.serializers import Serializer
+
+
+class Tag(BaseModel):
+    name: str
+    created: datetime.datetime
+
+
+class Item(BaseModel):
+    id: uuid.UUID
+    name: str
+    price: Decimal
+    tags: List[Tag]
+    updated: datetime.datetime
+
+
+def make_items(n: int) -> List[Item]:
+    now = datetime.datetime(2022, 1, 1)
+    return [
+        Item(
+            id=uuid.UUID(int=idx),
+            name=f"item {idx}",
+            price=Decimal(idx) / 100,
+            tags=[Tag(name="tag", created=now)],
+            updated=now,
+        )
+        for idx in range(n)
+    ]
+
+
+def make_controller(response_class) -> ListController:
+    class ItemController(ListController):
+        json_response_class = response_class
+
+    return ItemController()
+
+
+def main(n: int, rounds: int):
+    items = make_items(n)
+    backends = {"JSONResponse": JSONResponse}
+    for backend in ("json", "orjson"):
+        try:
+            backends[backend] = json_response_class(backend)
+        except RuntimeError as e:
+            print(f"skip {backend}: {e}")
+
+    print(f"{n} items, {rounds} rounds")
+    print(f"{'backend':<20}{'json() ms':>12}{'paginated ms':>14}{'speedup':>10}")
+    baseline = None
+    for name, response_class in backends.items():
+        controller = make_controller(response_class)
+        # warm up (compiled serializers are shared by the backends)
+        controller.json("Items", items)
+        controller.get_paginated_response(items, 1, n)
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            controller.json("Items", items)
+        elapsed = (time.perf_counter() - start) / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            controller.get_paginated_response(items, 1, n)
+        paginated = (time.perf_counter() - start) / rounds
+
+        if baseline is None:
+            baseline = elapsed
+        print(
+            f"{name:<20}{elapsed * 1000:>12.2f}{paginated * 1000:>14.2f}"
+            f"{baseline / elapsed:>9.1f}x"
+        )
+
+    print()
+    print(f"{'encoder':<20}{'us/item':>12}")
+    serializer = Serializer()
+    for name, encode in (
+        ("jsonable_encoder", jsonable_encoder),
+        ("compiled", serializer.encode),
+    ):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            [encode(item) for item in items]
+        elapsed = (time.perf_counter() - start) / rounds / n
+        print(f"{name:<20}{elapsed * 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+    )
@@ -1,10 +1,12 @@
 from typing import List, Union
 
+import anyio
 import uvicorn  # type: ignore[import]
 from cookiecutter.main import cookiecutter  # type: ignore[import]
 from fastapi.routing import APIRoute, APIWebSocketRoute
 from typer import Argument, Context, Option, echo
 
+from .benchmark import BenchmarkResult, make_bare_app, parse_request, run_benchmark
 from .cli import Command
 from .decorators import enable_context
 from .globals import current_app
@@ -76,5 +78,97 @@ def routes():
         print(path_str)
 
 
+@fastack.command()
+@enable_context()
+def controllers():
+    """
+    List all controllers and their build time.
+    """
+
+    echo(f"{'controller':<30}{'prefix':<30}{'routes':>8}{'build (ms)':>12}")
+    for controller in current_app.controllers:
+        build_time = controller.build_time or 0.0
+        echo(
+            f"{controller.get_endpoint_name():<30}{controller.get_url_prefix():<30}"
+            f"{len(controller.get_route_table()):>8}{build_time * 1000:>12.3f}"
+        )
+
+
+def _print_result(name: str, result: BenchmarkResult):
+    peak_memory = "-"
+    if result.peak_memory is not None:
+        peak_memory = f"{result.peak_memory / 1024:.1f} KiB"
+
+    echo(
+        f"{name:<10}{result.rps:>12.1f}"
+        f"{result.percentile(50) * 1000:>10.2f}"
+        f"{result.percentile(95) * 1000:>10.2f}"
+        f"{result.percentile(99) * 1000:>10.2f}"
+        f"{peak_memory:>14}{result.errors:>8}"
+    )
+
+
+@fastack.command()
+def bench(
+    ctx: Context,
+    paths: List[str] = Argument(
+        ..., help='Routes to request in turn, e.g. "GET /user/1" or "/user"'
+    ),
+    requests: int = Option(1000, "-n", "--requests", help="Number of requests."),
+    concurrency: int = Option(
+        10, "-c", "--concurrency", help="Number of concurrent clients."
+    ),
+    headers: List[str] = Option(
+        [], "-H", "--header", help='Request header, e.g. "Authorization: Bearer xxx"'
+    ),
+    compare: bool = Option(
+        False, "--compare", help="Also run the routes on bare FastAPI."
+    ),
+):
+    """
+    Benchmark routes in-process through the ASGI interface.
+    """
+
+    app = ctx.obj
+    if not app:
+        echo("Can't find app")
+        ctx.exit()
+
+    targets = [parse_request(path) for path in paths]
+    request_headers = []
+    for header in headers:
+        name, _, value = header.partition(":")
+        request_headers.append((name.strip(), value.strip()))
+
+    apps = [("fastack", app)]
+    if compare:
+        apps.append(("fastapi", make_bare_app(app)))
+
+    echo(f"{requests} requests, concurrency {concurrency}")
+    echo(
+        f"{'app':<10}{'req/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'peak mem/req':>14}{'errors':>8}"
+    )
+    results = []
+    for name, target_app in apps:
+
+        async def execute():
+            return await run_benchmark(
+                target_app,
+                targets,
+                total=requests,
+                concurrency=concurrency,
+                headers=request_headers,
+            )
+
+        result = anyio.run(execute)
+        results.append(result)
+        _print_result(name, result)
+
+    if compare and results[1].rps:
+        overhead = (1 / results[0].rps - 1 / results[1].rps) * 1e6
+        echo(f"framework overhead: {overhead:.1f} us/request")
+
+
 if __name__ == "__main__":
     fastack()  # pragma: no cover
@@ -1,21 +1,46 @@
-from contextvars import Token
+from time import perf_counter_ns
 from types import ModuleType
-from typing import Any, Callable, Coroutine, Dict, List, Optional, Sequence, Type, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
 
-from fastapi import FastAPI, Request, WebSocket, params
+from fastapi import FastAPI, Request, params
 from fastapi.datastructures import Default
 from fastapi.params import Depends
 from fastapi.responses import JSONResponse, Response
 from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
 from starlette.middleware import Middleware
 from starlette.routing import BaseRoute
 from starlette.types import ASGIApp, Receive, Scope, Send
 from typer import Typer
 
-from .context import AppContext, _request_ctx_stack, _websocket_ctx_stack
+from .cache import CacheBackend, create_backend
+from .context import AppContext, RequestContext, _ctx_stack, bind_worker_app
 from .controller import Controller
+from .encoders import json_response_class
+from .executors import Executor, create_executors
 from .middleware import MiddlewareManager
-from .utils import import_attr
+from .middleware.profiler import ProfilerMiddleware
+from .offload import OffloadPolicy
+from .routing import APIRoute as FastackAPIRoute
+from .subrequests import create_batch_endpoint
+from .timing import Timings
+from .utils import import_attr, lookup_exception_handler
+
+if TYPE_CHECKING:
+    from .metrics import Metrics  # pragma: no cover
+    from .ratelimit import RateLimiter  # pragma: no cover
 
 
 class Fastack(FastAPI):
@@ -32,6 +57,36 @@ class Fastack(FastAPI):
 
     # Storage for all commands and will be added to the "fastack" command, so you can access it.
     cli = Typer()
+    # Bind the application to the worker when the lifespan starts,
+    # so ``current_app`` is available outside of requests (``BIND_WORKER_APP`` setting).
+    # It doesn't change the handling of requests, they always get their own context.
+    bind_to_worker: bool = False
+    # Record phase timings of requests (``SERVER_TIMING`` setting), see ``fastack.timing``.
+    server_timing: bool = False
+    server_timing_header: bool = True
+    timing_listeners: List[Callable[[Dict[str, Any]], Any]] = []
+    # Response class of ``Controller.json`` and paginated responses (``JSON_BACKEND`` setting).
+    json_response_class: Type[JSONResponse] = JSONResponse
+    # Serialization of large payloads outside of the event loop (``JSON_OFFLOAD_THRESHOLD`` setting).
+    json_offload: Optional[OffloadPolicy] = None
+    # Default backend of ``route(cache=...)``, see ``fastack.cache``.
+    response_cache: Optional[CacheBackend] = None
+    # Dedicated thread pools of sync responders (``EXECUTORS`` setting), see ``fastack.executors``.
+    executors: Dict[str, Executor] = {}
+    # Request metrics, set by the ``fastack.metrics`` plugin.
+    metrics: Optional["Metrics"] = None
+    # Rate limits, set by the ``fastack.ratelimit`` plugin.
+    rate_limiter: Optional["RateLimiter"] = None
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        # Resolved exception handlers, see ``lookup_exception_handler``
+        self.exception_handler_cache: Dict[
+            Tuple[type, Optional[int]], Optional[Callable]
+        ] = {}
+        # Controllers added with ``include_controller``
+        self.controllers: List[Controller] = []
+        super().__init__(*args, **kwargs)
+        self.router.route_class = FastackAPIRoute
 
     def set_settings(self, settings: ModuleType):
         """
@@ -42,6 +97,37 @@ class Fastack(FastAPI):
         """
 
         self.state.settings = settings
+        self.bind_to_worker = bool(self.get_setting("BIND_WORKER_APP", False))
+        self.server_timing = bool(self.get_setting("SERVER_TIMING", False))
+        self.server_timing_header = bool(self.get_setting("SERVER_TIMING_HEADER", True))
+        self.timing_listeners = [
+            import_attr(listener)
+            for listener in self.get_setting("SERVER_TIMING_LISTENERS", [])
+        ]
+        json_backend = self.get_setting("JSON_BACKEND")
+        if json_backend:
+            self.json_response_class = json_response_class(json_backend)
+        offload_threshold = self.get_setting("JSON_OFFLOAD_THRESHOLD")
+        if offload_threshold is not None:
+            self.json_offload = OffloadPolicy(
+                offload_threshold,
+                self.get_setting("JSON_OFFLOAD_EXECUTOR", "thread"),
+                self.get_setting("JSON_OFFLOAD_WORKERS"),
+            )
+            self.add_event_handler("shutdown", self.json_offload.shutdown)
+        self.response_cache = create_backend(self)
+        self.executors = create_executors(self.get_setting("EXECUTORS", {}))
+        for executor in self.executors.values():
+            self.add_event_handler("shutdown", executor.shutdown)
+        self.add_event_handler("startup", self.check_executors)
+        batch_path = self.get_setting("BATCH_REQUESTS_PATH")
+        if batch_path:
+            self.add_batch_route(
+                batch_path,
+                concurrency=self.get_setting("BATCH_REQUESTS_CONCURRENCY", 8),
+                max_requests=self.get_setting("BATCH_REQUESTS_MAX", 20),
+            )
+        self.middleware_stack = self.build_middleware_stack()
 
     def get_setting(self, name: str, default: Any = None):
         """
@@ -80,6 +166,33 @@ class Fastack(FastAPI):
             else:
                 self.cli.command(command.__name__)(command)
 
+    def add_batch_route(
+        self,
+        path: str = "/_batch",
+        *,
+        concurrency: int = 8,
+        max_requests: Optional[int] = 20,
+        include_in_schema: bool = True,
+    ):
+        """
+        Add a route that dispatches a batch of sub-requests through the application,
+        see ``fastack.subrequests``.
+
+        Args:
+            path (str): Path of the route.
+            concurrency (int): Maximum number of sub-requests of a batch processed at once.
+            max_requests (Optional[int]): Maximum number of sub-requests in a batch.
+            include_in_schema (bool): Include the route in the OpenAPI schema.
+        """
+
+        self.add_api_route(
+            path,
+            create_batch_endpoint(path, concurrency, max_requests),
+            methods=["POST"],
+            name="batch_requests",
+            include_in_schema=include_in_schema,
+        )
+
     def include_controller(
         self,
         controller: Controller,
@@ -94,7 +207,7 @@ class Fastack(FastAPI):
         redirect_slashes: bool = True,
         default: Optional[ASGIApp] = None,
         dependency_overrides_provider: Optional[Any] = None,
-        route_class: Type[APIRoute] = APIRoute,
+        route_class: Type[APIRoute] = FastackAPIRoute,
         on_startup: Optional[Sequence[Callable[[], Any]]] = None,
         on_shutdown: Optional[Sequence[Callable[[], Any]]] = None,
         deprecated: Optional[bool] = None,
@@ -129,39 +242,125 @@ class Fastack(FastAPI):
             deprecated=deprecated,
             include_in_schema=include_in_schema,
         )
+        self.check_executors(router.routes)
         self.include_router(router)
+        self.controllers.append(controller)
+        # Paths of the middlewares limited to the controller, see ``fastack.routing.PathScope``
+        controller.mount_prefixes += (router.prefix,)
+
+    def check_executors(self, routes: Optional[Sequence[BaseRoute]] = None):
+        """
+        Check that the executors of the routes are defined in the ``EXECUTORS`` setting.
+
+        Args:
+            routes (Optional[Sequence[BaseRoute]]): Routes to check, defaults to all routes.
+
+        Raises:
+            LookupError: If an executor is not defined.
+        """
+
+        for route in self.routes if routes is None else routes:
+            executor = getattr(route, "executor", None)
+            if executor is not None and executor not in self.executors:
+                raise LookupError(
+                    f"Executor {executor!r} of route {route.name!r} is not defined (EXECUTORS setting)"  # type: ignore[attr-defined]
+                )
+
+    def add_exception_handler(
+        self,
+        exc_class_or_status_code: Union[int, Type[Exception]],
+        handler: Callable,
+    ) -> None:
+        super().add_exception_handler(exc_class_or_status_code, handler)
+        self.exception_handler_cache.clear()
+
+    def lookup_exception_handler(self, exc: Exception) -> Optional[Callable]:
+        """
+        Get the exception handler for an exception, the handler for the status code
+        of an ``HTTPException`` takes precedence over the handler for the exception class.
+
+        The result is cached per exception class (and status code),
+        the cache is cleared when an exception handler is added.
+        """
+
+        status_code = exc.status_code if isinstance(exc, HTTPException) else None
+        key = (type(exc), status_code)
+        cache = self.exception_handler_cache
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+
+        handler = None
+        if status_code is not None:
+            handler = lookup_exception_handler(self.exception_handlers, status_code)
+        if handler is None:
+            handler = lookup_exception_handler(self.exception_handlers, exc)
+
+        cache[key] = handler
+        return handler
 
     @property
     def middleware(self) -> MiddlewareManager:  # type: ignore[override]
         return MiddlewareManager(self)
 
+    def build_middleware_stack(self) -> ASGIApp:
+        app = super().build_middleware_stack()
+        if getattr(self.state, "settings", None) is None:
+            return app
+
+        # The profiler must wrap the whole stack, so it can profile all middlewares.
+        if self.get_setting("PROFILER_ENABLED", False):
+            app = ProfilerMiddleware(
+                app,
+                output_dir=self.get_setting("PROFILER_OUTPUT_DIR", "profiles"),
+                format=self.get_setting("PROFILER_FORMAT", "pstats"),
+                sample_rate=self.get_setting("PROFILER_SAMPLE_RATE", 0.0),
+                secret=self.get_setting("PROFILER_SECRET"),
+                header=self.get_setting("PROFILER_HEADER", "X-Fastack-Profile"),
+            )
+
+        return app
+
+    def emit_timings(self, timings: Timings):
+        """
+        Send the structured record of request timings to listeners (``SERVER_TIMING_LISTENERS`` setting).
+        """
+
+        if not self.timing_listeners:
+            return
+
+        timings.finished = perf_counter_ns()
+        record = timings.to_dict()
+        for listener in self.timing_listeners:
+            listener(record)
+
     def app_context(self, with_lifespan: bool = True):
         return AppContext(self, with_lifespan=with_lifespan)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
-        req_token: Optional[Token] = None
-        ws_token: Optional[Token] = None
+        scope_type = scope["type"]
+        # If the scope is http or websocket we will add the connection to the context,
+        # so that it can be accessed via ``fastack.globals.request`` / ``fastack.globals.websocket``
+        if scope_type == "http" or scope_type == "websocket":
+            ctx = RequestContext(self, scope, receive, send)
+            ctx.started = perf_counter_ns()
+        else:
+            ctx = RequestContext(self)
+            if self.bind_to_worker:
+                bind_worker_app(self)
+
+        token = _ctx_stack.set(ctx)
         try:
-            async with self.app_context(with_lifespan=False):
-                scope_type = scope["type"]
-                # If the scope is http we will create a request instance object and add it to the global stack,
-                # so that it can be accessed via ``fastack.globals.request``
-                if scope_type == "http":
-                    request = Request(scope, receive)
-                    req_token = _request_ctx_stack.set(request)
-
-                # Same as above, but for websocket
-                elif scope_type == "websocket":
-                    websocket = WebSocket(scope, receive, send)
-                    ws_token = _websocket_ctx_stack.set(websocket)
-
-                await super().__call__(scope, receive, send)
+            await super().__call__(scope, receive, send)
         finally:
-            # Clean global stack, when app finish processing request
-            if req_token:
-                _request_ctx_stack.reset(req_token)
-            if ws_token:
-                _websocket_ctx_stack.reset(ws_token)
+            # Clean global context, when app finish processing request
+            _ctx_stack.reset(token)
+            if ctx.timings is not None:
+                self.emit_timings(ctx.timings)
+            ctx.clear()
+            if scope_type == "lifespan" and self.bind_to_worker:
+                bind_worker_app(None)
 
 
 def create_app(
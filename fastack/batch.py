@@ -0,0 +1,169 @@
+"""
+Batch responders of ``ModelController`` (``POST /batch``, ``PUT /batch`` and ``DELETE /batch``).
+
+A batch responder is added by ``Controller.build`` when the controller overrides the bulk hook
+of an operation. The hook receives all items of the request at once, so the data layer can
+handle them together (e.g. one ``INSERT`` for all rows):
+
+```python
+class UserController(ModelController):
+    def bulk_create(self, items: List[UserBody]):
+        return User.bulk_create(items)  # (1)
+
+    def bulk_update(self, items: List[BatchUpdateItem[UserBody]]):
+        ...
+
+    def bulk_destroy(self, ids: List[int]):
+        ...
+```
+
+1. One result per item: the object, a ``BatchResult`` or an ``HTTPException``.
+
+The items are validated in one pass from the annotation of the hook, before it's called.
+A batch responder has the options of its controller (``executor`` of sync hooks,
+``max_concurrency`` and ``priority``).
+The response has the status of each item:
+
+```json
+{
+    "detail": "Batch",
+    "data": [
+        {"status": 201, "detail": "Created", "data": {"id": 1, "name": "..."}},
+        {"status": 409, "detail": "Already exists", "data": null}
+    ]
+}
+```
+"""
+
+import asyncio
+import inspect
+from functools import partial
+from http import HTTPStatus
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+from fastapi import Body, HTTPException
+from fastapi.responses import Response
+from pydantic.generics import GenericModel
+from starlette.concurrency import run_in_threadpool
+
+from .executors import executor_endpoint
+
+if TYPE_CHECKING:
+    from .controller import Controller  # pragma: no cover
+
+T = TypeVar("T")
+
+# Operation -> (bulk hook, HTTP method, status of successful items)
+BATCH_OPERATIONS = {
+    "create": ("bulk_create", "POST", 201),
+    "update": ("bulk_update", "PUT", 200),
+    "destroy": ("bulk_destroy", "DELETE", 200),
+}
+
+
+class BatchUpdateItem(GenericModel, Generic[T]):
+    """
+    Item of a batch update, the ID of the object and its new data.
+    """
+
+    id: Union[int, str]
+    data: T
+
+
+class BatchResult(NamedTuple):
+    """
+    Result of an item, returned by the bulk hooks.
+    """
+
+    status: int
+    data: Any = None
+    detail: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        detail = self.detail
+        if detail is None:
+            try:
+                detail = HTTPStatus(self.status).phrase
+            except ValueError:
+                detail = ""
+        return {"status": self.status, "detail": detail, "data": self.data}
+
+
+def to_batch_result(result: Any, status: int) -> BatchResult:
+    """
+    Convert a value returned by a bulk hook to a ``BatchResult``.
+
+    Args:
+        result: ``BatchResult``, ``HTTPException`` or the data of a successful item.
+        status: Status of successful items.
+    """
+
+    if isinstance(result, BatchResult):
+        return result
+    if isinstance(result, HTTPException):
+        return BatchResult(result.status_code, detail=result.detail)
+    return BatchResult(status, result)
+
+
+def create_batch_endpoint(
+    controller: "Controller", operation: str, hook: Callable[..., Any]
+) -> Callable[..., Any]:
+    """
+    Create the responder of a batch operation from the bulk hook of a controller.
+    The body has the type of the first parameter of the hook.
+    """
+
+    _, _, status = BATCH_OPERATIONS[operation]
+    signature = inspect.signature(hook)
+    parameter = next(iter(signature.parameters.values()))
+    annotation = parameter.annotation
+    if annotation is inspect.Parameter.empty:
+        annotation = List[Any]
+
+    call = hook
+    if not asyncio.iscoroutinefunction(hook):
+        executor = getattr(hook, "__route_executor__", None) or controller.executor
+        if executor is None:
+            call = partial(run_in_threadpool, hook)
+        else:
+            call = executor_endpoint(hook, executor)
+
+    async def endpoint(items: Sequence[Any]) -> Response:
+        max_size = controller.batch_max_size
+        if max_size is not None and len(items) > max_size:
+            raise HTTPException(413, f"Batch is limited to {max_size} items")
+
+        results = list(await call(items))
+        assert len(results) == len(
+            items
+        ), f"{hook.__name__}() must return one result per item"
+        data = [to_batch_result(result, status).as_dict() for result in results]
+        return controller.json("Batch", data)
+
+    endpoint.__name__ = f"{operation}_batch"
+    # Options of the controller, see ``fastack.routing.APIRoute.get_controller``
+    endpoint.__controller__ = controller  # type: ignore[attr-defined]
+    endpoint.__doc__ = hook.__doc__
+    endpoint.__signature__ = inspect.Signature(  # type: ignore[attr-defined]
+        [
+            inspect.Parameter(
+                "items",
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                default=Body(...),
+                annotation=annotation,
+            )
+        ]
+    )
+    return endpoint
@@ -0,0 +1,253 @@
+import asyncio
+import math
+import time
+import tracemalloc
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from asgi_lifespan import LifespanManager
+from fastapi import FastAPI, routing
+from starlette.types import ASGIApp, Message, Scope
+
+BenchmarkRequest = Tuple[str, str]
+
+
+class BenchmarkResult(NamedTuple):
+    """
+    Result of ``run_benchmark``.
+
+    Attributes:
+        requests: Number of requests sent.
+        errors: Number of requests that failed (exception or 5xx status).
+        elapsed: Total time in seconds.
+        latencies: Sorted latency of each request in seconds.
+        peak_memory: Average peak of the memory allocated while handling a request, in bytes
+            (``tracemalloc`` peak, not a number of allocations).
+        status_codes: Number of responses per status code.
+    """
+
+    requests: int
+    errors: int
+    elapsed: float
+    latencies: List[float]
+    peak_memory: Optional[float]
+    status_codes: Dict[int, int]
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Get the latency percentile (nearest-rank) in seconds.
+
+        Args:
+            p: Percentile (0 - 100).
+        """
+
+        if not self.latencies:
+            return 0.0
+        rank = math.ceil(p / 100 * len(self.latencies))
+        idx = min(max(rank, 1), len(self.latencies)) - 1
+        return self.latencies[idx]
+
+
+def parse_request(value: str) -> BenchmarkRequest:
+    """
+    Parse a request definition like ``"GET /user/1"`` or ``"/user/1"``.
+    """
+
+    parts = value.split(None, 1)
+    if len(parts) == 1:
+        return "GET", parts[0]
+    return parts[0].upper(), parts[1]
+
+
+def make_scope(
+    method: str, path: str, headers: Optional[Sequence[Tuple[str, str]]] = None
+) -> Scope:
+    """
+    Create an HTTP scope for a request.
+    """
+
+    path, _, query = path.partition("?")
+    raw_headers = [(b"host", b"testserver")]
+    for name, value in headers or []:
+        raw_headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+
+
+async def send_request(app: ASGIApp, scope: Scope, body: bytes = b"") -> int:
+    """
+    Send a request directly through the ASGI interface.
+
+    Returns:
+        int: Response status code.
+    """
+
+    status = 0
+    request_complete = False
+    response_complete = asyncio.Event()
+
+    async def receive() -> Message:
+        nonlocal request_complete
+        if not request_complete:
+            request_complete = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get(
+            "more_body", False
+        ):
+            response_complete.set()
+
+    try:
+        await app(dict(scope), receive, send)
+    finally:
+        response_complete.set()
+    return status
+
+
+def make_bare_app(app: FastAPI) -> FastAPI:
+    """
+    Add the endpoints of an application to a bare ``FastAPI`` application (no middleware, no context),
+    to measure the framework overhead.
+
+    The endpoints get plain ``fastapi.routing.APIRoute`` routes, without the per-route features
+    of Fastack (timings, cache, executors, bulkheads, priorities and metrics).
+    Other routes (e.g. mounts) are reused as they are.
+
+    notes:
+        Routes that use ``fastack.globals`` will fail on the bare application.
+    """
+
+    bare = FastAPI(openapi_url=None, docs_url=None, redoc_url=None)
+    for route in app.routes:
+        if not isinstance(route, routing.APIRoute):
+            if route.path not in (app.openapi_url, app.docs_url, app.redoc_url):
+                bare.router.routes.append(route)
+            continue
+
+        bare.router.routes.append(
+            routing.APIRoute(
+                route.path,
+                route.endpoint,
+                response_model=route.response_model,
+                status_code=route.status_code,
+                dependencies=route.dependencies,
+                methods=route.methods,
+                name=route.name,
+                response_model_include=route.response_model_include,
+                response_model_exclude=route.response_model_exclude,
+                response_model_by_alias=route.response_model_by_alias,
+                response_model_exclude_unset=route.response_model_exclude_unset,
+                response_model_exclude_defaults=route.response_model_exclude_defaults,
+                response_model_exclude_none=route.response_model_exclude_none,
+                include_in_schema=route.include_in_schema,
+                response_class=route.response_class,
+                dependency_overrides_provider=route.dependency_overrides_provider,
+            )
+        )
+    return bare
+
+
+async def run_benchmark(
+    app: ASGIApp,
+    requests: Sequence[BenchmarkRequest],
+    *,
+    total: int = 1000,
+    concurrency: int = 10,
+    headers: Optional[Sequence[Tuple[str, str]]] = None,
+    warmup: int = 100,
+    memory_samples: int = 100,
+    lifespan: bool = True,
+) -> BenchmarkResult:
+    """
+    Drive the application directly through the ASGI interface (no server, no network).
+
+    Args:
+        app: ASGI application.
+        requests: List of ``(method, path)`` which are sent in turn.
+        total: Total number of requests.
+        concurrency: Number of concurrent clients.
+        headers: Headers to be sent with each request.
+        warmup: Number of requests sent before measuring.
+        memory_samples: Number of requests used to measure allocated memory (``0`` to skip).
+        lifespan: Run the application lifespan (startup/shutdown events).
+    """
+
+    assert requests, "At least one request is required"
+    scopes = [make_scope(method, path, headers) for method, path in requests]
+    latencies: List[float] = []
+    status_codes: Dict[int, int] = {}
+    errors = 0
+    counter = 0
+
+    async def call(idx: int) -> Tuple[int, float]:
+        start = time.perf_counter()
+        try:
+            status = await send_request(app, scopes[idx % len(scopes)])
+        except Exception:
+            status = 500
+        return status, time.perf_counter() - start
+
+    async def worker():
+        nonlocal counter, errors
+        while counter < total:
+            idx = counter
+            counter += 1
+            status, latency = await call(idx)
+            latencies.append(latency)
+            status_codes[status] = status_codes.get(status, 0) + 1
+            if status >= 500:
+                errors += 1
+
+    async def execute() -> BenchmarkResult:
+        for idx in range(warmup):
+            await call(idx)
+
+        peak_memory = None
+        if memory_samples > 0:
+            tracemalloc.start()
+            try:
+                peak_total = 0
+                for idx in range(memory_samples):
+                    tracemalloc.clear_traces()
+                    await call(idx)
+                    _, peak = tracemalloc.get_traced_memory()
+                    peak_total += peak
+            finally:
+                tracemalloc.stop()
+            peak_memory = peak_total / memory_samples
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(max(1, concurrency))])
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return BenchmarkResult(
+            total, errors, elapsed, latencies, peak_memory, status_codes
+        )
+
+    if lifespan:
+        async with LifespanManager(app):
+            return await execute()
+    return await execute()
@@ -0,0 +1,168 @@
+"""
+Concurrency limits (bulkheads) of controllers and routes.
+
+An expensive controller can use all the resources of a worker (connections of the database pool,
+threads, memory) and slow down unrelated endpoints. A bulkhead limits the number of requests
+processed at once, the excess requests wait in a bounded queue or are rejected right away:
+
+```python
+class ReportController(Controller):
+    max_concurrency = 4  # (1)
+    max_queue = 8  # (2)
+
+    def get(self):
+        ...
+
+    @route("/export", action=True, max_concurrency=1, max_queue=0)  # (3)
+    def export(self):
+        ...
+```
+
+1. Requests of all responders of the controller processed at once.
+2. Requests waiting for a slot, the next ones are rejected with ``503 Service Unavailable``.
+3. The responder has its own bulkhead, instead of the bulkhead of the controller.
+
+A slot is taken as soon as the route is matched (see ``fastack.routing.APIRoute``),
+so rejected requests are cheap. The statistics are available in ``Bulkhead.stats``
+and in the ``fastack.metrics`` plugin (``fastack_bulkhead_*``).
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+import anyio
+from fastapi import HTTPException
+
+from .utils import Stats, service_unavailable
+
+if TYPE_CHECKING:
+    from .app import Fastack  # pragma: no cover
+
+
+class BulkheadStats(Stats):
+    """
+    Statistics of a ``Bulkhead``.
+
+    Attributes:
+        admitted: Number of requests that got a slot.
+        rejected: Number of requests rejected because the queue was full.
+        timeouts: Number of requests rejected because they waited longer than ``queue_timeout``.
+        active: Number of requests being processed.
+        waiting: Number of requests waiting for a slot.
+    """
+
+    __slots__ = ("admitted", "rejected", "timeouts", "active", "waiting")
+
+    def __init__(self) -> None:
+        self.admitted = self.rejected = self.timeouts = 0
+        self.active = self.waiting = 0
+
+
+class Bulkhead:
+    """
+    Limit the number of requests processed at once, with a bounded wait queue.
+
+    Args:
+        name: Name of the bulkhead (controller or endpoint name), used in the metrics.
+        max_concurrency: Maximum number of requests processed at once.
+        max_queue: Maximum number of requests waiting for a slot, ``None`` for no limit.
+        queue_timeout: Maximum time (in seconds) a request waits for a slot, ``None`` for no limit.
+        retry_after: Value (in seconds) of the ``Retry-After`` header of rejected requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: Optional[int] = 0,
+        queue_timeout: Optional[float] = None,
+        retry_after: int = 1,
+    ) -> None:
+        assert max_concurrency > 0, "max_concurrency must be greater than 0"
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.stats = BulkheadStats()
+        self._semaphore = anyio.Semaphore(max_concurrency)
+
+    def reject(self) -> HTTPException:
+        return service_unavailable(self.retry_after)
+
+    async def acquire(self):
+        """
+        Wait for a slot.
+
+        Raises:
+            HTTPException: ``503`` if the queue is full or the wait times out.
+        """
+
+        stats = self.stats
+        try:
+            # The slot is taken without yielding, so ``active`` is always up to date
+            self._semaphore.acquire_nowait()
+        except anyio.WouldBlock:
+            if self.max_queue is not None and stats.waiting >= self.max_queue:
+                stats.rejected += 1
+                raise self.reject()
+
+            acquired = False
+            stats.waiting += 1
+            try:
+                with anyio.move_on_after(self.queue_timeout):
+                    await self._semaphore.acquire()
+                    acquired = True
+            finally:
+                stats.waiting -= 1
+
+            if not acquired:
+                stats.timeouts += 1
+                raise self.reject()
+
+        stats.active += 1
+        stats.admitted += 1
+
+    def release(self):
+        self.stats.active -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self) -> "Bulkhead":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        self.release()
+
+    @classmethod
+    def create(
+        cls, name: str, options: Union[None, int, Dict[str, Any]]
+    ) -> Optional["Bulkhead"]:
+        """
+        Create a bulkhead from the options of a controller or a route.
+
+        Args:
+            name: Name of the bulkhead.
+            options: ``max_concurrency`` or keyword arguments of ``Bulkhead``,
+                ``None`` for no limit.
+        """
+
+        if options is None:
+            return None
+        if isinstance(options, int):
+            options = {"max_concurrency": options}
+        if options.get("max_concurrency") is None:
+            return None
+        return cls(name, **options)
+
+
+def collect_bulkheads(app: "Fastack") -> List[Bulkhead]:
+    """
+    Get the bulkheads of the routes of an application.
+    """
+
+    bulkheads: Dict[int, Bulkhead] = {}
+    for route in app.routes:
+        bulkhead = getattr(route, "bulkhead", None)
+        if bulkhead is not None:
+            bulkheads[id(bulkhead)] = bulkhead
+    return list(bulkheads.values())
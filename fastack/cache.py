@@ -0,0 +1,388 @@
+"""
+Route-level response cache, enabled per endpoint with ``route(cache=...)``.
+
+The encoded body, status code and headers of successful ``GET`` responses are stored
+in a cache backend and sent again, without calling the responder, until they expire.
+The cache is read after the dependencies are resolved, so the dependencies of the route
+(e.g. authentication in ``Controller.middlewares``) still run on every request.
+
+```python
+from fastack.cache import CacheOptions
+from fastack.decorators import route
+
+class ProductController(ReadOnlyController):
+    @route(cache=30)  # (1)
+    def retrieve(self, id: int):
+        ...
+
+    @route(cache=CacheOptions(60, query_params=["page", "page_size"], headers=["Accept-Language"]))
+    def list(self, page: int = 1, page_size: int = 10):
+        ...
+```
+
+1. Cache for 30 seconds, the key is built from the path and query parameters.
+   Responses that depend on the user must add the header that identifies them to the key
+   (e.g. ``headers=["Authorization"]``).
+
+Settings of the default backend (``app.response_cache``):
+
+* ``RESPONSE_CACHE_BACKEND`` - Import path of a ``CacheBackend`` (instance or class),
+  default ``MemoryCache``.
+* ``RESPONSE_CACHE_MAX_ENTRIES`` - Maximum number of responses in the memory cache (default 1024).
+* ``RESPONSE_CACHE_MAX_SIZE`` - Maximum size in bytes of the memory cache (default 64 MiB).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlencode
+
+from fastapi.requests import Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from .etag import conditional_response
+from .utils import Stats, import_attr
+
+DEFAULT_TTL = 60.0
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# Headers that are specific to a response and never stored
+UNCACHED_HEADERS = (b"set-cookie", b"server-timing")
+
+
+class CachedResponse(NamedTuple):
+    """
+    Response stored in a cache backend.
+    """
+
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers)
+
+    def to_response(self) -> Response:
+        response = Response(status_code=self.status_code)
+        response.body = self.body
+        response.raw_headers = list(self.headers)
+        return response
+
+
+class CacheStats(Stats):
+    """
+    Statistics of a cache backend.
+
+    Attributes:
+        hits: Number of responses found in the cache.
+        misses: Number of responses not found (or expired).
+        evictions: Number of responses removed to free space (entries or size limit).
+        expired: Number of responses removed because their TTL has passed.
+    """
+
+    __slots__ = ("hits", "misses", "evictions", "expired")
+
+    def __init__(self) -> None:
+        self.hits = self.misses = self.evictions = self.expired = 0
+
+
+class CacheBackend:
+    """
+    Base class of response cache backends.
+    The methods are coroutines, so a backend can use a network service (e.g. Redis).
+    """
+
+    stats: CacheStats
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raise NotImplementedError  # pragma: no cover
+
+    async def set(self, key: str, value: CachedResponse, ttl: float):
+        raise NotImplementedError  # pragma: no cover
+
+    async def delete(self, key: str):
+        raise NotImplementedError  # pragma: no cover
+
+    async def clear(self):
+        raise NotImplementedError  # pragma: no cover
+
+
+class MemoryCache(CacheBackend):
+    """
+    In-memory LRU cache with a TTL per entry, bounded by the number of entries and their size.
+
+    Args:
+        max_entries: Maximum number of responses.
+        max_size: Maximum total size in bytes (body and headers), larger responses are not stored.
+    """
+
+    def __init__(
+        self, max_entries: int = DEFAULT_MAX_ENTRIES, max_size: int = DEFAULT_MAX_SIZE
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+        self.stats = CacheStats()
+        # key -> (expires, response), ordered from the least recently used
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expires, value = entry
+        if expires <= time.monotonic():
+            self._remove(key)
+            self.stats.expired += 1
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: CachedResponse, ttl: float):
+        size = value.size
+        if size > self.max_size:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        while self._entries and (
+            len(self._entries) >= self.max_entries or self.size + size > self.max_size
+        ):
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.size += size
+
+    async def delete(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    async def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self.size -= value.size
+
+
+class CacheOptions:
+    """
+    Cache options of an endpoint, see ``route(cache=...)``.
+
+    Args:
+        ttl: Time to live of the responses in seconds.
+        path_params: Path parameters used in the key, all by default.
+        query_params: Query parameters used in the key, all by default.
+        headers: Request headers used in the key (e.g. ``Accept-Language``), none by default.
+        backend: Cache backend, ``app.response_cache`` by default.
+        methods: Cached request methods.
+        status_codes: Cached response status codes.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        *,
+        path_params: Optional[Sequence[str]] = None,
+        query_params: Optional[Sequence[str]] = None,
+        headers: Sequence[str] = (),
+        backend: Optional[CacheBackend] = None,
+        methods: Sequence[str] = ("GET", "HEAD"),
+        status_codes: Sequence[int] = (200,),
+    ) -> None:
+        self.ttl = ttl
+        self.path_params = path_params
+        self.query_params = query_params
+        self.headers = [name.lower() for name in headers]
+        self.backend = backend
+        self.methods = set(methods)
+        self.status_codes = set(status_codes)
+
+    @classmethod
+    def create(
+        cls, cache: Union[None, bool, float, "CacheOptions"]
+    ) -> Optional["CacheOptions"]:
+        """
+        Create options from the value of ``route(cache=...)``:
+        ``True`` (default options), a TTL in seconds or ``CacheOptions``.
+        """
+
+        if cache is None or cache is False:
+            return None
+        if isinstance(cache, CacheOptions):
+            return cache
+        if cache is True:
+            return cls()
+        return cls(float(cache))
+
+    def make_key(self, name: str, request: Request) -> str:
+        """
+        Create the cache key of a request to the endpoint ``name``.
+        """
+
+        path_params = request.path_params
+        if self.path_params is None:
+            path_items = sorted(path_params.items())
+        else:
+            path_items = [(key, path_params.get(key)) for key in self.path_params]
+
+        query_params = request.query_params
+        if self.query_params is None:
+            query_items = sorted(query_params.multi_items())
+        else:
+            query_items = [
+                (key, value)
+                for key in self.query_params
+                for value in query_params.getlist(key)
+            ]
+
+        key = f"{name}:{urlencode(path_items)}?{urlencode(query_items)}"
+        if self.headers:
+            headers = request.headers
+            key += "#" + urlencode(
+                [(name, headers.get(name, "")) for name in self.headers]
+            )
+        return key
+
+    def is_cacheable(self, response: Response) -> bool:
+        if response.status_code not in self.status_codes:
+            return False
+        if isinstance(response, StreamingResponse):
+            return False
+        return not any(key == b"set-cookie" for key, _ in response.raw_headers)
+
+
+class CacheLookup:
+    """
+    Cache lookup of the current request, shared by ``cached_handler`` and ``cached_endpoint``.
+
+    Attributes:
+        backend: Cache backend.
+        key: Cache key of the request.
+        done: The dependencies were resolved and the cache was read.
+        hit: The response was found in the cache.
+    """
+
+    __slots__ = ("backend", "key", "done", "hit")
+
+    def __init__(self, backend: CacheBackend, key: str) -> None:
+        self.backend = backend
+        self.key = key
+        self.done = self.hit = False
+
+
+_current_lookup: ContextVar[Optional[CacheLookup]] = ContextVar(
+    "_current_lookup", default=None
+)
+
+
+def cached_endpoint(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap an endpoint to read the cache, it's called after the dependencies are resolved.
+    A sync endpoint is called in the threadpool on a miss.
+    """
+
+    is_coroutine = asyncio.iscoroutinefunction(func)
+
+    async def endpoint(*args: Any, **kwds: Any) -> Any:
+        lookup = _current_lookup.get()
+        if lookup is not None:
+            lookup.done = True
+            cached = await lookup.backend.get(lookup.key)
+            if cached is not None:
+                lookup.hit = True
+                return cached.to_response()
+
+        if is_coroutine:
+            return await func(*args, **kwds)
+        return await run_in_threadpool(func, *args, **kwds)
+
+    endpoint.__name__ = getattr(func, "__name__", "endpoint")
+    endpoint.__doc__ = func.__doc__
+    return endpoint
+
+
+def cached_handler(
+    handler: Callable[[Request], Awaitable[Response]],
+    options: CacheOptions,
+    name: str,
+) -> Callable[[Request], Awaitable[Response]]:
+    """
+    Wrap a route handler to cache its responses, the endpoint must be wrapped with ``cached_endpoint``.
+    """
+
+    async def app(request: Request) -> Response:
+        backend = options.backend or getattr(request.app, "response_cache", None)
+        if backend is None or request.method not in options.methods:
+            return await handler(request)
+
+        lookup = CacheLookup(backend, options.make_key(name, request))
+        token = _current_lookup.set(lookup)
+        try:
+            response = await handler(request)
+        finally:
+            _current_lookup.reset(token)
+
+        if lookup.hit:
+            return conditional_response(response, request.scope)
+
+        key = lookup.key
+        if lookup.done and options.is_cacheable(response):
+            render_body = getattr(response, "render_body", None)
+            if render_body is not None:
+                # e.g. an offloaded response, see ``fastack.offload``
+                await render_body()
+
+            headers = [h for h in response.raw_headers if h[0] not in UNCACHED_HEADERS]
+            value = CachedResponse(response.status_code, headers, response.body)
+            await backend.set(key, value, options.ttl)
+        return response
+
+    return app
+
+
+def create_backend(app: Any) -> CacheBackend:
+    """
+    Create the default response cache backend of an application from its settings.
+    """
+
+    backend: Any = app.get_setting("RESPONSE_CACHE_BACKEND")
+    if backend is None:
+        return MemoryCache(
+            app.get_setting("RESPONSE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+            app.get_setting("RESPONSE_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE),
+        )
+
+    if isinstance(backend, str):
+        backend = import_attr(backend)
+    if isinstance(backend, type):
+        backend = backend()
+
+    assert isinstance(backend, CacheBackend), f"{backend!r} is not a cache backend"
+    return backend
@@ -36,3 +36,10 @@ METHOD_ENDPOINTS: Dict[str, str] = {
     APIEndpoint.UPDATE.value: "PUT",
     APIEndpoint.DESTROY.value: "DELETE",
 }
+
+# Priorities of routes for load shedding (see ``fastack.middleware.shedding``),
+# requests of the lowest priorities are shed first and ``PRIORITY_CRITICAL`` is never shed.
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+PRIORITY_CRITICAL = 3
@@ -4,13 +4,187 @@ from types import TracebackType
 
 from asgi_lifespan import LifespanManager
 from fastapi import Request, WebSocket
+from starlette.types import Receive, Scope, Send
 
 if t.TYPE_CHECKING:
     from .app import Fastack  # pragma: no cover
+    from .timing import Timings  # pragma: no cover
 
-_app_ctx_stack: ContextVar["Fastack"] = ContextVar("_app_ctx_stack")
-_request_ctx_stack: ContextVar[Request] = ContextVar("_request_ctx_stack")
-_websocket_ctx_stack: ContextVar[WebSocket] = ContextVar("_websocket_ctx_stack")
+_sentinel = object()
+
+
+class RequestGlobals:
+    """
+    Request-local namespace, available as ``fastack.globals.g``.
+    Use it to store values computed once per request (e.g. the current user).
+
+    Example:
+
+    ```python
+    from fastack.globals import g
+
+    def get_current_user():
+        if "user" not in g:
+            g.user = User.get(request.headers["X-User-Id"])
+        return g.user
+    ```
+    """
+
+    def get(self, name: str, default: t.Any = None) -> t.Any:
+        """
+        Get an attribute by name, or a default value.
+        """
+
+        return self.__dict__.get(name, default)
+
+    def pop(self, name: str, default: t.Any = _sentinel) -> t.Any:
+        """
+        Get and remove an attribute by name.
+        """
+
+        if default is _sentinel:
+            return self.__dict__.pop(name)
+        return self.__dict__.pop(name, default)
+
+    def setdefault(self, name: str, default: t.Any = None) -> t.Any:
+        """
+        Get the value of an attribute if it is present, otherwise set and return a default value.
+        """
+
+        return self.__dict__.setdefault(name, default)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__dict__
+
+    def __iter__(self) -> t.Iterator[str]:
+        return iter(self.__dict__)
+
+    def __repr__(self) -> str:
+        return f"<RequestGlobals {self.__dict__!r}>"
+
+
+class RequestContext:
+    """
+    Holds everything that belongs to the current context: the application,
+    the ASGI connection and the request-local namespace (``g``).
+
+    The ``Request`` / ``WebSocket`` object, ``g`` and the ``cache`` used by
+    ``fastack.decorators.request_cached`` are only created on first access.
+    An application context (e.g. in commands) is a ``RequestContext`` without a connection.
+
+    Args:
+        app: Application instance.
+        scope: ASGI scope.
+        receive: ASGI receive channel.
+        send: ASGI send channel.
+    """
+
+    __slots__ = (
+        "app",
+        "scope",
+        "receive",
+        "send",
+        "started",
+        "handler_started",
+        "timings",
+        "_connection",
+        "_g",
+        "_cache",
+    )
+
+    def __init__(
+        self,
+        app: "Fastack",
+        scope: t.Optional[Scope] = None,
+        receive: t.Optional[Receive] = None,
+        send: t.Optional[Send] = None,
+    ) -> None:
+        self.app = app
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        # Time of the ASGI entry (``time.perf_counter_ns``) and phase timings, see ``fastack.timing``
+        self.started = 0
+        # Start of the route handler (``time.perf_counter_ns``), 0 until the handler is called
+        self.handler_started = 0
+        self.timings: t.Optional["Timings"] = None
+        self._connection: t.Union[Request, WebSocket, None] = None
+        self._g: t.Optional[RequestGlobals] = None
+        self._cache: t.Optional[t.Dict[t.Any, t.Dict[t.Any, t.Any]]] = None
+
+    @property
+    def scope_type(self) -> t.Optional[str]:
+        scope = self.scope
+        if scope is None:
+            return None
+        return scope["type"]
+
+    @property
+    def request(self) -> Request:
+        conn = self._connection
+        if conn is None:
+            if self.scope_type != "http":
+                raise RuntimeError("Working outside of request context.")
+            conn = self._connection = Request(self.scope, self.receive, self.send)  # type: ignore[arg-type]
+        return conn  # type: ignore[return-value]
+
+    @property
+    def websocket(self) -> WebSocket:
+        conn = self._connection
+        if conn is None:
+            if self.scope_type != "websocket":
+                raise RuntimeError("Working outside of websocket context.")
+            conn = self._connection = WebSocket(self.scope, self.receive, self.send)  # type: ignore[arg-type]
+        return conn  # type: ignore[return-value]
+
+    @property
+    def g(self) -> RequestGlobals:
+        g = self._g
+        if g is None:
+            g = self._g = RequestGlobals()
+        return g
+
+    @property
+    def cache(self) -> t.Dict[t.Any, t.Dict[t.Any, t.Any]]:
+        cache = self._cache
+        if cache is None:
+            cache = self._cache = {}
+        return cache
+
+    def clear(self):
+        """
+        Drop request-local values (``g`` and the ``request_cached`` results).
+        """
+
+        self._g = None
+        self._cache = None
+
+
+_ctx_stack: ContextVar[RequestContext] = ContextVar("_ctx_stack")
+
+# Application bound for the whole worker lifetime (see ``BIND_WORKER_APP`` setting).
+# Used when no context has been pushed.
+_worker_app: t.Optional["Fastack"] = None
+
+
+def bind_worker_app(app: t.Optional["Fastack"]):
+    """
+    Bind the application to the current worker process.
+
+    Args:
+        app: Application instance, ``None`` to unbind.
+    """
+
+    global _worker_app
+    _worker_app = app
+
+
+def get_worker_app() -> t.Optional["Fastack"]:
+    """
+    Get the application bound to the current worker process.
+    """
+
+    return _worker_app
 
 
 class AppContext:
@@ -24,11 +198,11 @@ class AppContext:
         if self._token:
             return
 
-        self._token = _app_ctx_stack.set(self.app)
+        self._token = _ctx_stack.set(RequestContext(self.app))
 
     def pop(self):
         if self._token:
-            _app_ctx_stack.reset(self._token)
+            _ctx_stack.reset(self._token)
 
     async def __aenter__(self):
         if self.with_lifespan:
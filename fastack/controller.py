@@ -1,20 +1,120 @@
-from types import MethodType
-from typing import Any, Callable, Dict, List, Optional, Sequence, Type, Union
+from inspect import getattr_static
+from time import perf_counter, perf_counter_ns
+from types import FunctionType, MethodType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
 
 from fastapi import APIRouter, Query, params
 from fastapi.datastructures import Default
-from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse, Response
 from fastapi.routing import APIRoute
 from pydantic import BaseModel
 from starlette.routing import BaseRoute
 from starlette.types import ASGIApp
 
+from .batch import BATCH_OPERATIONS, BatchUpdateItem, create_batch_endpoint
+from .bulkhead import Bulkhead
 from .constants import HTTP_METHODS, MAPPING_ENDPOINTS, METHOD_ENDPOINTS
+from .context import _ctx_stack
+from .encoders import FastJSONResponse, get_renderer
+from .etag import (
+    apply_etag,
+    etag_matches,
+    format_etag,
+    get_if_none_match,
+    not_modified_response,
+)
 from .mixins import ListControllerMixin
+from .offload import OffloadedJSONResponse, OffloadPolicy, estimate_cost, render_json
+from .routing import APIRoute as FastackAPIRoute
+from .serializers import get_serializer
+from .timing import current_timings
 from .utils import url_for
 
 
+class RouteInfo(NamedTuple):
+    """
+    Responder of a controller, see ``Controller.__route_table__``.
+
+    Attributes:
+        method_name: Name of the method.
+        http_method: HTTP method, ``None`` for actions without an HTTP method.
+        name: Name of the route (without the controller name).
+        path: Path of the route, ``None`` to use the default path.
+        params: Other parameters for ``APIRouter.add_api_route``.
+    """
+
+    method_name: str
+    http_method: Optional[str]
+    name: str
+    path: Optional[str]
+    params: Dict[str, Any]
+
+
+def compute_route_table(
+    controller: Union[Type["Controller"], "Controller"]
+) -> Tuple[RouteInfo, ...]:
+    """
+    Find the responders of a controller class, or of an instance.
+
+    For a class, the methods (and class methods) are found without binding them and the HTTP methods
+    come from ``method_endpoints``. For an instance, the bound methods (including the ones set on
+    the instance) are found and the HTTP methods come from ``get_http_method``.
+    """
+
+    is_class = isinstance(controller, type)
+    table = []
+    for method_name in dir(controller):
+        # skip if it's not a method, valid methods shouldn't be prefixed with _
+        if method_name.startswith("_"):
+            continue
+
+        if is_class:
+            if not isinstance(
+                getattr_static(controller, method_name), (FunctionType, classmethod)
+            ):
+                continue
+            func = getattr(controller, method_name)
+        else:
+            func = getattr(controller, method_name)
+            if not isinstance(func, MethodType):
+                continue
+
+        http_method: Optional[str] = method_name.upper()
+        if http_method not in HTTP_METHODS:
+            if is_class:
+                http_method = controller.method_endpoints.get(method_name) or None  # type: ignore[union-attr]
+            else:
+                http_method = controller.get_http_method(method_name)  # type: ignore[union-attr]
+
+        # Checks if a method has an HTTP method.
+        # Also, if no HTTP method is found there is another option to add the method to the router.
+        # Just need to mark method using ``fastack.decorators.route()`` decorator with ``action=True`` parameter.
+        is_action = getattr(func, "__route_action__", False)
+        if not (http_method or is_action):
+            continue
+
+        params = dict(getattr(func, "__route_params__", None) or {})
+        if not params.get("methods", None):
+            params["methods"] = [http_method]
+
+        name = params.pop("name", None) or method_name
+        path = params.pop("path", None) or None
+        table.append(RouteInfo(method_name, http_method, name, path, params))
+
+    return tuple(table)
+
+
 class Controller:
     """
     Base Controller for creating REST APIs.
@@ -57,7 +157,27 @@ class Controller:
         method_endpoints: Mapping to get default HTTP method.
         middlewares: List of middlewares (dependencies) to be applied to all routes.
         json_response_class: Class to be used for JSON responses.
-
+            If not provided, ``Fastack.json_response_class`` will be used (see ``JSON_BACKEND`` setting).
+        build_time: Time (in seconds) of the last ``build()``.
+        etag: Add an ``ETag`` computed from the body to JSON responses (see ``fastack.etag``),
+            requests with a matching ``If-None-Match`` header get a ``304 Not Modified`` response.
+        batch_path: Path of the batch responders (see ``fastack.batch``).
+        batch_max_size: Maximum number of items in a batch request, ``None`` for no limit.
+        executor: Name of the executor of the sync responders (see ``fastack.executors``),
+            ``None`` for the default threadpool.
+        max_concurrency: Maximum number of requests of the controller processed at once
+            (see ``fastack.bulkhead``), ``None`` for no limit.
+        max_queue: Maximum number of requests waiting when ``max_concurrency`` is reached,
+            the next ones are rejected with ``503``. ``None`` for no limit.
+        bulkhead: Bulkhead shared by the routes of the controller, created by ``build()``.
+        priority: Load shedding priority of the routes (see ``fastack.middleware.shedding``),
+            ``None`` for ``PRIORITY_NORMAL``.
+        mount_prefixes: URL prefixes where the controller is included, set by ``Fastack.include_controller``.
+
+    The responders are found once when the class is created (``__route_table__``),
+    so ``build()`` only binds them to the instance. The instance is scanned again
+    if the class overrides ``get_http_method``, or if the instance has its own
+    ``method_endpoints`` or methods, see ``get_route_table``.
     """
 
     name: Optional[str] = None
@@ -65,7 +185,22 @@ class Controller:
     mapping_endpoints: Dict[str, str] = MAPPING_ENDPOINTS
     method_endpoints: Dict[str, str] = METHOD_ENDPOINTS
     middlewares: Optional[Sequence[params.Depends]] = []
-    json_response_class: Type[JSONResponse] = JSONResponse
+    json_response_class: Optional[Type[JSONResponse]] = None
+    build_time: Optional[float] = None
+    etag: bool = False
+    batch_path: str = "/batch"
+    batch_max_size: Optional[int] = 1000
+    executor: Optional[str] = None
+    max_concurrency: Optional[int] = None
+    max_queue: Optional[int] = 0
+    bulkhead: Optional[Bulkhead] = None
+    priority: Optional[int] = None
+    mount_prefixes: Tuple[str, ...] = ()
+    __route_table__: Tuple[RouteInfo, ...] = ()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.__route_table__ = compute_route_table(cls)
 
     def get_endpoint_name(self) -> str:
         """
@@ -147,6 +282,24 @@ class Controller:
         """
         return self.method_endpoints.get(method) or None
 
+    def get_route_table(self) -> Tuple[RouteInfo, ...]:
+        """
+        Get the responders of the controller.
+
+        The table of the class is used, unless ``get_http_method`` is overridden
+        or the instance has its own ``method_endpoints`` or methods.
+        """
+
+        cls = type(self)
+        attrs = vars(self)
+        if (
+            cls.get_http_method is Controller.get_http_method
+            and "method_endpoints" not in attrs
+            and not any(isinstance(value, MethodType) for value in attrs.values())
+        ):
+            return cls.__route_table__
+        return compute_route_table(self)
+
     def join_endpoint_name(self, name: str) -> str:
         """
         Join endpoint name with controller name.
@@ -170,7 +323,7 @@ class Controller:
         redirect_slashes: bool = True,
         default: Optional[ASGIApp] = None,
         dependency_overrides_provider: Optional[Any] = None,
-        route_class: Type[APIRoute] = APIRoute,
+        route_class: Type[APIRoute] = FastackAPIRoute,
         on_startup: Optional[Sequence[Callable[[], Any]]] = None,
         on_shutdown: Optional[Sequence[Callable[[], Any]]] = None,
         deprecated: Optional[bool] = None,
@@ -180,7 +333,9 @@ class Controller:
         Makes all APIs in controllers into a router (APIRouter)
         """
 
+        start = perf_counter()
         endpoint_name = self.get_endpoint_name()
+        self.bulkhead = self.create_bulkhead()
         tag_name = endpoint_name.replace("-", " ").title()
         if not tags:
             tags = [tag_name]
@@ -209,42 +364,56 @@ class Controller:
             deprecated=deprecated,
             include_in_schema=include_in_schema,
         )
-        for method_name in dir(self):
-            func = getattr(self, method_name)
-            # skip if it's not a method, valid methods shouldn't be prefixed with _
-            if method_name.startswith("_") or not isinstance(func, MethodType):
-                continue
-
-            http_method: Optional[str] = method_name.upper()
-            if http_method not in HTTP_METHODS:
-                http_method = self.get_http_method(method_name)
-
-            # Checks if a method has an HTTP method.
-            # Also, if no HTTP method is found there is another option to add the method to the router.
-            # Just need to mark method using ``fastack.decorators.route()`` decorator with ``action=True`` parameter.
-            is_action = getattr(func, "__route_action__", False)
-            if http_method or is_action:
-                # To generate an absolute path, using request.url_for(...)
-                summary = f"{endpoint_name} {method_name.replace('_', ' ').title()}"
-                default_path = self.get_path(method_name)
-                params = getattr(func, "__route_params__", None) or {}
-                if not params.get("methods", None):
-                    params["methods"] = [http_method]
-
-                name = params.pop("name", None)
-                if not name:
-                    name = method_name
+        # Batch responders first, so ``/batch`` isn't matched by ``/{id}``
+        for operation, http_method, hook in self.get_batch_hooks():
+            name = f"{operation}_batch"
+            router.add_api_route(
+                self.batch_path,
+                create_batch_endpoint(self, operation, hook),
+                methods=[http_method],
+                name=self.join_endpoint_name(name),
+                summary=f"{endpoint_name} {name.replace('_', ' ').title()}",
+            )
+
+        for info in self.get_route_table():
+            func = getattr(self, info.method_name)
+            params = dict(info.params)
+            # To generate an absolute path, using request.url_for(...)
+            params["name"] = self.join_endpoint_name(info.name)
+            if not params.get("summary", None):
+                summary = info.method_name.replace("_", " ").title()
+                params["summary"] = f"{endpoint_name} {summary}"
+
+            # if no path is provided, use the default path
+            path = info.path or self.get_path(info.method_name)
+            router.add_api_route(path, func, **params)
+
+        self.build_time = perf_counter() - start
+        return router
 
-                params["name"] = self.join_endpoint_name(name)
+    def create_bulkhead(self) -> Optional[Bulkhead]:
+        """
+        Create the bulkhead shared by the routes of the controller,
+        override it to set other options of ``Bulkhead`` (e.g. ``queue_timeout``).
+        """
 
-                if not params.get("summary", None):
-                    params["summary"] = summary
+        return Bulkhead.create(
+            self.get_endpoint_name(),
+            {"max_concurrency": self.max_concurrency, "max_queue": self.max_queue},
+        )
 
-                # if no path is provided, use the default path
-                path = params.pop("path", None) or default_path
-                router.add_api_route(path, func, **params)
+    def get_batch_hooks(self) -> List[Tuple[str, str, Callable[..., Any]]]:
+        """
+        Get the bulk hooks implemented by the controller, as ``(operation, HTTP method, hook)``.
+        """
 
-        return router
+        hooks = []
+        for operation, (hook_name, http_method, _) in BATCH_OPERATIONS.items():
+            func = getattr(type(self), hook_name, None)
+            if func is None or func in _BATCH_STUBS:
+                continue
+            hooks.append((operation, http_method, getattr(self, hook_name)))
+        return hooks
 
     def serialize_data(self, obj: Any) -> Any:
         """
@@ -257,6 +426,142 @@ class Controller:
             obj = func()
         return obj
 
+    def get_json_response_class(self) -> Type[JSONResponse]:
+        """
+        Get the class to be used for JSON responses.
+        """
+
+        if self.json_response_class is not None:
+            return self.json_response_class
+
+        ctx = _ctx_stack.get(None)
+        if ctx is None:
+            return JSONResponse
+        return ctx.app.json_response_class
+
+    def get_encoder(
+        self, response_class: Optional[Type[JSONResponse]] = None
+    ) -> Callable[[Any], Any]:
+        """
+        Get a function that serializes an object (see ``serialize_data``) and converts it
+        to JSON compatible types for the response class, using the compiled serializers
+        from ``fastack.serializers``.
+
+        Responses rendered by a native JSON backend (``fastack.encoders.JSONBackend.native``)
+        encode values like datetimes or UUIDs by themselves, so they are kept as is.
+        """
+
+        if response_class is None:
+            response_class = self.get_json_response_class()
+
+        serializer = get_serializer(
+            native=issubclass(response_class, FastJSONResponse)
+            and response_class.backend.native
+        )
+        if type(self).serialize_data is Controller.serialize_data:
+            # ``serialize()`` is called by the compiled serializer
+            return serializer.encode
+
+        serialize_data = self.serialize_data
+        encode = serializer.encode
+        return lambda obj: encode(serialize_data(obj))
+
+    def encode_data(
+        self, data: Any, response_class: Optional[Type[JSONResponse]] = None
+    ) -> Any:
+        """
+        Serialize data and convert it to JSON compatible types for the response class, see ``get_encoder``.
+        """
+
+        return self.get_encoder(response_class)(data)
+
+    def get_serialization_cost(self, data: Any) -> int:
+        """
+        Estimate the cost of serializing data, payloads whose cost reaches
+        the ``JSON_OFFLOAD_THRESHOLD`` setting are serialized outside of the event loop.
+        See ``fastack.offload``.
+        """
+
+        return estimate_cost(data)
+
+    def get_offload_policy(self) -> Optional[OffloadPolicy]:
+        ctx = _ctx_stack.get(None)
+        if ctx is None:
+            return None
+        return getattr(ctx.app, "json_offload", None)
+
+    def resolve_etag(
+        self, etag: Union[None, bool, str], status: int = 200
+    ) -> Union[bool, str]:
+        """
+        Get the ETag option of a response: ``True`` to compute it from the body,
+        a quoted ETag from a version token or ``False``.
+        """
+
+        if etag is None:
+            etag = self.etag
+        if not etag or status != 200:
+            return False
+        if etag is True:
+            return True
+        return format_etag(etag)
+
+    def not_modified(self, version: Any) -> Optional[Response]:
+        """
+        Return a ``304 Not Modified`` response if the ``If-None-Match`` header of the request
+        matches the version token (e.g. ``updated_at`` of a row), otherwise ``None``.
+        Call it before loading the data to skip the work for clients that are up to date.
+
+        ```python
+        def retrieve(self, id: int):
+            version = Product.get_version(id)
+            response = self.not_modified(version)
+            if response is not None:
+                return response
+
+            return self.json("Product", Product.get(id), etag=version)
+        ```
+        """
+
+        etag = format_etag(version)
+        if etag_matches(etag, get_if_none_match()):
+            return not_modified_response(Response(headers={"ETag": etag}))
+        return None
+
+    def offload_json(
+        self,
+        policy: OffloadPolicy,
+        response_class: Type[JSONResponse],
+        content: Dict[str, Any],
+        **kwargs: Any,
+    ) -> JSONResponse:
+        """
+        Create a response whose content is serialized in the pool of the offload policy when it's sent.
+        """
+
+        native = issubclass(response_class, FastJSONResponse)
+        if policy.executor == "process" and (
+            type(self).serialize_data is Controller.serialize_data
+            and (native or response_class is JSONResponse)
+        ):
+            # Nothing depends on the controller, the content is encoded here
+            # (errors are raised by the responder) and only JSON types are sent to a process.
+            backend = response_class.backend if native else FastJSONResponse.backend  # type: ignore[attr-defined]
+            content = self.get_encoder(response_class)(content)
+            return OffloadedJSONResponse(
+                render_json, (content, backend), policy, process=True, **kwargs
+            )
+
+        encode = self.get_encoder(response_class)
+        render = get_renderer(response_class)
+
+        def render_content() -> bytes:
+            if "data" in content:
+                content["data"] = encode(content["data"])
+            return render(content)
+
+        return OffloadedJSONResponse(render_content, (), policy, **kwargs)
+
     def json(
         self,
         detail: str,
@@ -265,6 +570,7 @@ class Controller:
         status: int = 200,
         headers: Optional[dict] = None,
         allow_empty: bool = True,
+        etag: Union[None, bool, str] = None,
         **kwargs: Any,
     ) -> JSONResponse:
         """
@@ -284,17 +590,54 @@ class Controller:
             status: HTTP status code.
             headers: HTTP headers.
             allow_empty: Allows blank data to be shown to frontend.
+            etag: ``True`` to add an ETag computed from the body, or a version token of the data.
+                If not provided, ``Controller.etag`` is used. See ``not_modified``.
             **kwargs (optional): Additional arguments to be passed to the JSONResponse.
         """
 
+        etag = self.resolve_etag(etag, status)
+        if isinstance(etag, str):
+            # the version is known, there is nothing to serialize for clients that are up to date
+            not_modified = self.not_modified(etag)
+            if not_modified is not None:
+                return not_modified  # type: ignore[return-value]
+            headers = {**(headers or {}), "ETag": etag}
+
+        response_class = self.get_json_response_class()
+        policy = self.get_offload_policy()
+        if policy is not None and policy.should_offload(
+            self.get_serialization_cost(data)
+        ):
+            content = {"detail": detail}
+            if data or allow_empty:
+                content["data"] = data  # type: ignore[assignment]
+            return self.offload_json(
+                policy,
+                response_class,
+                content,
+                status_code=status,
+                headers=headers,
+                etag=etag is True,
+                **kwargs,
+            )
+
+        timings = current_timings()
+        start = perf_counter_ns() if timings is not None else 0
         content = {"detail": detail}
         if data or allow_empty:
-            data = self.serialize_data(data)
-            content["data"] = jsonable_encoder(data)
+            content["data"] = self.encode_data(data, response_class)
+
+        if timings is not None:
+            start = timings.add_encode(start)
 
-        return self.json_response_class(
+        response = response_class(
             content, status_code=status, headers=headers, **kwargs
         )
+        if timings is not None:
+            timings.add_render(start)
+        if etag is True:
+            response = apply_etag(response)  # type: ignore[assignment]
+        return response
 
 
 class RetrieveController(Controller):
@@ -316,6 +659,8 @@ class ListController(Controller, ListControllerMixin):
 
     Attributes:
         pagination_class: Class to be used for pagination.
+        stream_chunk_size: Size (in bytes) of the chunks sent by ``get_streaming_response``.
+        stream_batch_size: Number of items read at once from blocking iterables by ``get_streaming_response``.
     """
 
     def list(
@@ -340,6 +685,14 @@ class CreateController(Controller):
 
         raise NotImplementedError  # pragma: no cover
 
+    def bulk_create(self, items: List[BaseModel]) -> Sequence[Any]:
+        """
+        Add several objects, it enables the ``POST /batch`` responder (see ``fastack.batch``).
+        It must return one result per item.
+        """
+
+        raise NotImplementedError  # pragma: no cover
+
 
 class UpdateController(Controller):
     """
@@ -353,6 +706,14 @@ class UpdateController(Controller):
 
         raise NotImplementedError  # pragma: no cover
 
+    def bulk_update(self, items: List[BatchUpdateItem]) -> Sequence[Any]:
+        """
+        Update several objects, it enables the ``PUT /batch`` responder (see ``fastack.batch``).
+        It must return one result per item.
+        """
+
+        raise NotImplementedError  # pragma: no cover
+
 
 class DestroyController(Controller):
     """
@@ -366,6 +727,14 @@ class DestroyController(Controller):
 
         raise NotImplementedError  # pragma: no cover
 
+    def bulk_destroy(self, ids: List[int]) -> Sequence[Any]:
+        """
+        Delete several objects, it enables the ``DELETE /batch`` responder (see ``fastack.batch``).
+        It must return one result per ID.
+        """
+
+        raise NotImplementedError  # pragma: no cover
+
 
 class ReadOnlyController(RetrieveController, ListController):
     """
@@ -389,3 +758,11 @@ class ModelController(
     """
     Model Controller for creating REST APIs.
     """
+
+
+# Bulk hooks that are not implemented, no batch responder is added for them
+_BATCH_STUBS = {
+    CreateController.bulk_create,
+    UpdateController.bulk_update,
+    DestroyController.bulk_destroy,
+}
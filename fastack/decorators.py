@@ -1,7 +1,18 @@
 import asyncio
 import warnings
 from functools import wraps
-from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Type, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Type,
+    Union,
+)
 
 import anyio
 import click
@@ -16,7 +27,8 @@ from typer.core import TyperCommand
 from typer.models import CommandFunctionType, CommandInfo
 
 from .app import Fastack
-from .context import _app_ctx_stack
+from .cache import CacheOptions
+from .context import AppContext, _ctx_stack
 from .utils import load_app
 
 
@@ -41,16 +53,15 @@ def with_asgi_lifespan(func: Callable[..., Any]) -> Callable[..., Any]:
         assert isinstance(app, FastAPI), "Invalid application type"
 
         async def wrapper() -> Any:
-            token = None
+            ctx = AppContext(app)
             try:
                 async with LifespanManager(app):
-                    token = _app_ctx_stack.set(app)
+                    ctx.push()
                     if asyncio.iscoroutinefunction(func):
                         return await func(*args, **kwds)  # pragma: no cover
                     return func(*args, **kwds)
             finally:
-                if token:
-                    _app_ctx_stack.reset(token)
+                ctx.pop()
 
         return anyio.run(wrapper)
 
@@ -152,12 +163,30 @@ def route(
     route_class_override: Optional[Type[APIRouter]] = None,
     callbacks: Optional[List[BaseRoute]] = None,
     openapi_extra: Optional[Dict[str, Any]] = None,
+    timing: Optional[bool] = None,
+    cache: Union[None, bool, float, CacheOptions] = None,
+    executor: Optional[str] = None,
+    max_concurrency: Optional[int] = None,
+    max_queue: Optional[int] = 0,
+    priority: Optional[int] = None,
 ):
     """
     A decorator to add additional information for endpoints in OpenAPI.
 
     :param path: The path of the endpoint.
     :param action: To mark this method is the responder to be included in the controller.
+    :param timing: Enable/disable phase timings (``Server-Timing`` header) for this endpoint.
+        If not provided, the ``SERVER_TIMING`` setting is used.
+    :param cache: Cache the responses of this endpoint, ``True``, a TTL in seconds
+        or ``fastack.cache.CacheOptions`` (see ``fastack.cache``).
+    :param executor: Name of the executor of this (sync) endpoint, see ``fastack.executors``.
+        If not provided, ``Controller.executor`` is used.
+    :param max_concurrency: Maximum number of requests of this endpoint processed at once,
+        instead of the limit of the controller (see ``fastack.bulkhead``).
+    :param max_queue: Maximum number of requests waiting when ``max_concurrency`` is reached,
+        the next ones are rejected with ``503``. ``None`` for no limit.
+    :param priority: Load shedding priority of this endpoint, e.g. ``fastack.constants.PRIORITY_CRITICAL``
+        for health checks (see ``fastack.middleware.shedding``). If not provided, ``Controller.priority`` is used.
     """
 
     def wrapper(func):
@@ -204,6 +233,15 @@ def route(
         )
         decorated.__route_params__ = params
         decorated.__route_action__ = action
+        decorated.__route_timing__ = timing
+        decorated.__route_cache__ = cache
+        decorated.__route_executor__ = executor
+        decorated.__route_priority__ = priority
+        decorated.__route_bulkhead__ = (
+            {"max_concurrency": max_concurrency, "max_queue": max_queue}
+            if max_concurrency is not None
+            else None
+        )
         return decorated
 
     return wrapper
@@ -245,3 +283,113 @@ def command(
         return f
 
     return decorator
+
+
+class CacheInfo(NamedTuple):
+    """
+    Statistics of a ``request_cached`` function.
+    """
+
+    hits: int
+    misses: int
+
+
+_sentinel = object()
+_kwd_mark = (object(),)
+
+
+def _make_key(args: tuple, kwds: dict) -> Any:
+    key = args
+    if kwds:
+        key += _kwd_mark + tuple(sorted(kwds.items()))
+    return key
+
+
+def request_cached(func: Callable) -> Callable:
+    """
+    A decorator that memoizes the result of a function for the current request (keyed by arguments).
+    The function can be a coroutine or a normal function.
+
+    The results are stored in the request context, so they are dropped when the request is finished.
+    Outside of a context the function is always called.
+
+    Example:
+
+    ```python
+    from fastack.decorators import request_cached
+    from fastack.globals import request
+
+    @request_cached
+    async def get_current_user():
+        return await User.get(request.headers["X-User-Id"])
+
+    get_current_user.cache_info()  # CacheInfo(hits=..., misses=...)
+    ```
+
+    notes:
+        - ``cache_info()`` returns the hit/miss counters for all requests.
+        - ``cache_clear()`` drops the cached results of the current request.
+        - Arguments must be hashable, otherwise the result is not cached.
+    """
+
+    hits = misses = 0
+
+    def lookup(args: tuple, kwds: dict) -> Any:
+        nonlocal hits, misses
+        ctx = _ctx_stack.get(None)
+        if ctx is None:
+            misses += 1
+            return None, None, _sentinel
+
+        key = _make_key(args, kwds)
+        cache = ctx.cache
+        results = cache.get(wrapper)
+        if results is None:
+            results = cache[wrapper] = {}
+
+        try:
+            rv = results.get(key, _sentinel)
+        except TypeError:
+            # unhashable arguments
+            misses += 1
+            return None, None, _sentinel
+
+        if rv is _sentinel:
+            misses += 1
+        else:
+            hits += 1
+        return results, key, rv
+
+    if asyncio.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def wrapper(*args, **kwds):
+            results, key, rv = lookup(args, kwds)
+            if rv is _sentinel:
+                rv = await func(*args, **kwds)
+                if results is not None:
+                    results[key] = rv
+            return rv
+
+    else:
+
+        @wraps(func)
+        def wrapper(*args, **kwds):
+            results, key, rv = lookup(args, kwds)
+            if rv is _sentinel:
+                rv = func(*args, **kwds)
+                if results is not None:
+                    results[key] = rv
+            return rv
+
+    def cache_info() -> CacheInfo:
+        return CacheInfo(hits, misses)
+
+    def cache_clear():
+        ctx = _ctx_stack.get(None)
+        if ctx is not None and ctx._cache is not None:
+            ctx._cache.pop(wrapper, None)
+
+    wrapper.cache_info = cache_info  # type: ignore[attr-defined]
+    wrapper.cache_clear = cache_clear  # type: ignore[attr-defined]
+    return wrapper
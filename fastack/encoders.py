@@ -0,0 +1,176 @@
+"""
+Fast JSON serializer backends for ``Controller.json`` and paginated responses.
+
+Select the backend with the ``JSON_BACKEND`` setting:
+
+```python
+JSON_BACKEND = "orjson"  # "json", "orjson" or import path of a ``JSONBackend`` instance
+```
+
+Types supported by a native backend like ``orjson`` (pydantic models, dataclasses, datetimes, UUIDs,
+Decimals, enums, ...) are encoded directly to bytes, without building an intermediate tree with
+``jsonable_encoder``. The ``json`` backend renders JSON compatible types like ``JSONResponse``,
+the values are converted by the compiled serializers (``fastack.serializers``).
+"""
+
+import dataclasses
+import json
+from typing import Any, Callable, Dict, Optional, Type, Union
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic.json import ENCODERS_BY_TYPE
+
+from .utils import import_attr
+
+
+def default_encoder(obj: Any) -> Any:
+    """
+    Convert an object that is not supported by the JSON backend,
+    the result is encoded again by the backend.
+    Conversions are the same as ``fastapi.encoders.jsonable_encoder``.
+    """
+
+    if isinstance(obj, BaseModel):
+        return obj.dict(by_alias=True)
+
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+
+    for cls in type(obj).__mro__[:-1]:
+        encoder = ENCODERS_BY_TYPE.get(cls)
+        if encoder is not None:
+            return encoder(obj)
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JSONBackend:
+    """
+    Base class of JSON backends.
+    """
+
+    name = "base"
+    # Whether values like datetimes, UUIDs or Decimals are encoded by the backend,
+    # otherwise they are converted to JSON compatible types before rendering.
+    native = True
+
+    def dumps(self, content: Any) -> bytes:
+        raise NotImplementedError  # pragma: no cover
+
+
+class StdlibJSONBackend(JSONBackend):
+    """
+    ``json`` module from the standard library, with the same output as ``JSONResponse``.
+
+    The content must only contain JSON compatible types, a ``default`` callback
+    per unsupported value is slower than converting the values up front.
+    """
+
+    name = "json"
+    native = False
+
+    def dumps(self, content: Any) -> bytes:
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode()
+
+
+class OrjsonBackend(JSONBackend):
+    """
+    `orjson <https://github.com/ijl/orjson>`_, it must be installed separately (``pip install orjson``).
+
+    Dataclasses, datetimes, UUIDs and enums are encoded natively by ``orjson``.
+    """
+
+    name = "orjson"
+
+    def __init__(self, default: Callable[[Any], Any] = default_encoder) -> None:
+        try:
+            import orjson  # type: ignore[import]
+        except ImportError as e:  # pragma: no cover
+            raise RuntimeError(
+                "orjson is not installed, install it with: pip install orjson"
+            ) from e
+
+        self.default = default
+        self.option = orjson.OPT_NON_STR_KEYS
+        self._dumps = orjson.dumps
+
+    def dumps(self, content: Any) -> bytes:
+        return self._dumps(content, default=self.default, option=self.option)
+
+
+BACKENDS: Dict[str, Type[JSONBackend]] = {
+    StdlibJSONBackend.name: StdlibJSONBackend,
+    OrjsonBackend.name: OrjsonBackend,
+}
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by a ``JSONBackend``.
+    The content doesn't need to be converted with ``jsonable_encoder``.
+    """
+
+    backend: JSONBackend = StdlibJSONBackend()
+
+    def render(self, content: Any) -> bytes:
+        return self.backend.dumps(content)
+
+
+def get_renderer(response_class: Type[JSONResponse]) -> Callable[[Any], bytes]:
+    """
+    Get the function that renders content to bytes like the response class,
+    without creating a response (e.g. for streamed items or rendering in a worker).
+    """
+
+    if issubclass(response_class, FastJSONResponse):
+        return response_class.backend.dumps
+
+    # ``render`` of JSON responses doesn't depend on the state of the instance
+    return response_class.__new__(response_class).render
+
+
+_response_classes: Dict[str, Type[FastJSONResponse]] = {}
+
+
+def get_json_backend(backend: Union[str, JSONBackend]) -> JSONBackend:
+    """
+    Get a JSON backend by name (``json``, ``orjson``) or import path of a ``JSONBackend`` instance.
+    """
+
+    if isinstance(backend, JSONBackend):
+        return backend
+
+    backend_class = BACKENDS.get(backend)
+    if backend_class is not None:
+        return backend_class()
+
+    obj = import_attr(backend)
+    if isinstance(obj, type):
+        obj = obj()
+
+    assert isinstance(obj, JSONBackend), f"{backend!r} is not a JSON backend"
+    return obj
+
+
+def json_response_class(
+    backend: Optional[Union[str, JSONBackend]] = None
+) -> Type[FastJSONResponse]:
+    """
+    Get a response class rendered by a JSON backend, e.g. for ``Controller.json_response_class``.
+
+    Args:
+        backend: Name, import path or instance of a backend (default ``json``).
+    """
+
+    backend = backend or StdlibJSONBackend.name
+    key = backend if isinstance(backend, str) else str(id(backend))
+    response_class = _response_classes.get(key)
+    if response_class is None:
+        instance = get_json_backend(backend)
+        name = type(instance).__name__.replace("Backend", "Response")
+        response_class = type(name, (FastJSONResponse,), {"backend": instance})
+        _response_classes[key] = response_class
+    return response_class
@@ -0,0 +1,119 @@
+"""
+Entity tags (``ETag``) and conditional requests (``If-None-Match``) for JSON responses,
+see ``Controller.etag``.
+
+An ETag is either computed from the encoded body (a strong hash),
+or built from a version token supplied by the responder (e.g. ``updated_at`` of a row),
+which can be compared before the data is loaded and serialized.
+When the ``If-None-Match`` header of a ``GET`` or ``HEAD`` request matches,
+the response is replaced by a ``304 Not Modified`` without body.
+"""
+
+import hashlib
+from typing import Any, Optional
+
+from fastapi.responses import Response
+from starlette.datastructures import Headers
+from starlette.types import Scope
+
+from .context import _ctx_stack
+
+CONDITIONAL_METHODS = ("GET", "HEAD")
+# Headers that describe the body, they are not sent with a 304 response
+ENTITY_HEADERS = (b"content-length", b"content-type", b"content-encoding")
+
+
+def compute_etag(body: bytes) -> str:
+    """
+    Compute a strong ETag from a body.
+    """
+
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def format_etag(version: Any) -> str:
+    """
+    Create an ETag from a version token, quoted ETags (strong or weak) are kept as is.
+    """
+
+    etag = str(version)
+    if etag.startswith(('"', 'W/"')):
+        return etag
+    return f'"{etag}"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """
+    Check whether an ETag matches an ``If-None-Match`` header (weak comparison).
+    """
+
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    etag = etag[2:] if etag.startswith("W/") else etag
+    for value in if_none_match.split(","):
+        value = value.strip()
+        if value.startswith("W/"):
+            value = value[2:]
+        if value == etag:
+            return True
+    return False
+
+
+def get_if_none_match(scope: Optional[Scope] = None) -> Optional[str]:
+    """
+    Get the ``If-None-Match`` header of a ``GET`` or ``HEAD`` request,
+    the current request is used if the scope is not provided.
+    """
+
+    if scope is None:
+        ctx = _ctx_stack.get(None)
+        scope = getattr(ctx, "scope", None)
+        if scope is None:
+            return None
+
+    if scope.get("type") != "http" or scope.get("method") not in CONDITIONAL_METHODS:
+        return None
+    return Headers(scope=scope).get("if-none-match")
+
+
+def not_modified_response(response: Response) -> Response:
+    """
+    Create a ``304 Not Modified`` response with the headers of a response, without its body.
+    """
+
+    not_modified = Response(status_code=304, background=response.background)
+    not_modified.raw_headers = [
+        (key, value) for key, value in response.raw_headers if key not in ENTITY_HEADERS
+    ]
+    return not_modified
+
+
+def conditional_response(response: Response, scope: Optional[Scope] = None) -> Response:
+    """
+    Return a ``304 Not Modified`` response if the ETag of the response
+    matches the ``If-None-Match`` header of the request, otherwise the response.
+    """
+
+    etag = response.headers.get("etag")
+    if etag is not None and etag_matches(etag, get_if_none_match(scope)):
+        return not_modified_response(response)
+    return response
+
+
+def apply_etag(
+    response: Response, etag: Optional[str] = None, scope: Optional[Scope] = None
+) -> Response:
+    """
+    Set the ``ETag`` header of a response (computed from its body if not provided)
+    and check the ``If-None-Match`` header of the request, see ``conditional_response``.
+    """
+
+    if "etag" not in response.headers:
+        if etag is None:
+            etag = compute_etag(response.body)
+        response.raw_headers.append((b"etag", etag.encode("latin-1")))
+    return conditional_response(response, scope)
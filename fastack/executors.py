@@ -0,0 +1,220 @@
+"""
+Dedicated thread pools for sync responders.
+
+Sync responders run in the default threadpool of Starlette, shared by all routes.
+Slow responders (e.g. reports) can use all of its threads, and the fast ones wait behind them.
+A responder can run in its own executor instead, with a fixed number of threads and a bounded queue:
+
+```python
+EXECUTORS = {
+    "reports": {"max_workers": 4, "max_queue": 16},
+}
+```
+
+```python
+class ReportController(Controller):
+    executor = "reports"  # (1)
+
+    def get(self):
+        ...
+
+class UserController(Controller):
+    @route(executor="reports")  # (2)
+    def export(self):
+        ...
+```
+
+1. All sync responders of the controller.
+2. Only this responder, it takes precedence over the controller.
+
+When the queue is full, the request is rejected with ``503 Service Unavailable``.
+An executor that is not defined is reported when the routes are added, see ``Fastack.check_executors``.
+Async responders and the dependencies are not affected.
+
+The time the calls wait for a thread is recorded in ``Executor.stats`` and in the
+``fastack.metrics`` plugin (``fastack_executor_queue_seconds``), to size the pools from data.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from .context import _ctx_stack
+from .utils import Stats, service_unavailable
+
+T = TypeVar("T")
+
+
+class ExecutorStats(Stats):
+    """
+    Statistics of an ``Executor``.
+
+    Attributes:
+        submitted: Number of calls accepted by the executor.
+        completed: Number of finished calls.
+        rejected: Number of calls rejected because the queue was full.
+        queue_seconds: Total time (in seconds) the calls waited for a thread.
+        max_queue_seconds: Longest wait for a thread.
+    """
+
+    __slots__ = (
+        "submitted",
+        "completed",
+        "rejected",
+        "queue_seconds",
+        "max_queue_seconds",
+    )
+
+    def __init__(self) -> None:
+        self.submitted = self.completed = self.rejected = 0
+        self.queue_seconds = self.max_queue_seconds = 0.0
+
+
+class Executor:
+    """
+    Thread pool with a bounded queue, for sync responders.
+
+    Args:
+        name: Name of the executor, used by ``Controller.executor`` and ``route(executor=...)``.
+        max_workers: Number of threads.
+        max_queue: Maximum number of calls waiting for a thread, ``None`` for no limit.
+        retry_after: Value (in seconds) of the ``Retry-After`` header of rejected requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 4,
+        max_queue: Optional[int] = None,
+        retry_after: int = 1,
+    ) -> None:
+        assert max_workers > 0, "max_workers must be greater than 0"
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.stats = ExecutorStats()
+        # Calls submitted and not finished, only updated on the event loop.
+        self.pending = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def queued(self) -> int:
+        """
+        Number of calls waiting for a thread.
+        """
+
+        return max(self.pending - self.max_workers, 0)
+
+    def is_full(self) -> bool:
+        return (
+            self.max_queue is not None
+            and self.pending >= self.max_workers + self.max_queue
+        )
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwds: Any) -> T:
+        """
+        Call a function in the pool, with the context of the caller
+        (``fastack.globals.request`` is available).
+
+        Raises:
+            HTTPException: ``503`` if the queue is full.
+        """
+
+        stats = self.stats
+        if self.is_full():
+            stats.rejected += 1
+            metrics = _get_metrics()
+            if metrics is not None:
+                metrics.executor_rejected.labels(self.name).inc()
+            raise service_unavailable(self.retry_after)
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix=f"fastack-{self.name}"
+            )
+
+        submitted = perf_counter()
+        waits: List[float] = []
+        context = contextvars.copy_context()
+
+        def call():
+            waits.append(perf_counter() - submitted)
+            return context.run(partial(func, *args, **kwds))
+
+        loop = asyncio.get_running_loop()
+        metrics = _get_metrics()
+        future = self._pool.submit(call)
+        self.pending += 1
+        stats.submitted += 1
+        # The call is finished when the thread is done, not when the caller stops waiting
+        # (e.g. a cancelled request), the thread is busy until then.
+        future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self._finish, waits, metrics)
+        )
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def _finish(self, waits: List[float], metrics: Any):
+        self.pending -= 1
+        if not waits:
+            # Cancelled before it started
+            return
+
+        wait = waits[0]
+        stats = self.stats
+        stats.completed += 1
+        stats.queue_seconds += wait
+        if wait > stats.max_queue_seconds:
+            stats.max_queue_seconds = wait
+
+        if metrics is not None:
+            metrics.executor_queue.labels(self.name).observe(wait)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+def _get_metrics() -> Any:
+    ctx = _ctx_stack.get(None)
+    return getattr(ctx.app, "metrics", None) if ctx is not None else None
+
+
+def create_executors(options: Dict[str, Dict[str, Any]]) -> Dict[str, Executor]:
+    """
+    Create the executors of the ``EXECUTORS`` setting.
+    """
+
+    return {name: Executor(name, **kwds) for name, kwds in options.items()}
+
+
+def get_executor(name: str) -> Executor:
+    """
+    Get an executor of the current application.
+
+    Raises:
+        LookupError: If the executor is not defined.
+    """
+
+    ctx = _ctx_stack.get(None)
+    executors = getattr(ctx.app, "executors", None) if ctx is not None else None
+    if not executors or name not in executors:
+        raise LookupError(f"Executor {name!r} is not defined (EXECUTORS setting)")
+    return executors[name]
+
+
+def executor_endpoint(func: Callable[..., Any], executor: str) -> Callable[..., Any]:
+    """
+    Wrap a sync endpoint, so it's called in an executor of the application.
+    """
+
+    async def endpoint(*args, **kwds):
+        return await get_executor(executor).run(func, *args, **kwds)
+
+    endpoint.__name__ = getattr(func, "__name__", "endpoint")
+    endpoint.__doc__ = func.__doc__
+    return endpoint
@@ -1,43 +1,55 @@
-from contextvars import ContextVar
 from typing import TYPE_CHECKING
 
 from fastapi import Request, WebSocket
 from starlette.datastructures import State
 
-from .context import _app_ctx_stack, _request_ctx_stack, _websocket_ctx_stack
+from .context import RequestContext, RequestGlobals, _ctx_stack, get_worker_app
 from .local import LocalProxy
 
 if TYPE_CHECKING:
     from .app import Fastack  # pragma: no cover
 
 
-def _find_object(ctx: ContextVar, err: str):
-    try:
-        obj = ctx.get()
-        if not obj:  # pragma: no cover
-            raise LookupError
-    except LookupError:
+def _get_context(err: str) -> RequestContext:
+    ctx = _ctx_stack.get(None)
+    if ctx is None:
         raise RuntimeError(err)
-
-    return obj
+    return ctx
 
 
 def _get_app() -> "Fastack":
-    return _find_object(_app_ctx_stack, "Working outside of application context.")
+    ctx = _ctx_stack.get(None)
+    if ctx is not None:
+        return ctx.app
+
+    app = get_worker_app()
+    if app is None:
+        raise RuntimeError("Working outside of application context.")
+    return app
+
 
+def _get_request() -> Request:
+    return _get_context("Working outside of request context.").request
 
-def _get_request() -> "Fastack":
-    return _find_object(_request_ctx_stack, "Working outside of request context.")
 
+def _get_websocket() -> WebSocket:
+    return _get_context("Working outside of websocket context.").websocket
 
-def _get_websocket() -> "Fastack":
-    return _find_object(_websocket_ctx_stack, "Working outside of websocket context.")
+
+def _get_g() -> RequestGlobals:
+    return _get_context("Working outside of application context.").g
 
 
 current_app: "Fastack" = LocalProxy(_get_app)
 request: Request = LocalProxy(_get_request)
 websocket: WebSocket = LocalProxy(_get_websocket)
-state: State = LocalProxy(lambda: current_app.state)
+state: State = LocalProxy(lambda: _get_app().state)
+g: RequestGlobals = LocalProxy(_get_g)
+
+
+def _has_scope(scope_type: str) -> bool:
+    ctx = _ctx_stack.get(None)
+    return ctx is not None and ctx.scope_type == scope_type
 
 
 def has_app_context():
@@ -53,7 +65,7 @@ def has_request_context():
     Check if request context is active.
     """
 
-    return bool(request)
+    return _has_scope("http")
 
 
 def has_websocket_context():
@@ -61,4 +73,4 @@ def has_websocket_context():
     Check if websocket context is active.
     """
 
-    return bool(websocket)
+    return _has_scope("websocket")
@@ -0,0 +1,854 @@
+"""
+Metrics plugin, it records the requests of each route (labeled by the endpoint name, e.g. ``user:retrieve``)
+and exposes them in the Prometheus text format.
+
+Add it to the ``PLUGINS`` setting:
+
+```python
+PLUGINS = [
+    "fastack.metrics",
+]
+METRICS_DIR = "/tmp/fastack-metrics"  # (optional) enable multiprocess mode
+```
+
+In multiprocess mode each worker writes its values to its own memory-mapped files in ``METRICS_DIR``
+and the ``/metrics`` endpoint aggregates the files of all workers.
+The directory must be emptied before the workers are started.
+The statistics read on demand (response cache and bulkheads) are not written to the files,
+they are the values of the worker that answers the scrape.
+"""
+
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import weakref
+from bisect import bisect_left
+from functools import partial
+from time import perf_counter_ns
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .bulkhead import collect_bulkheads
+from .context import _ctx_stack
+
+if TYPE_CHECKING:
+    from .app import Fastack  # pragma: no cover
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.25,
+    0.5,
+    0.75,
+    1.0,
+    2.5,
+    5.0,
+    7.5,
+    10.0,
+)
+INF = float("inf")
+
+_value = struct.Struct("d")
+_header = struct.Struct("i")
+_INITIAL_SIZE = 1 << 16
+
+
+class MemoryStore:
+    """
+    Stores metric values of a single process.
+    Values are addressed by an offset returned from ``offset()``.
+
+    Values can be updated from any thread (e.g. sync responders), updates are guarded by a lock.
+    """
+
+    def __init__(self) -> None:
+        self._index: Dict[str, int] = {}
+        self._values: List[float] = []
+        self._lock = threading.Lock()
+
+    def offset(self, key: str) -> int:
+        offset = self._index.get(key)
+        if offset is None:
+            with self._lock:
+                offset = self._index.get(key)
+                if offset is None:
+                    offset = self._index[key] = len(self._values)
+                    self._values.append(0.0)
+        return offset
+
+    def add(self, offset: int, amount: float):
+        with self._lock:
+            self._values[offset] += amount
+
+    def set(self, offset: int, value: float):
+        self._values[offset] = value
+
+    def get(self, offset: int) -> float:
+        return self._values[offset]
+
+    def items(self) -> Iterator[Tuple[str, float]]:
+        for key, offset in self._index.items():
+            yield key, self._values[offset]
+
+    def close(self):
+        pass
+
+
+class MmapStore(MemoryStore):
+    """
+    Stores metric values in a memory-mapped file, so other processes can read them.
+
+    The file has a single writer process (the worker that owns it), the threads of the worker
+    are serialized by a lock: an update of a value or an append can't be interleaved,
+    and the file isn't remapped while a value is updated.
+
+    File layout: the used size (``int32`` + 4 bytes of padding), then the entries.
+    Each entry is the key size (``int32``), the key (UTF-8, padded to 8 bytes) and the value (``double``).
+
+    Args:
+        path: File path.
+        reset: Drop the values stored in an existing file.
+    """
+
+    def __init__(self, path: str, reset: bool = False) -> None:
+        self.path = path
+        self._index = {}
+        self._lock = threading.Lock()
+        self._file = open(path, "w+b" if reset else "a+b")
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        if self._capacity == 0:
+            self._capacity = _INITIAL_SIZE
+            self._file.truncate(self._capacity)
+        self._m = mmap.mmap(self._file.fileno(), self._capacity)
+        self._used = _header.unpack_from(self._m, 0)[0]
+        if self._used == 0:
+            self._used = 8
+            _header.pack_into(self._m, 0, self._used)
+
+        for key, _, offset in _read_entries(self._m, self._used):
+            self._index[key] = offset
+
+    def offset(self, key: str) -> int:
+        offset = self._index.get(key)
+        if offset is None:
+            with self._lock:
+                offset = self._index.get(key)
+                if offset is None:
+                    offset = self._index[key] = self._append(key)
+        return offset
+
+    def _append(self, key: str) -> int:
+        encoded = key.encode("utf-8")
+        padded = _header.size + len(encoded)
+        padded += (8 - padded % 8) % 8
+        size = padded + _value.size
+        while self._used + size > self._capacity:
+            self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._m.close()
+            self._m = mmap.mmap(self._file.fileno(), self._capacity)
+
+        start = self._used
+        _header.pack_into(self._m, start, len(encoded))
+        self._m[start + _header.size : start + _header.size + len(encoded)] = encoded
+        offset = start + padded
+        _value.pack_into(self._m, offset, 0.0)
+        # The used size is written last, so readers never see a partial entry.
+        self._used += size
+        _header.pack_into(self._m, 0, self._used)
+        return offset
+
+    def add(self, offset: int, amount: float):
+        with self._lock:
+            m = self._m
+            _value.pack_into(m, offset, _value.unpack_from(m, offset)[0] + amount)
+
+    def set(self, offset: int, value: float):
+        with self._lock:
+            _value.pack_into(self._m, offset, value)
+
+    def get(self, offset: int) -> float:
+        with self._lock:
+            return _value.unpack_from(self._m, offset)[0]
+
+    def items(self) -> Iterator[Tuple[str, float]]:
+        with self._lock:
+            entries = list(_read_entries(self._m, self._used))
+        for key, value, _ in entries:
+            yield key, value
+
+    def close(self):
+        with self._lock:
+            self._m.close()
+            self._file.close()
+
+
+def _read_entries(data: Any, used: int) -> Iterator[Tuple[str, float, int]]:
+    pos = 8
+    while pos < used:
+        size = _header.unpack_from(data, pos)[0]
+        key = bytes(data[pos + _header.size : pos + _header.size + size]).decode(
+            "utf-8"
+        )
+        padded = _header.size + size
+        padded += (8 - padded % 8) % 8
+        offset = pos + padded
+        yield key, _value.unpack_from(data, offset)[0], offset
+        pos = offset + _value.size
+
+
+def read_metrics_file(path: str) -> Iterator[Tuple[str, float]]:
+    """
+    Read all values from a file written by ``MmapStore``.
+    """
+
+    with open(path, "rb") as fp:
+        data = fp.read()
+
+    if len(data) < 8:
+        return
+    yield from (
+        (key, value)
+        for key, value, _ in _read_entries(data, _header.unpack_from(data, 0)[0])
+    )
+
+
+def mark_process_dead(pid: int, directory: str):
+    """
+    Remove the live values (gauges) of a worker that has exited.
+    Call it from the process manager, e.g. the ``child_exit`` hook in gunicorn.
+
+    Args:
+        pid: Process ID of the worker.
+        directory: Value of ``METRICS_DIR`` setting.
+    """
+
+    path = os.path.join(directory, f"live_{pid}.db")
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class Sample:
+    __slots__ = ("name", "labels", "value")
+
+    def __init__(self, name: str, labels: Dict[str, str], value: float) -> None:
+        self.name = name
+        self.labels = labels
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"<Sample {self.name} {self.labels!r} {self.value!r}>"
+
+
+class MetricFamily:
+    """
+    Collected samples of a metric.
+    """
+
+    def __init__(
+        self, name: str, documentation: str, type: str, samples: List[Sample]
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.samples = samples
+
+
+class _Child:
+    __slots__ = ("_metric", "_keys", "_store", "_offsets", "_generation")
+
+    def __init__(self, metric: "Metric", keys: Sequence[str]) -> None:
+        self._metric = metric
+        self._keys = keys
+        self._generation = -1
+        self._bind()
+
+    def _bind(self):
+        registry = self._metric.registry
+        self._store = registry.get_store(self._metric.live)
+        self._offsets = [self._store.offset(key) for key in self._keys]
+        self._generation = registry.generation
+
+
+class CounterChild(_Child):
+    __slots__ = ()
+
+    def inc(self, amount: float = 1.0):
+        if self._generation != self._metric.registry.generation:
+            self._bind()
+        self._store.add(self._offsets[0], amount)
+
+    def get(self) -> float:
+        if self._generation != self._metric.registry.generation:
+            self._bind()
+        return self._store.get(self._offsets[0])
+
+
+class GaugeChild(CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        if self._generation != self._metric.registry.generation:
+            self._bind()
+        self._store.set(self._offsets[0], value)
+
+
+class HistogramChild(_Child):
+    __slots__ = ("_upper_bounds",)
+
+    def __init__(self, metric: "Histogram", keys: Sequence[str]) -> None:
+        self._upper_bounds = metric.buckets
+        super().__init__(metric, keys)
+
+    def observe(self, value: float):
+        if self._generation != self._metric.registry.generation:
+            self._bind()
+        store = self._store
+        offsets = self._offsets
+        # Buckets are stored non-cumulative, followed by the count and the sum.
+        store.add(offsets[bisect_left(self._upper_bounds, value)], 1.0)
+        store.add(offsets[-2], 1.0)
+        store.add(offsets[-1], value)
+
+
+class Metric:
+    """
+    Base class of metrics.
+
+    Args:
+        name: Metric name.
+        documentation: Help text.
+        labelnames: Label names.
+        registry: Registry to register the metric in.
+    """
+
+    type = "untyped"
+    # Values of "live" metrics are removed when the worker exits (see ``mark_process_dead``).
+    live = False
+    child_class = CounterChild
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        registry: "MetricsRegistry",
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        registry.register(self)
+
+    def sample_names(self) -> List[Tuple[str, Dict[str, str]]]:
+        return [(self.name, {})]
+
+    def labels(self, *values: Any) -> Any:
+        """
+        Get the metric for the given label values (in the order of ``labelnames``).
+        """
+
+        child = self._children.get(values)
+        if child is None:
+            assert len(values) == len(
+                self.labelnames
+            ), f"{self.name} expects labels {self.labelnames!r}"
+            labels = dict(zip(self.labelnames, map(str, values)))
+            keys = [
+                json.dumps([self.name, name, {**labels, **extra}], sort_keys=True)
+                for name, extra in self.sample_names()
+            ]
+            child = self._children[values] = self.child_class(self, keys)
+        return child
+
+    def collect(self, values: Dict[str, float]) -> MetricFamily:
+        samples = []
+        for key, value in values.items():
+            _, name, labels = json.loads(key)
+            samples.append(Sample(name, labels, value))
+        return MetricFamily(self.name, self.documentation, self.type, samples)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def sample_names(self) -> List[Tuple[str, Dict[str, str]]]:
+        return [(self.name + "_total", {})]
+
+
+class Gauge(Metric):
+    """
+    Gauge metric, values of all live workers are summed.
+    """
+
+    type = "gauge"
+    live = True
+    child_class = GaugeChild
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    type = "histogram"
+    child_class = HistogramChild  # type: ignore[assignment]
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        registry: "MetricsRegistry",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        buckets = sorted(float(b) for b in buckets)
+        if buckets[-1] != INF:
+            buckets.append(INF)
+        self.buckets = buckets
+        super().__init__(name, documentation, labelnames, registry=registry)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def sample_names(self) -> List[Tuple[str, Dict[str, str]]]:
+        names: List[Tuple[str, Dict[str, str]]] = [
+            (self.name + "_bucket", {"le": _format_value(bound)})
+            for bound in self.buckets
+        ]
+        names.append((self.name + "_count", {}))
+        names.append((self.name + "_sum", {}))
+        return names
+
+    def collect(self, values: Dict[str, float]) -> MetricFamily:
+        family = super().collect(values)
+        # Convert the stored buckets to cumulative buckets
+        groups: Dict[str, List[Sample]] = {}
+        for sample in family.samples:
+            if sample.name.endswith("_bucket"):
+                labels = {k: v for k, v in sample.labels.items() if k != "le"}
+                groups.setdefault(json.dumps(labels, sort_keys=True), []).append(sample)
+
+        for buckets in groups.values():
+            buckets.sort(key=lambda s: float(s.labels["le"]))
+            total = 0.0
+            for sample in buckets:
+                total += sample.value
+                sample.value = total
+        return family
+
+
+Collector = Any
+_registries: "weakref.WeakSet[MetricsRegistry]" = weakref.WeakSet()
+
+
+class MetricsRegistry:
+    """
+    Registry of metrics.
+
+    Without a directory the values are kept in the memory of the current process.
+    With a directory each process writes to its own files, and ``collect()`` aggregates the files of all processes.
+
+    Args:
+        directory: Directory for the memory-mapped files (multiprocess mode).
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = directory
+        self.generation = 0
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Collector] = []
+        self._stores: Dict[bool, MemoryStore] = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _registries.add(self)
+
+    def register(self, metric: Metric):
+        assert metric.name not in self._metrics, f"Duplicate metric {metric.name!r}"
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def add_collector(self, collector: Collector):
+        """
+        Add a function that returns a list of ``MetricFamily`` when collecting,
+        for values that are read on demand (e.g. cache statistics).
+        """
+
+        self._collectors.append(collector)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return Counter(name, documentation, labelnames, registry=self)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return Gauge(name, documentation, labelnames, registry=self)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        return Histogram(
+            name, documentation, labelnames, registry=self, buckets=buckets
+        )
+
+    def get_store(self, live: bool) -> MemoryStore:
+        store = self._stores.get(live)
+        if store is None:
+            # A file must be opened by a single store
+            with self._lock:
+                store = self._stores.get(live)
+                if store is None:
+                    store = self._stores[live] = self._create_store(live)
+        return store
+
+    def _create_store(self, live: bool) -> MemoryStore:
+        if not self.directory:
+            return MemoryStore()
+
+        prefix = "live" if live else "metrics"
+        path = os.path.join(self.directory, f"{prefix}_{os.getpid()}.db")
+        return MmapStore(path, reset=live)
+
+    def _after_fork(self):
+        # The stores of the parent process must not be written by the child process.
+        self._stores = {}
+        self._lock = threading.Lock()
+        self.generation += 1
+
+    def _read_values(self) -> Dict[str, float]:
+        values: Dict[str, float] = {}
+        if not self.directory:
+            for store in self._stores.values():
+                for key, value in store.items():
+                    values[key] = value
+            return values
+
+        for prefix in ("metrics", "live"):
+            pattern = os.path.join(self.directory, f"{prefix}_*.db")
+            for path in glob.glob(pattern):
+                try:
+                    items = list(read_metrics_file(path))
+                except FileNotFoundError:  # pragma: no cover
+                    continue
+                for key, value in items:
+                    values[key] = values.get(key, 0.0) + value
+        return values
+
+    def collect(self) -> List[MetricFamily]:
+        grouped: Dict[str, Dict[str, float]] = {}
+        for key, value in self._read_values().items():
+            name = json.loads(key)[0]
+            grouped.setdefault(name, {})[key] = value
+
+        families = []
+        for name, metric in self._metrics.items():
+            families.append(metric.collect(grouped.get(name, {})))
+
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+    def generate_latest(self) -> str:
+        """
+        Collect all metrics in the Prometheus text format.
+        """
+
+        return generate_latest(self.collect())
+
+    def close(self):
+        """
+        Close the files of the current process, the live values are removed.
+        """
+
+        for live, store in self._stores.items():
+            store.close()
+            if live and isinstance(store, MmapStore) and os.path.exists(store.path):
+                os.remove(store.path)
+        self._stores = {}
+        self.generation += 1
+
+
+def _after_fork_in_child():
+    for registry in list(_registries):
+        registry._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _format_value(value: float) -> str:
+    if value == INF:
+        return "+Inf"
+    if value == -INF:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def generate_latest(families: Sequence[MetricFamily]) -> str:
+    """
+    Format metric families in the Prometheus text format.
+    """
+
+    lines = []
+    for family in families:
+        doc = family.documentation.replace("\\", r"\\").replace("\n", r"\n")
+        lines.append(f"# HELP {family.name} {doc}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for sample in family.samples:
+            if sample.labels:
+                labels = ",".join(
+                    f'{name}="{_escape(str(value))}"'
+                    for name, value in sorted(sample.labels.items())
+                )
+                lines.append(f"{sample.name}{{{labels}}} {_format_value(sample.value)}")
+            else:
+                lines.append(f"{sample.name} {_format_value(sample.value)}")
+    return "\n".join(lines) + "\n"
+
+
+class Metrics:
+    """
+    Request metrics of an application, available as ``app.metrics``.
+
+    * ``fastack_requests_total`` - Requests per endpoint, method and status code.
+    * ``fastack_request_errors_total`` - Requests that failed with a 5xx status code or an exception.
+    * ``fastack_request_duration_seconds`` - Latency histogram, from the ASGI entry to the end of the response.
+    * ``fastack_requests_in_progress`` - Requests being processed.
+    * ``fastack_json_offload_seconds`` - Duration of JSON serializations moved out of the event loop,
+      per executor (see ``fastack.offload``).
+    * ``fastack_json_inline_total`` - JSON payloads below the offload threshold.
+    * ``fastack_executor_queue_seconds`` - Time the sync responders waited for a thread,
+      per executor (see ``fastack.executors``).
+    * ``fastack_executor_rejected_total`` - Requests rejected because the queue of an executor was full.
+    * ``fastack_load_shedding_decisions_total`` - Decisions of the load shedder, per decision and priority
+      (see ``fastack.middleware.shedding``).
+    * ``fastack_queue_delay_seconds`` - Queueing delay of requests, from the ASGI entry to the start of the handler
+      (recorded by the load shedding middleware).
+    * ``fastack_rate_limited_total`` - Requests rejected by the ``fastack.ratelimit`` plugin, per rule.
+
+    The statistics of the response cache (``fastack_response_cache_*_total``) and the bulkheads
+    (``fastack_bulkhead_*``, see ``fastack.bulkhead``) are collected too.
+
+    Args:
+        registry: Registry to register the metrics in.
+        buckets: Buckets of the latency histogram.
+    """
+
+    def __init__(
+        self, registry: MetricsRegistry, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.registry = registry
+        self.requests = registry.counter(
+            "fastack_requests",
+            "Total number of requests.",
+            ("endpoint", "method", "status"),
+        )
+        self.errors = registry.counter(
+            "fastack_request_errors",
+            "Total number of failed requests.",
+            ("endpoint",),
+        )
+        self.duration = registry.histogram(
+            "fastack_request_duration_seconds",
+            "Request latency in seconds.",
+            ("endpoint",),
+            buckets=buckets,
+        )
+        self.in_progress = registry.gauge(
+            "fastack_requests_in_progress",
+            "Number of requests in progress.",
+            ("endpoint",),
+        )
+        self.json_offload = registry.histogram(
+            "fastack_json_offload_seconds",
+            "Duration of JSON serializations outside of the event loop in seconds.",
+            ("executor",),
+            buckets=buckets,
+        )
+        self.json_inline = registry.counter(
+            "fastack_json_inline",
+            "Total number of JSON payloads serialized on the event loop.",
+        )
+        self.executor_queue = registry.histogram(
+            "fastack_executor_queue_seconds",
+            "Time spent waiting for a thread of an executor in seconds.",
+            ("executor",),
+            buckets=buckets,
+        )
+        self.executor_rejected = registry.counter(
+            "fastack_executor_rejected",
+            "Total number of requests rejected by a full executor.",
+            ("executor",),
+        )
+        self.load_shedding = registry.counter(
+            "fastack_load_shedding_decisions",
+            "Total number of decisions of the load shedder.",
+            ("decision", "priority"),
+        )
+        self.rate_limited = registry.counter(
+            "fastack_rate_limited",
+            "Total number of requests rejected by a rate limit.",
+            ("rule",),
+        )
+        self.queue_delay = registry.histogram(
+            "fastack_queue_delay_seconds",
+            "Time from the ASGI entry to the start of the handler in seconds.",
+            buckets=buckets,
+        )
+
+    async def observe(
+        self, endpoint: str, app: ASGIApp, scope: Scope, receive: Receive, send: Send
+    ):
+        """
+        Run the route and record its metrics.
+        """
+
+        ctx = _ctx_stack.get(None)
+        started = ctx.started if ctx is not None and ctx.started else perf_counter_ns()
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = self.in_progress.labels(endpoint)
+        in_progress.inc()
+        try:
+            await app(scope, receive, send_wrapper)
+        except HTTPException as exc:
+            status = exc.status_code
+            raise
+        finally:
+            in_progress.dec()
+            self.duration.labels(endpoint).observe((perf_counter_ns() - started) / 1e9)
+            self.requests.labels(endpoint, scope["method"], status).inc()
+            if status >= 500:
+                self.errors.labels(endpoint).inc()
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    app: "Fastack" = request.app
+    assert app.metrics is not None
+    return Response(
+        app.metrics.registry.generate_latest(), media_type=CONTENT_TYPE_LATEST
+    )
+
+
+def collect_cache_stats(cache: Any) -> List[MetricFamily]:
+    """
+    Collector of the statistics of a response cache backend (see ``fastack.cache``).
+    """
+
+    families = []
+    for name, value in cache.stats.as_dict().items():
+        metric = f"fastack_response_cache_{name}"
+        families.append(
+            MetricFamily(
+                metric,
+                f"Total number of response cache {name}.",
+                "counter",
+                [Sample(metric + "_total", {}, float(value))],
+            )
+        )
+    return families
+
+
+# Bulkhead statistics exported as gauges, the others are counters
+_BULKHEAD_GAUGES = ("active", "waiting")
+
+
+def collect_bulkhead_stats(app: "Fastack") -> List[MetricFamily]:
+    """
+    Collector of the statistics of the bulkheads of an application (see ``fastack.bulkhead``).
+    """
+
+    samples: Dict[str, List[Sample]] = {}
+    for bulkhead in collect_bulkheads(app):
+        labels = {"bulkhead": bulkhead.name}
+        for name, value in bulkhead.stats.as_dict().items():
+            suffix = "" if name in _BULKHEAD_GAUGES else "_total"
+            samples.setdefault(name, []).append(
+                Sample(f"fastack_bulkhead_{name}{suffix}", labels, float(value))
+            )
+
+    families = []
+    for name, values in samples.items():
+        if name in _BULKHEAD_GAUGES:
+            doc, type = f"Number of {name} requests of the bulkhead.", "gauge"
+        else:
+            doc, type = f"Total number of {name} requests of the bulkhead.", "counter"
+        families.append(MetricFamily(f"fastack_bulkhead_{name}", doc, type, values))
+    return families
+
+
+def setup(app: "Fastack"):
+    """
+    Enable metrics on the application.
+
+    Settings:
+
+    * ``METRICS_DIR`` - Directory for the memory-mapped files (multiprocess mode).
+    * ``METRICS_PATH`` - Path of the Prometheus endpoint (default ``/metrics``), ``None`` to disable it.
+    * ``METRICS_BUCKETS`` - Buckets of the latency histogram.
+    """
+
+    registry = MetricsRegistry(app.get_setting("METRICS_DIR"))
+    app.metrics = Metrics(registry, app.get_setting("METRICS_BUCKETS", DEFAULT_BUCKETS))
+    path = app.get_setting("METRICS_PATH", "/metrics")
+    if path:
+        app.add_route(path, metrics_endpoint, include_in_schema=False, name="metrics")
+
+    if app.response_cache is not None:
+        registry.add_collector(partial(collect_cache_stats, app.response_cache))
+    registry.add_collector(partial(collect_bulkhead_stats, app))
+
+    app.add_event_handler("shutdown", registry.close)
@@ -1,21 +1,30 @@
-from typing import TYPE_CHECKING, Union
+from functools import partial
+from typing import TYPE_CHECKING, Any, Optional, Sequence, Union
 
 from starlette.middleware.base import DispatchFunction
 
+from ..routing import PathScope
 from .base import (
     BaseMiddleware,
+    FusedMiddleware,
     ProcessRequestFunc,
     ProcessResponseFunc,
     ProcessWebSocketFunc,
 )
+from .compression import CompressionMiddleware
+from .shedding import LoadSheddingMiddleware
 
 if TYPE_CHECKING:
     from ..app import Fastack  # pragma: no cover
+    from ..controller import Controller  # pragma: no cover
 
 __all__ = [
     "MiddlewareManager",
     "StateMiddleware",
     "BaseMiddleware",
+    "FusedMiddleware",
+    "CompressionMiddleware",
+    "LoadSheddingMiddleware",
 ]
 
 DecoratedMiddleware = Union[
@@ -26,17 +35,59 @@ DecoratedMiddleware = Union[
 class MiddlewareManager:
     """
     Middleware Manager which allows you to create middleware with functions.
+
+    All functions accept ``include`` / ``exclude`` path prefixes or ``controllers``
+    to limit the paths where they are applied:
+
+    ```python
+    @app.middleware("request", exclude=["/health", "/metrics"])
+    async def authenticate(request: Request):
+        ...
+    ```
     """
 
     def __init__(self, app: "Fastack"):
         self.app = app
 
-    def process_request(self, func: ProcessRequestFunc):
+    def add_hook(
+        self,
+        hook_type: str,
+        func: DecoratedMiddleware,
+        *,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+        controllers: Optional[Sequence["Controller"]] = None,
+    ):
+        """
+        Add a function to the outermost ``FusedMiddleware``, a new layer is only added
+        if another middleware was added after it. So the stack depth doesn't grow
+        with the number of functions and the stack doesn't need to be rebuilt.
+
+        Args:
+            hook_type: ``request``, ``response`` or ``websocket``.
+            func: Middleware function.
+            include: Path prefixes where the function is applied.
+            exclude: Path prefixes where the function is not applied.
+            controllers: Controllers where the function is applied.
+        """
+
+        hook = (hook_type, func, PathScope.create(include, exclude, controllers))
+        user_middleware = self.app.user_middleware
+        if user_middleware and user_middleware[0].cls is FusedMiddleware:
+            # The list is shared with the middleware instance in the built stack
+            user_middleware[0].options["hooks"].append(hook)
+        else:
+            self.app.add_middleware(FusedMiddleware, hooks=[hook])
+
+    def process_request(
+        self, func: Optional[ProcessRequestFunc] = None, **options: Any
+    ):
         """
         Process request middleware.
 
         Args:
             func: Function to be called before request.
+            **options: ``include``, ``exclude`` or ``controllers``, see ``add_hook``.
 
         Example:
 
@@ -52,15 +103,21 @@ class MiddlewareManager:
         ```
 
         """
-        self.app.add_middleware(BaseMiddleware, process_request=func)
+        if func is None:
+            return partial(self.process_request, **options)
+
+        self.add_hook("request", func, **options)
         return func
 
-    def process_response(self, func: ProcessResponseFunc):
+    def process_response(
+        self, func: Optional[ProcessResponseFunc] = None, **options: Any
+    ):
         """
         Process response middleware.
 
         Args:
             func: Function to be called after request.
+            **options: ``include``, ``exclude`` or ``controllers``, see ``add_hook``.
 
         Example:
 
@@ -74,15 +131,21 @@ class MiddlewareManager:
             response.headers["X-Success"] = success
         ```
         """
-        self.app.add_middleware(BaseMiddleware, process_response=func)
+        if func is None:
+            return partial(self.process_response, **options)
+
+        self.add_hook("response", func, **options)
         return func
 
-    def process_websocket(self, func: ProcessWebSocketFunc):
+    def process_websocket(
+        self, func: Optional[ProcessWebSocketFunc] = None, **options: Any
+    ):
         """
         Process websocket middleware.
 
         Args:
             func: Function to be called before the request to WebSocket.
+            **options: ``include``, ``exclude`` or ``controllers``, see ``add_hook``.
 
         Example:
 
@@ -95,18 +158,24 @@ class MiddlewareManager:
             # websocket.accept()
         ```
         """
-        self.app.add_middleware(BaseMiddleware, process_websocket=func)
+        if func is None:
+            return partial(self.process_websocket, **options)
+
+        self.add_hook("websocket", func, **options)
         return func
 
-    def process_http(self, func: DispatchFunction):
+    def process_http(self, func: Optional[DispatchFunction] = None, **options: Any):
         """
         Original FastAPI.middleware
         """
 
-        self.app.add_middleware(BaseMiddleware, dispatch=func)
+        if func is None:
+            return partial(self.process_http, **options)
+
+        self.app.add_middleware(BaseMiddleware, dispatch=func, **options)
         return func
 
-    def __call__(self, middleware_type: str) -> DecoratedMiddleware:
+    def __call__(self, middleware_type: str, **options: Any) -> DecoratedMiddleware:
         assert middleware_type in (
             "http",
             "request",
@@ -114,4 +183,6 @@ class MiddlewareManager:
             "websocket",
         ), "middleware_type must be 'http', 'request', 'response or 'websocket'"
         func = getattr(self, "process_{}".format(middleware_type))
+        if options:
+            return partial(func, **options)
         return func
@@ -1,9 +1,9 @@
 import asyncio
-from typing import Awaitable, Callable, Optional
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Optional, Sequence, Tuple
 
-import anyio
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI
 from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
 from starlette.middleware.base import (
     BaseHTTPMiddleware,
     DispatchFunction,
@@ -11,22 +11,83 @@ from starlette.middleware.base import (
 )
 from starlette.requests import Request
 from starlette.responses import Response
-from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from starlette.websockets import WebSocket
 
 from ..globals import request, websocket
+from ..routing import PathScope, PrefixTrie
 from ..utils import lookup_exception_handler
 
+if TYPE_CHECKING:
+    from ..controller import Controller  # pragma: no cover
+
 ProcessRequestFunc = Callable[[Request], Awaitable[None]]
 ProcessResponseFunc = Callable[[Response, Optional[Exception]], Awaitable[None]]
 ProcessWebSocketFunc = Callable[[WebSocket], Awaitable[None]]
 
 
-class BaseMiddleware(BaseHTTPMiddleware):
+async def get_exception_response(exc: Exception) -> Response:
+    """
+    Get the response of the application exception handler for an exception,
+    the exception is re-raised if there is no handler.
+    """
+
+    app: FastAPI = request.app
+    lookup = getattr(app, "lookup_exception_handler", None)
+    if lookup is not None:
+        handler = lookup(exc)
+    else:
+        handler = None
+        if isinstance(exc, HTTPException):
+            handler = lookup_exception_handler(app.exception_handlers, exc.status_code)
+        if handler is None:
+            handler = lookup_exception_handler(app.exception_handlers, exc)
+
+    if handler is None:
+        raise exc
+
+    if asyncio.iscoroutinefunction(handler):
+        return await handler(request, exc)
+    return await run_in_threadpool(handler, request, exc)
+
+
+class ResponseHead(Response):
     """
-    Middleware that supports HTTP and WebSocket connections
+    Response passed to ``process_response``, it only has the status code and headers
+    of the response being sent. The body is streamed to the client and is not available.
+
+    Changes to ``status_code`` and ``headers`` are applied to the response.
     """
 
+    def __init__(self, status_code: int, raw_headers: List[Tuple[bytes, bytes]]):
+        self.status_code = status_code
+        self.raw_headers = raw_headers
+        self.background = None
+
+
+class BaseMiddleware:
+    """
+    Middleware that supports HTTP and WebSocket connections.
+
+    This is a pure ASGI middleware, ``process_response`` is called when the response starts
+    (``http.response.start``) so the body is never buffered and streaming responses are passed through.
+    Only a custom ``dispatch`` (e.g. ``@app.middleware("http")``) needs the ``call_next`` API
+    of ``starlette.middleware.base.BaseHTTPMiddleware``.
+
+    The middleware can be limited to some paths with ``include`` / ``exclude`` path prefixes
+    or ``controllers`` (see ``fastack.routing.PathScope``), other requests bypass it.
+    They can be passed as arguments or set as class attributes.
+
+    Attributes:
+        include: Path prefixes where the middleware is applied.
+        exclude: Path prefixes where the middleware is not applied.
+        controllers: Controllers where the middleware is applied.
+    """
+
+    include: Optional[Sequence[str]] = None
+    exclude: Optional[Sequence[str]] = None
+    controllers: Optional[Sequence["Controller"]] = None
+
     def __init__(
         self,
         app: ASGIApp,
@@ -35,8 +96,16 @@ class BaseMiddleware(BaseHTTPMiddleware):
         process_request: Optional[ProcessRequestFunc] = None,
         process_response: Optional[ProcessResponseFunc] = None,
         process_websocket: Optional[ProcessWebSocketFunc] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+        controllers: Optional[Sequence["Controller"]] = None,
     ) -> None:
         self.app = app
+        self.path_scope = PathScope.create(
+            include or self.include,
+            exclude or self.exclude,
+            controllers or self.controllers,
+        )
         self.dispatch_func = self.dispatch if dispatch is None else dispatch
         self.process_request_func = (
             self.process_request if process_request is None else process_request
@@ -48,47 +117,85 @@ class BaseMiddleware(BaseHTTPMiddleware):
             self.process_websocket if process_websocket is None else process_websocket
         )
 
+        # Skip the hooks that are not implemented, so they cost nothing per request.
+        cls = type(self)
+        self.has_process_request = (
+            process_request is not None
+            or cls.process_request is not BaseMiddleware.process_request
+        )
+        self.has_process_response = (
+            process_response is not None
+            or cls.process_response is not BaseMiddleware.process_response
+        )
+        self.has_process_websocket = (
+            process_websocket is not None
+            or cls.process_websocket is not BaseMiddleware.process_websocket
+        )
+        self.http_middleware: Optional[BaseHTTPMiddleware] = None
+        if dispatch is not None or cls.dispatch is not BaseMiddleware.dispatch:
+            self.http_middleware = BaseHTTPMiddleware(app, dispatch=self.dispatch_func)
+
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         scope_type = scope["type"]
+        path_scope = self.path_scope
+        if path_scope is not None and not path_scope.match(scope.get("path", "")):
+            await self.app(scope, receive, send)
+            return
+
         if scope_type == "http":
-            try:
-                await self.process_request_func(request)
-            except Exception as exc:
-                async with anyio.create_task_group() as task_group:
-                    app: FastAPI = request.app
-                    exception_handlers = app.exception_handlers
-                    handler = None
-                    if isinstance(exc, HTTPException):
-                        handler = lookup_exception_handler(
-                            exception_handlers, exc.status_code
-                        )
-
-                    if handler is None:
-                        handler = lookup_exception_handler(exception_handlers, exc)
-
-                    if handler is None:
-                        raise
-
-                    if asyncio.iscoroutinefunction(handler):
-                        response = await handler(request, exc)
-                    else:
-                        response = await run_in_threadpool(handler, request, exc)
-
-                    await self.process_response_func(response, exc)  # type: ignore[operator]
-                    await response(scope, receive, send)
-                    task_group.cancel_scope.cancel()
+            if self.has_process_request:
+                try:
+                    await self.process_request_func(request)
+                except Exception as exc:
+                    await self.handle_exception(exc, scope, receive, send)
                     return
 
-        elif scope_type == "websocket":
+            if self.http_middleware is not None:
+                await self.http_middleware(scope, receive, send)
+                return
+
+            if self.has_process_response:
+                send = self.wrap_send(send)
+
+        elif scope_type == "websocket" and self.has_process_websocket:
             await self.process_websocket_func(websocket)
 
-        return await super().__call__(scope, receive, send)
+        await self.app(scope, receive, send)
+
+    def wrap_send(self, send: Send) -> Send:
+        """
+        Call ``process_response`` when the response starts.
+        """
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                response = ResponseHead(message["status"], list(message["headers"]))
+                await self.process_response_func(response)  # type: ignore[call-arg]
+                message = {
+                    **message,
+                    "status": response.status_code,
+                    "headers": response.raw_headers,
+                }
+            await send(message)
+
+        return send_wrapper
+
+    async def handle_exception(
+        self, exc: Exception, scope: Scope, receive: Receive, send: Send
+    ):
+        """
+        Send the response of the exception handler for an exception raised in ``process_request``.
+        """
+
+        response = await get_exception_response(exc)
+        await self.process_response_func(response, exc)  # type: ignore[call-arg]
+        await response(scope, receive, send)
 
     async def dispatch(
         self, request: Request, call_next: RequestResponseEndpoint
     ) -> Response:
         response = await call_next(request)
-        await self.process_response_func(response)  # type: ignore[operator]
+        await self.process_response_func(response)  # type: ignore[call-arg]
         return response
 
     async def process_request(self, request: Request):
@@ -103,7 +210,7 @@ class BaseMiddleware(BaseHTTPMiddleware):
         Process the response
 
         Args:
-            response: The response object
+            response: The response object, see ``ResponseHead``.
             exc: The exception object if error occured
 
         Notes:
@@ -115,3 +222,136 @@ class BaseMiddleware(BaseHTTPMiddleware):
         Process the websocket.
         This is similar to process_request but for websocket.
         """
+
+
+Hook = Tuple[str, Callable[..., Awaitable[None]], Optional[PathScope]]
+ActiveHook = Tuple[int, str, Callable[..., Awaitable[None]]]
+
+
+class FusedMiddleware:
+    """
+    Runs the functions added with ``Fastack.middleware`` (``request``, ``response`` and ``websocket`` hooks)
+    in a single middleware layer.
+
+    Hooks are kept in the order they were added and behave like nested ``BaseMiddleware`` layers,
+    the last added hook is the outermost:
+
+    * ``request`` and ``websocket`` hooks run from the last added to the first added.
+    * ``response`` hooks run from the first added to the last added.
+    * If a ``request`` hook raises an exception, the response of the exception handler
+      is only seen by the ``response`` hooks added after it.
+
+    The path scopes of all hooks are compiled into one prefix trie that maps a path
+    to the hooks applied on it, so each request pays a single lookup.
+
+    Args:
+        app: ASGI application.
+        hooks: List of ``(type, function, path scope)``, the list can be extended after the middleware is built.
+    """
+
+    def __init__(self, app: ASGIApp, *, hooks: List[Hook]) -> None:
+        self.app = app
+        self.hooks = hooks
+        self._compiled = -1
+        self._all: Tuple[ActiveHook, ...] = ()
+        self._trie: Optional[PrefixTrie[Tuple[ActiveHook, ...]]] = None
+
+    def compile(self):
+        """
+        Compile the path scopes of the hooks.
+        """
+
+        hooks = list(self.hooks)
+
+        def active(path: Optional[str]) -> Tuple[ActiveHook, ...]:
+            rv = []
+            for idx, (hook_type, func, path_scope) in enumerate(hooks):
+                if path_scope is None:
+                    enabled = True
+                elif path is None:
+                    enabled = path_scope.default
+                else:
+                    enabled = path_scope.match(path)
+
+                if enabled:
+                    rv.append((idx, hook_type, func))
+            return tuple(rv)
+
+        prefixes = set()
+        for _, _, path_scope in hooks:
+            if path_scope is not None:
+                prefixes.update(path_scope.prefixes())
+
+        self._all = active(None)
+        self._trie = None
+        if prefixes:
+            # The hooks applied on a path only change at the prefixes of the scopes
+            self._trie = PrefixTrie(default=self._all)
+            for prefix in prefixes:
+                self._trie.insert(prefix, active(prefix))
+        self._compiled = len(hooks)
+
+    def get_hooks(self, path: str) -> Tuple[ActiveHook, ...]:
+        if self._compiled != len(self.hooks):
+            self.compile()
+
+        trie = self._trie
+        if trie is None:
+            return self._all
+        return trie.lookup(path)  # type: ignore[return-value]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        scope_type = scope["type"]
+        if scope_type == "http":
+            hooks = self.get_hooks(scope["path"])
+            for idx in range(len(hooks) - 1, -1, -1):
+                hook_idx, hook_type, func = hooks[idx]
+                if hook_type != "request":
+                    continue
+
+                try:
+                    await func(request)
+                except Exception as exc:
+                    response = await get_exception_response(exc)
+                    await response(
+                        scope, receive, self.wrap_send(send, hooks, hook_idx + 1)
+                    )
+                    return
+
+            send = self.wrap_send(send, hooks, 0)
+
+        elif scope_type == "websocket":
+            hooks = self.get_hooks(scope["path"])
+            for idx in range(len(hooks) - 1, -1, -1):
+                _, hook_type, func = hooks[idx]
+                if hook_type == "websocket":
+                    await func(websocket)
+
+        await self.app(scope, receive, send)
+
+    def wrap_send(self, send: Send, hooks: Sequence[ActiveHook], start: int) -> Send:
+        """
+        Call the ``response`` hooks added after the hook at ``start`` index, when the response starts.
+        """
+
+        funcs = [
+            func
+            for idx, hook_type, func in hooks
+            if hook_type == "response" and idx >= start
+        ]
+        if not funcs:
+            return send
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                response = ResponseHead(message["status"], list(message["headers"]))
+                for func in funcs:
+                    await func(response)
+                message = {
+                    **message,
+                    "status": response.status_code,
+                    "headers": response.raw_headers,
+                }
+            await send(message)
+
+        return send_wrapper
@@ -0,0 +1,360 @@
+"""
+Response compression negotiated with the ``Accept-Encoding`` header.
+
+```python
+from fastack.middleware import CompressionMiddleware
+
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+```
+
+Bodies are compressed while they are sent, chunk by chunk, so streaming responses
+are never buffered. Compressed variants of responses with an ``ETag`` are kept in a cache
+(``fastack.cache.MemoryCache`` by default), keyed by a digest of the uncompressed body,
+repeated hits are sent without compressing them again. The compressed variants have
+a weak ``ETag``, they aren't byte for byte the response of the application.
+
+``br`` is available if `brotli <https://github.com/google/brotli>`_ is installed
+(``pip install brotli``), ``gzip`` and ``deflate`` are always available.
+"""
+
+import hashlib
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..cache import CacheBackend, CachedResponse, MemoryCache
+from ..routing import PathScope
+
+DEFAULT_ENCODINGS = ("br", "gzip", "deflate")
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+class Compressor:
+    """
+    Base class of streaming compressors.
+    """
+
+    encoding = ""
+
+    def __init__(self, level: Optional[int] = None) -> None:
+        pass  # pragma: no cover
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress a chunk, the output is flushed so the client can decode it right away.
+        """
+
+        raise NotImplementedError  # pragma: no cover
+
+    def finish(self, data: bytes = b"") -> bytes:
+        """
+        Compress the last chunk and end the stream.
+        """
+
+        raise NotImplementedError  # pragma: no cover
+
+
+class GzipCompressor(Compressor):
+    encoding = "gzip"
+    wbits = zlib.MAX_WBITS | 16
+
+    def __init__(self, level: Optional[int] = None) -> None:
+        self._compressor = zlib.compressobj(
+            6 if level is None else level, zlib.DEFLATED, self.wbits
+        )
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = self._compressor
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        compressor = self._compressor
+        return compressor.compress(data) + compressor.flush(zlib.Z_FINISH)
+
+
+class DeflateCompressor(GzipCompressor):
+    encoding = "deflate"
+    wbits = zlib.MAX_WBITS
+
+
+class BrotliCompressor(Compressor):
+    encoding = "br"
+
+    def __init__(self, level: Optional[int] = None) -> None:
+        import brotli  # type: ignore[import]
+
+        self._compressor = brotli.Compressor(quality=4 if level is None else level)
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = self._compressor
+        return compressor.process(data) + compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        compressor = self._compressor
+        return compressor.process(data) + compressor.finish()
+
+
+def available_compressors() -> Dict[str, Type[Compressor]]:
+    compressors: Dict[str, Type[Compressor]] = {
+        GzipCompressor.encoding: GzipCompressor,
+        DeflateCompressor.encoding: DeflateCompressor,
+    }
+    try:
+        import brotli  # type: ignore[import]  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        compressors[BrotliCompressor.encoding] = BrotliCompressor
+    return compressors
+
+
+def negotiate_encoding(accept_encoding: str, encodings: Sequence[str]) -> Optional[str]:
+    """
+    Select the encoding of a response from the ``Accept-Encoding`` header.
+
+    Args:
+        accept_encoding: Value of the header, e.g. ``gzip, br;q=0.9``.
+        encodings: Supported encodings, from the preferred one.
+
+    Returns:
+        The encoding with the highest quality (the preferred one for ties),
+        ``None`` if the body must not be compressed.
+    """
+
+    qualities: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compress responses according to the ``Accept-Encoding`` header of the request.
+
+    Args:
+        app: ASGI application.
+        minimum_size: Responses smaller than this (in bytes) are not compressed.
+            Streaming responses are always compressed.
+        encodings: Supported encodings, from the preferred one (``br``, ``gzip``, ``deflate``).
+            Encodings that are not available are ignored.
+        levels: Compression level per encoding, e.g. ``{"gzip": 9}``.
+        content_types: Prefixes of the compressible content types.
+        cache: Cache of compressed responses, ``None`` for a ``MemoryCache``
+            with ``cache_entries`` and ``cache_size``.
+        cache_entries: Maximum number of compressed responses in the memory cache, 0 to disable the cache.
+        cache_size: Maximum size in bytes of the memory cache.
+        cache_ttl: Time to live in seconds of the compressed responses.
+        include: Path prefixes where the middleware is applied.
+        exclude: Path prefixes where the middleware is not applied.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        minimum_size: int = 500,
+        encodings: Sequence[str] = DEFAULT_ENCODINGS,
+        levels: Optional[Dict[str, int]] = None,
+        content_types: Sequence[str] = COMPRESSIBLE_TYPES,
+        cache: Optional[CacheBackend] = None,
+        cache_entries: int = 256,
+        cache_size: int = 16 * 1024 * 1024,
+        cache_ttl: float = 300.0,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        compressors = available_compressors()
+        self.compressors = {
+            encoding: compressors[encoding]
+            for encoding in encodings
+            if encoding in compressors
+        }
+        self.encodings = tuple(self.compressors)
+        self.levels = levels or {}
+        self.content_types = tuple(content_types)
+        if cache is None and cache_entries > 0:
+            cache = MemoryCache(cache_entries, cache_size)
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.path_scope = PathScope.create(include, exclude)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (
+            self.path_scope is not None
+            and not self.path_scope.match(scope.get("path", ""))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding")
+        encoding = accept_encoding and negotiate_encoding(
+            accept_encoding, self.encodings
+        )
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, scope, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def create_compressor(self, encoding: str) -> Compressor:
+        return self.compressors[encoding](self.levels.get(encoding))
+
+    def is_compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", ""):
+            return False
+        return headers.get("content-type", "").startswith(self.content_types)
+
+    def get_cache_key(
+        self, headers: Headers, encoding: str, body: bytes
+    ) -> Optional[str]:
+        """
+        Get the key of a compressed response in the cache,
+        ``None`` if the response has no ``ETag``.
+
+        The key is a digest of the uncompressed body: an ETag built from a version token
+        (see ``fastack.etag``) can be the same for bodies that differ, e.g. per user.
+        """
+
+        if (
+            self.cache is None
+            or "etag" not in headers
+            or "no-store" in headers.get("cache-control", "")
+        ):
+            return None
+
+        return f"{encoding}:{hashlib.blake2b(body, digest_size=16).hexdigest()}"
+
+
+class CompressionResponder:
+    """
+    Compress the messages of a response.
+    """
+
+    def __init__(
+        self, middleware: CompressionMiddleware, scope: Scope, encoding: str, send: Send
+    ) -> None:
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[Compressor] = None
+        # Messages are passed through once the response is known to be uncompressed
+        self.passthrough = False
+
+    def _compressed_headers(self, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = MutableHeaders(raw=list(self.start_message["headers"]))  # type: ignore[index]
+        headers["Content-Encoding"] = self.encoding
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+        return headers.raw
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if not self.middleware.is_compressible(headers):
+                self.passthrough = True
+                await self._send(message)
+                return
+
+            mutable = MutableHeaders(raw=list(message["headers"]))
+            mutable.add_vary_header("Accept-Encoding")
+            self.start_message = {**message, "headers": mutable.raw}
+            return
+
+        if message_type != "http.response.body":
+            await self._send(message)  # pragma: no cover
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body:
+                await self.send_whole(body)
+                return
+
+            # Streaming response, compressed chunk by chunk
+            self.compressor = self.middleware.create_compressor(self.encoding)
+            start = {**self.start_message, "headers": self._compressed_headers(None)}  # type: ignore[arg-type]
+            await self._send(start)
+
+        if more_body:
+            chunk = self.compressor.compress(body) if body else b""
+        else:
+            chunk = self.compressor.finish(body)
+        await self._send(
+            {"type": "http.response.body", "body": chunk, "more_body": more_body}
+        )
+
+    async def send_whole(self, body: bytes):
+        """
+        Send a response that has a single body message.
+        """
+
+        middleware = self.middleware
+        start = self.start_message
+        if len(body) < middleware.minimum_size or start["status"] in (204, 304):  # type: ignore[index]
+            await self._send(start)  # type: ignore[arg-type]
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        cache = middleware.cache
+        key = middleware.get_cache_key(
+            Headers(raw=start["headers"]), self.encoding, body  # type: ignore[index]
+        )
+        cached = await cache.get(key) if key is not None else None  # type: ignore[union-attr]
+        if cached is not None:
+            compressed = cached.body
+        else:
+            compressed = middleware.create_compressor(self.encoding).finish(body)
+            if key is not None:
+                value = CachedResponse(200, [], compressed)
+                await cache.set(key, value, middleware.cache_ttl)  # type: ignore[union-attr]
+
+        await self._send(
+            {**start, "headers": self._compressed_headers(len(compressed))}  # type: ignore[arg-type]
+        )
+        await self._send({"type": "http.response.body", "body": compressed})
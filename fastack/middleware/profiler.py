@@ -0,0 +1,374 @@
+import asyncio
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import time
+import types
+from contextvars import ContextVar
+from functools import wraps
+from pstats import Stats
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+PROFILE_FORMATS = ("pstats", "speedscope")
+
+
+def sign_profile_token(secret: str, path: str, expires_in: int = 300) -> str:
+    """
+    Create a token to profile a request, it must be sent in the profiler header.
+
+    Args:
+        secret: Value of ``PROFILER_SECRET`` setting.
+        path: Request path (e.g. ``/user/1``).
+        expires_in: Validity of the token in seconds.
+    """
+
+    expires = int(time.time()) + expires_in
+    return f"{expires}.{_signature(secret, expires, path)}"
+
+
+def _signature(secret: str, expires: int, path: str) -> str:
+    msg = f"{expires}:{path}".encode()
+    return hmac.new(secret.encode(), msg, hashlib.sha256).hexdigest()
+
+
+def verify_profile_token(secret: str, path: str, token: str) -> bool:
+    """
+    Check if the token is valid for the path and hasn't expired.
+    """
+
+    expires, _, signature = token.partition(".")
+    try:
+        expires_at = int(expires)
+    except ValueError:
+        return False
+
+    if expires_at < time.time():
+        return False
+
+    return hmac.compare_digest(signature, _signature(secret, expires_at, path))
+
+
+class SpeedscopeProfiler:
+    """
+    Deterministic profiler that records the call events of Python functions
+    and exports them in the speedscope "evented" format (https://www.speedscope.app).
+
+    It has the same ``enable()`` / ``disable()`` API as ``cProfile.Profile``.
+
+    Args:
+        start: Start time (``perf_counter_ns``) of the profile, default now.
+            The profilers of the worker threads use the start of the request.
+    """
+
+    def __init__(self, start: Optional[int] = None) -> None:
+        self.frames: List[Dict[str, Any]] = []
+        self.events: List[Dict[str, Any]] = []
+        self._frame_index: Dict[Tuple[str, str, int], int] = {}
+        self._stack: List[int] = []
+        self._start = time.perf_counter_ns() if start is None else start
+        self._end = 0
+        self._ignored = (self.disable.__code__,)
+
+    def _now(self) -> int:
+        return time.perf_counter_ns() - self._start
+
+    def _trace(self, frame: types.FrameType, event: str, arg: Any):
+        if event == "call":
+            code = frame.f_code
+            if code in self._ignored:
+                return
+
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            idx = self._frame_index.get(key)
+            if idx is None:
+                idx = self._frame_index[key] = len(self.frames)
+                self.frames.append({"name": key[0], "file": key[1], "line": key[2]})
+
+            self._stack.append(idx)
+            self.events.append({"type": "O", "frame": idx, "at": self._now()})
+
+        elif event == "return" and self._stack:
+            idx = self._stack.pop()
+            self.events.append({"type": "C", "frame": idx, "at": self._now()})
+
+    def enable(self):
+        sys.setprofile(self._trace)
+
+    def disable(self):
+        sys.setprofile(None)
+        now = self._now()
+        # Frames suspended at an ``await`` are closed by a "return" event,
+        # only the frames of the caller are still open.
+        while self._stack:
+            idx = self._stack.pop()
+            self.events.append({"type": "C", "frame": idx, "at": now})
+        self._end = now
+
+    def _profile(self, name: str, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "type": "evented",
+            "name": name,
+            "unit": "nanoseconds",
+            "startValue": 0,
+            "endValue": self._end,
+            "events": events,
+        }
+
+    def export(
+        self, name: str, threads: Sequence["SpeedscopeProfiler"] = ()
+    ) -> Dict[str, Any]:
+        """
+        Export the profile, the profilers of the worker threads are added as other profiles.
+        """
+
+        frames = list(self.frames)
+        frame_index = dict(self._frame_index)
+        profiles = [self._profile(name, self.events)]
+        for idx, thread in enumerate(threads, 1):
+            # The frames are shared by all profiles of the file
+            mapping = []
+            for key, frame in zip(thread._frame_index, thread.frames):
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append(frame)
+                mapping.append(frame_index[key])
+
+            events = [
+                {**event, "frame": mapping[event["frame"]]} for event in thread.events
+            ]
+            profiles.append(thread._profile(f"{name} (thread {idx})", events))
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "fastack",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def dump(
+        self, filename: str, name: str, threads: Sequence["SpeedscopeProfiler"] = ()
+    ):
+        with open(filename, "w") as fp:
+            json.dump(self.export(name, threads), fp)
+
+
+Profiler = Union[cProfile.Profile, SpeedscopeProfiler]
+
+
+@types.coroutine
+def _run_profiled(coro: Coroutine, profiler: Profiler) -> Generator[Any, Any, Any]:
+    """
+    Run the coroutine and enable the profiler only while it is executing,
+    so other requests handled by the event loop in the meantime are not profiled.
+    """
+
+    value: Any = None
+    error: Optional[BaseException] = None
+    while True:
+        profiler.enable()
+        try:
+            if error is not None:
+                exc, error = error, None
+                yielded = coro.throw(exc)
+            else:
+                yielded = coro.send(value)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            profiler.disable()
+
+        try:
+            value = yield yielded
+        except GeneratorExit:
+            coro.close()
+            raise
+        except BaseException as exc:
+            error = exc
+
+
+async def _profiled_task(coro: Coroutine, profiler: Profiler) -> Any:
+    return await _run_profiled(coro, profiler)
+
+
+# Profiler of the current request, tasks spawned by the request are profiled too
+# (e.g. ``BaseHTTPMiddleware`` runs the rest of the stack in a new task).
+_current_profiler: ContextVar[Optional[Profiler]] = ContextVar(
+    "_current_profiler", default=None
+)
+# Profilers of the worker threads used by the current request, see ``profile_sync``.
+_thread_profilers: ContextVar[Optional[List[Profiler]]] = ContextVar(
+    "_thread_profilers", default=None
+)
+
+
+def profile_sync(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a sync endpoint, so it's profiled in the worker thread when the request is profiled.
+
+    The context of the request is copied to the thread (threadpool or ``fastack.executors``),
+    the endpoint gets its own profiler because ``sys.setprofile`` only applies to the current thread.
+    It's merged into the profile of the request when it's written.
+    """
+
+    @wraps(func)
+    def endpoint(*args: Any, **kwds: Any) -> Any:
+        parent = _current_profiler.get()
+        threads = _thread_profilers.get()
+        if parent is None or threads is None:
+            return func(*args, **kwds)
+
+        profiler: Profiler
+        if isinstance(parent, cProfile.Profile):
+            profiler = cProfile.Profile()
+        else:
+            profiler = SpeedscopeProfiler(start=parent._start)
+
+        threads.append(profiler)
+        profiler.enable()
+        try:
+            return func(*args, **kwds)
+        finally:
+            profiler.disable()
+
+    return endpoint
+
+
+class _ProfilingTaskFactory:
+    def __init__(self, parent: Optional[Callable[..., asyncio.Future]]) -> None:
+        self.parent = parent
+
+    def __call__(
+        self, loop: asyncio.AbstractEventLoop, coro: Coroutine, **kwargs: Any
+    ) -> asyncio.Future:
+        profiler = _current_profiler.get()
+        if profiler is not None and asyncio.iscoroutine(coro):
+            coro = _profiled_task(coro, profiler)
+
+        if self.parent is None:
+            return asyncio.Task(coro, loop=loop, **kwargs)
+        return self.parent(loop, coro, **kwargs)
+
+
+def _install_task_factory():
+    loop = asyncio.get_running_loop()
+    factory = loop.get_task_factory()
+    if not isinstance(factory, _ProfilingTaskFactory):
+        loop.set_task_factory(_ProfilingTaskFactory(factory))
+
+
+class ProfilerMiddleware:
+    """
+    Profiles only the chosen requests and writes the output to a directory.
+
+    A request is profiled if it has a valid signed token (see ``sign_profile_token``)
+    in the profiler header, or if it is picked by the sampling rate.
+
+    The middleware is added on top of the whole middleware stack when the
+    ``PROFILER_ENABLED`` setting is ``True``, so the profile covers all middlewares,
+    dependency resolution, the responder and the serialization.
+
+    notes:
+        - Tasks spawned by the request are profiled too.
+        - Sync responders are profiled in their worker thread (see ``profile_sync``),
+          sync dependencies are not.
+
+    Args:
+        app: ASGI application.
+        output_dir: Directory for the profile files.
+        format: ``pstats`` (``cProfile``) or ``speedscope``.
+        sample_rate: Fraction of requests to profile (``0.0`` - ``1.0``).
+        secret: Secret to verify the signed token. If not provided, the header is ignored.
+        header: Header name that contains the signed token.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        output_dir: str = "profiles",
+        format: str = "pstats",
+        sample_rate: float = 0.0,
+        secret: Optional[str] = None,
+        header: str = "X-Fastack-Profile",
+    ) -> None:
+        assert (
+            format in PROFILE_FORMATS
+        ), f"format must be one of {', '.join(PROFILE_FORMATS)}"
+        self.app = app
+        self.output_dir = output_dir
+        self.format = format
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.header = header
+
+    def should_profile(self, scope: Scope) -> bool:
+        if self.secret:
+            token = Headers(scope=scope).get(self.header)
+            if token and verify_profile_token(self.secret, scope["path"], token):
+                return True
+
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def get_filename(self, scope: Scope) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        ext = "prof" if self.format == "pstats" else "speedscope.json"
+        return f"{time.time_ns()}-{scope['method']}-{slug}.{ext}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profiler: Profiler
+        if self.format == "pstats":
+            profiler = cProfile.Profile()
+        else:
+            profiler = SpeedscopeProfiler()
+
+        _install_task_factory()
+        threads: List[Profiler] = []
+        token = _current_profiler.set(profiler)
+        threads_token = _thread_profilers.set(threads)
+        try:
+            await _run_profiled(self.app(scope, receive, send), profiler)
+        finally:
+            _thread_profilers.reset(threads_token)
+            _current_profiler.reset(token)
+            self.dump(scope, profiler, threads)
+
+    def dump(self, scope: Scope, profiler: Profiler, threads: Sequence[Profiler] = ()):
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = os.path.join(self.output_dir, self.get_filename(scope))
+        if isinstance(profiler, cProfile.Profile):
+            if not threads:
+                profiler.dump_stats(filename)
+                return
+
+            stats = Stats(profiler)
+            for thread in threads:
+                stats.add(thread)
+            stats.dump_stats(filename)
+        else:
+            profiler.dump(
+                filename, f"{scope['method']} {scope['path']}", threads  # type: ignore[arg-type]
+            )
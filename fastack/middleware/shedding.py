@@ -0,0 +1,218 @@
+"""
+Adaptive load shedding, driven by the queueing delay of the requests.
+
+```python
+from fastack.middleware import LoadSheddingMiddleware
+
+app.add_middleware(LoadSheddingMiddleware, target=0.005, interval=0.1)
+```
+
+The queueing delay is the time from the ASGI entry to the start of the handler
+(after the middlewares, the dependencies and the wait for a thread of sync responders).
+Like `CoDel <https://queue.acm.org/detail.cfm?id=2209336>`_, the minimum delay of each interval
+is compared with the target: a minimum above the target means a standing queue, the worker
+receives more requests than it can process.
+
+The shedder keeps a pressure between 0 and ``PRIORITY_CRITICAL``, raised in proportion to the
+minimum delay (gradient) while the worker is overloaded, and lowered by ``step`` when it isn't.
+A request of priority ``p`` is rejected with probability ``pressure - p`` (clamped to 0 - 1),
+so the lowest priorities are shed first:
+
+```python
+from fastack.constants import PRIORITY_CRITICAL, PRIORITY_LOW
+
+class ReportController(Controller):
+    priority = PRIORITY_LOW  # (1)
+
+class HealthController(Controller):
+    priority = PRIORITY_CRITICAL  # (2)
+```
+
+1. All routes of the controller, ``route(priority=...)`` sets the priority of a single route.
+   The default priority is ``PRIORITY_NORMAL``.
+2. Critical routes (e.g. health checks) are never shed. The routes of the application
+   (added with ``app.get``, ..., instead of a controller) are critical by default.
+
+The route decides as soon as it's matched (see ``fastack.routing.APIRoute``),
+shed requests get a ``503 Service Unavailable`` response with a ``Retry-After`` header.
+The decisions and the delays are recorded by the ``fastack.metrics`` plugin
+(``fastack_load_shedding_decisions_total`` and ``fastack_queue_delay_seconds``).
+"""
+
+import random
+from time import monotonic
+from typing import Callable, Optional, Sequence
+
+from fastapi import HTTPException
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..constants import PRIORITY_CRITICAL
+from ..context import _ctx_stack
+from ..routing import PathScope
+from ..utils import Stats, service_unavailable
+
+INF = float("inf")
+# Maximum increase of the pressure per interval, in multiples of ``step``
+MAX_GRADIENT = 10.0
+
+
+class SheddingStats(Stats):
+    """
+    Statistics of a ``LoadShedder``.
+
+    Attributes:
+        admitted: Number of admitted requests.
+        shed: Number of rejected requests.
+        overloaded: Number of intervals where the minimum delay was above the target.
+        min_delay: Minimum queueing delay (in seconds) of the last interval.
+    """
+
+    __slots__ = ("admitted", "shed", "overloaded", "min_delay")
+
+    def __init__(self) -> None:
+        self.admitted = self.shed = self.overloaded = 0
+        self.min_delay = 0.0
+
+
+class LoadShedder:
+    """
+    Decide which requests are admitted from the queueing delay.
+
+    Args:
+        target: Acceptable queueing delay in seconds.
+        interval: Length (in seconds) of the intervals where the minimum delay is measured.
+        step: Change of the pressure per interval, ``1.0`` is a whole priority.
+        random: Function that returns a random number in ``[0, 1)``.
+    """
+
+    def __init__(
+        self,
+        target: float = 0.005,
+        interval: float = 0.1,
+        step: float = 0.1,
+        random: Callable[[], float] = random.random,
+    ) -> None:
+        assert target > 0, "target must be greater than 0"
+        self.target = target
+        self.interval = interval
+        self.step = step
+        self.random = random
+        self.pressure = 0.0
+        self.stats = SheddingStats()
+        self._min_delay = INF
+        self._interval_end: Optional[float] = None
+
+    def _tick(self, now: Optional[float]):
+        if now is None:
+            now = monotonic()
+        if self._interval_end is None:
+            self._interval_end = now + self.interval
+            return
+        if now < self._interval_end:
+            return
+
+        # Number of finished intervals, the idle ones lower the pressure too
+        intervals = int((now - self._interval_end) // self.interval) + 1
+        self._interval_end += intervals * self.interval
+        min_delay = self._min_delay
+        self._min_delay = INF
+        self.stats.min_delay = 0.0 if min_delay == INF else min_delay
+        if min_delay != INF and min_delay > self.target:
+            gradient = min(min_delay / self.target, MAX_GRADIENT)
+            self.pressure = min(
+                self.pressure + self.step * gradient, float(PRIORITY_CRITICAL)
+            )
+            self.stats.overloaded += 1
+        else:
+            self.pressure = max(self.pressure - self.step * intervals, 0.0)
+
+    def observe(self, delay: float, now: Optional[float] = None):
+        """
+        Record the queueing delay (in seconds) of a request.
+        """
+
+        self._tick(now)
+        if delay < self._min_delay:
+            self._min_delay = delay
+
+    def admit(self, priority: int, now: Optional[float] = None) -> bool:
+        """
+        Decide whether a request of the given priority is admitted.
+        """
+
+        stats = self.stats
+        if priority < PRIORITY_CRITICAL:
+            self._tick(now)
+            probability = self.pressure - priority
+            if probability >= 1.0 or (
+                probability > 0.0 and self.random() < probability
+            ):
+                stats.shed += 1
+                return False
+
+        stats.admitted += 1
+        return True
+
+
+class LoadSheddingMiddleware:
+    """
+    Shed the requests of the lowest priorities when the queueing delay shows an overload.
+
+    Args:
+        app: ASGI application.
+        target: Acceptable queueing delay in seconds.
+        interval: Length (in seconds) of the intervals where the minimum delay is measured.
+        step: Change of the pressure per interval, ``1.0`` is a whole priority.
+        retry_after: Value (in seconds) of the ``Retry-After`` header of shed requests.
+        include: Path prefixes where the middleware is applied.
+        exclude: Path prefixes where the middleware is not applied (never shed nor measured).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        target: float = 0.005,
+        interval: float = 0.1,
+        step: float = 0.1,
+        retry_after: int = 1,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ) -> None:
+        self.app = app
+        self.shedder = LoadShedder(target, interval, step)
+        self.retry_after = retry_after
+        self.path_scope = PathScope.create(include, exclude)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (
+            self.path_scope is not None
+            and not self.path_scope.match(scope.get("path", ""))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        # The decision is made by the route, when its priority is known
+        scope["fastack.shedder"] = self
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ctx = _ctx_stack.get(None)
+            if ctx is not None and ctx.started and ctx.handler_started:
+                delay = (ctx.handler_started - ctx.started) / 1e9
+                self.shedder.observe(delay)
+                metrics = getattr(ctx.app, "metrics", None)
+                if metrics is not None:
+                    metrics.queue_delay.observe(delay)
+
+    def admit(self, priority: int) -> bool:
+        admitted = self.shedder.admit(priority)
+        ctx = _ctx_stack.get(None)
+        metrics = getattr(ctx.app, "metrics", None) if ctx is not None else None
+        if metrics is not None:
+            decision = "admitted" if admitted else "shed"
+            metrics.load_shedding.labels(decision, priority).inc()
+        return admitted
+
+    def reject(self) -> HTTPException:
+        return service_unavailable(self.retry_after)
@@ -1,13 +1,34 @@
-from typing import Any, List, Optional, Sequence, Type
+import json
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type, Union
 
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
+from .encoders import get_renderer
+from .etag import apply_etag
 from .pagination import PageNumberPagination, Pagination
+from .streaming import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CHUNK_SIZE,
+    DataSource,
+    ItemStream,
+    iterate,
+)
+from .timing import current_timings
 
 
 class ListControllerMixin:
+    """
+    Attributes:
+        pagination_class: Class to be used for pagination.
+        stream_chunk_size: Size (in bytes) of the chunks sent by ``get_streaming_response``.
+        stream_batch_size: Number of items read at once in the threadpool
+            from blocking iterables by ``get_streaming_response``.
+    """
+
     pagination_class: Type[Pagination] = PageNumberPagination
+    stream_chunk_size: int = DEFAULT_CHUNK_SIZE
+    stream_batch_size: int = DEFAULT_BATCH_SIZE
 
     def paginate(self, data: Sequence, page: int = 1, page_size: int = 10) -> Sequence:
         """
@@ -23,13 +44,8 @@ class ListControllerMixin:
         if self.pagination_class:
             data = self.pagination_class(page, page_size).paginate(data)
 
-        results = []
-        for o in data:
-            o = self.serialize_data(o)  # type: ignore[attr-defined]
-            o = jsonable_encoder(o)
-            results.append(o)
-
-        return results
+        encode = self.get_encoder()  # type: ignore[attr-defined]
+        return [encode(o) for o in data]
 
     def get_total_data(self, data: Any):
         """
@@ -63,6 +79,32 @@ class ListControllerMixin:
             )
         )
 
+    def get_paging(
+        self, page: int, page_size: int, total_data: Optional[int]
+    ) -> Dict[str, Any]:
+        """
+        Get the ``paging`` object of paginated responses.
+
+        Args:
+            page: Page number.
+            page_size: Page size.
+            total_data: Number of items of all pages, ``None`` if it's unknown.
+        """
+
+        pages = None
+        if total_data is not None:
+            pages = self.get_total_page(total_data, page_size)
+
+        prev_page = page - 1
+        if prev_page < 1 or (pages is not None and prev_page not in pages):
+            prev_page = None  # type: ignore[assignment]
+
+        next_page = page + 1
+        if pages is not None and next_page not in pages:
+            next_page = None  # type: ignore[assignment]
+
+        return {"next": next_page, "prev": prev_page, "pages": pages}
+
     def get_paginated_response(
         self,
         data: Sequence,
@@ -71,6 +113,7 @@ class ListControllerMixin:
         *,
         status: int = 200,
         headers: Optional[dict] = None,
+        etag: Union[None, bool, str] = None,
         **kwargs: Any,
     ) -> JSONResponse:
         """
@@ -82,26 +125,134 @@ class ListControllerMixin:
             page_size: Page size.
             status: HTTP status code.
             headers: HTTP headers.
+            etag: ``True`` to add an ETag computed from the body, or a version token of the data
+                (see ``Controller.json``).
             **kwargs (optional): Additional arguments to be passed to the JSONResponse.
         """
 
+        etag = self.resolve_etag(etag, status)  # type: ignore[attr-defined]
+        if isinstance(etag, str):
+            not_modified = self.not_modified(etag)  # type: ignore[attr-defined]
+            if not_modified is not None:
+                return not_modified  # type: ignore[no-any-return]
+            headers = {**(headers or {}), "ETag": etag}
+
         # Counting all pages
         total_data = self.get_total_data(data)
-        pages = self.get_total_page(total_data, page_size)
-        prev_page = page - 1
-        if prev_page not in pages:
-            prev_page = None  # type: ignore[assignment]
-
-        next_page = page + 1
-        if next_page not in pages:
-            next_page = None  # type: ignore[assignment]
+        paging = self.get_paging(page, page_size, total_data)
 
         # Get data per page
+        timings = current_timings()
+        start = perf_counter_ns() if timings is not None else 0
         data = self.paginate(data, page, page_size)
+        if timings is not None:
+            start = timings.add_encode(start)
+
         total = self.get_total_data(data)
         content = {
             "total": total,
-            "paging": {"next": next_page, "prev": prev_page, "pages": pages},
+            "paging": paging,
             "data": data,
         }
-        return JSONResponse(content, status_code=status, headers=headers, **kwargs)
+        response_class = self.get_json_response_class()  # type: ignore[attr-defined]
+        response = response_class(
+            content, status_code=status, headers=headers, **kwargs
+        )
+        if timings is not None:
+            timings.add_render(start)
+        if etag is True:
+            response = apply_etag(response)
+        return response
+
+    def get_renderer(
+        self, response_class: Optional[Type[JSONResponse]] = None
+    ) -> Callable[[Any], bytes]:
+        """
+        Get the function used to convert an item to JSON bytes in streaming responses.
+        """
+
+        if response_class is None:
+            response_class = self.get_json_response_class()  # type: ignore[attr-defined]
+
+        encode = self.get_encoder(response_class)  # type: ignore[attr-defined]
+        render = get_renderer(response_class)
+        return lambda obj: render(encode(obj))
+
+    def get_streaming_response(
+        self,
+        data: DataSource,
+        page: Optional[int] = None,
+        page_size: Optional[int] = None,
+        *,
+        total: Optional[int] = None,
+        ndjson: bool = False,
+        status: int = 200,
+        headers: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> StreamingResponse:
+        """
+        Return a streaming response, the items are encoded and sent in chunks while the data is iterated.
+        Use it for large pages and exports, the whole list is never kept in memory.
+
+        The body is a JSON object with the same keys as ``get_paginated_response``
+        (``data`` comes first, ``total`` and ``paging`` are sent after the last item),
+        or one JSON document per line if ``ndjson`` is true.
+
+        Args:
+            data: List, iterable (e.g. generator, database cursor) or async iterable.
+                Blocking iterables are read in the threadpool, see ``stream_batch_size``.
+            page: Page number, if not provided all data is sent.
+            page_size: Page size.
+            total: Number of items of all pages. If not provided,
+                it is computed with ``get_total_data`` when the data has a length.
+                Otherwise ``paging.pages`` is null.
+            ndjson: Send newline delimited JSON (``application/x-ndjson``), without ``total`` and ``paging``.
+            status: HTTP status code.
+            headers: HTTP headers.
+            **kwargs (optional): Additional arguments to be passed to the StreamingResponse.
+        """
+
+        if total is None and hasattr(data, "__len__"):
+            total = self.get_total_data(data)
+
+        if page is not None:
+            page_size = page_size or 10
+            pagination = self.pagination_class(page, page_size)
+            if isinstance(data, (list, tuple)):
+                data = pagination.paginate(data)
+            else:
+                data = pagination.paginate_iterable(data)
+
+        render = self.get_renderer()
+        items = iterate(data, self.stream_batch_size)
+        if ndjson:
+            stream = ItemStream(
+                items, render, separator=b"\n", chunk_size=self.stream_chunk_size
+            )
+            content = stream.chunks(suffix=lambda: b"\n" if stream.count else b"")
+            media_type = "application/x-ndjson"
+
+        else:
+            stream = ItemStream(items, render, chunk_size=self.stream_chunk_size)
+
+            def end() -> bytes:
+                if page is None:
+                    paging = {"next": None, "prev": None, "pages": [1]}
+                else:
+                    paging = self.get_paging(page, page_size, total)  # type: ignore[arg-type]
+                    if total is None and stream.count < page_size:  # type: ignore[operator]
+                        paging["next"] = None
+
+                paging_json = json.dumps(paging, separators=(",", ":"))
+                return f'],"total":{stream.count},"paging":{paging_json}}}'.encode()
+
+            content = stream.chunks(b'{"data":[', end)
+            media_type = "application/json"
+
+        return StreamingResponse(
+            content,
+            status_code=status,
+            headers=headers,
+            media_type=media_type,
+            **kwargs,
+        )
@@ -0,0 +1,258 @@
+"""
+Serialization of large JSON payloads outside of the event loop.
+
+``Controller.json`` encodes and renders the data on the event loop thread,
+a large payload blocks every other connection of the worker while it's serialized.
+With a threshold, payloads whose cost (see ``estimate_cost``) reaches it are serialized
+in a thread or process pool when the response is sent, smaller payloads stay inline:
+
+```python
+JSON_OFFLOAD_THRESHOLD = 1000  # number of items, None to disable (default)
+JSON_OFFLOAD_EXECUTOR = "thread"  # or "process"
+JSON_OFFLOAD_WORKERS = None  # size of the pool (default number of CPUs)
+```
+
+Threads keep the event loop responsive (the interpreter switches between threads),
+they have their own ``fastack.executors.Executor`` (``json-offload``), so large payloads
+don't wait behind sync responders. Processes also render in parallel, the data is encoded
+to JSON types by the caller (so objects with ``serialize`` and ORM instances are never pickled)
+and only rendered in the pool.
+
+The number of offloaded and inline payloads and the offloaded durations are available in
+``OffloadPolicy.stats`` and in the ``fastack.metrics`` plugin
+(``fastack_json_offload_seconds`` and ``fastack_json_inline_total``).
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+from starlette.background import BackgroundTask
+from starlette.types import Receive, Scope, Send
+
+from .context import _ctx_stack
+from .encoders import JSONBackend
+from .etag import apply_etag
+from .executors import Executor
+from .utils import Stats
+
+EXECUTORS = ("thread", "process")
+COLLECTION_TYPES = (list, tuple, set, frozenset, dict)
+
+
+def estimate_cost(data: Any) -> int:
+    """
+    Estimate the cost of serializing data, the number of items of a collection.
+    The values of a dictionary are counted too (e.g. ``{"items": [...]}``).
+    """
+
+    if not isinstance(data, COLLECTION_TYPES):
+        return 1
+
+    cost = len(data)
+    if isinstance(data, dict):
+        for value in data.values():
+            if isinstance(value, COLLECTION_TYPES):
+                cost += len(value)
+    return cost
+
+
+def in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # e.g. a sync responder running in the threadpool
+        return False
+    return True
+
+
+def render_json(content: Any, backend: JSONBackend) -> bytes:
+    """
+    Render encoded content, used by the process pool.
+    """
+
+    return backend.dumps(content)
+
+
+class OffloadStats(Stats):
+    """
+    Statistics of an ``OffloadPolicy``.
+
+    Attributes:
+        offloaded: Number of payloads serialized in the pool.
+        inline: Number of payloads below the threshold, serialized on the event loop.
+        seconds: Total duration (in seconds) of the offloaded serializations,
+            including the time waiting for a worker.
+        max_seconds: Longest offloaded serialization.
+    """
+
+    __slots__ = ("offloaded", "inline", "seconds", "max_seconds")
+
+    def __init__(self) -> None:
+        self.offloaded = self.inline = 0
+        self.seconds = self.max_seconds = 0.0
+
+
+class OffloadPolicy:
+    """
+    Decide which JSON payloads are serialized outside of the event loop, and run them.
+
+    Args:
+        threshold: Minimum cost of an offloaded payload.
+        executor: ``thread`` (default) or ``process``.
+        max_workers: Size of the pool, default the number of CPUs.
+    """
+
+    def __init__(
+        self,
+        threshold: int,
+        executor: str = "thread",
+        max_workers: Optional[int] = None,
+    ) -> None:
+        assert executor in EXECUTORS, f"Unknown executor {executor!r}"
+        self.threshold = threshold
+        self.executor = executor
+        self.max_workers = max_workers
+        self.stats = OffloadStats()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Also used by the payloads that can't be sent to the process pool
+        self._executor = Executor("json-offload", max_workers or os.cpu_count() or 1)
+
+    def should_offload(self, cost: int) -> bool:
+        """
+        Check whether a payload must be serialized in the pool,
+        the payloads serialized inline are counted in the stats.
+        """
+
+        if cost >= self.threshold and in_event_loop():
+            return True
+
+        self.stats.inline += 1
+        ctx = _ctx_stack.get(None)
+        metrics = getattr(ctx.app, "metrics", None) if ctx is not None else None
+        if metrics is not None:
+            metrics.json_inline.inc()
+        return False
+
+    async def run(
+        self, func: Callable[..., bytes], *args: Any, process: bool = True
+    ) -> bytes:
+        """
+        Run a serialization in the pool and record its duration.
+
+        Args:
+            func: Function that returns the body.
+            process: Whether the function and its arguments can be sent to the process pool,
+                otherwise the thread pool is used.
+        """
+
+        executor = self.executor if process else "thread"
+        start = perf_counter()
+        if executor == "process":
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.max_workers)
+            loop = asyncio.get_running_loop()
+            body = await loop.run_in_executor(self._pool, func, *args)
+        else:
+            body = await self._executor.run(func, *args)
+
+        elapsed = perf_counter() - start
+        stats = self.stats
+        stats.offloaded += 1
+        stats.seconds += elapsed
+        if elapsed > stats.max_seconds:
+            stats.max_seconds = elapsed
+
+        ctx = _ctx_stack.get(None)
+        metrics = getattr(ctx.app, "metrics", None) if ctx is not None else None
+        if metrics is not None:
+            metrics.json_offload.labels(executor).observe(elapsed)
+        return body
+
+    def shutdown(self):
+        self._executor.shutdown()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+class OffloadedJSONResponse(JSONResponse):
+    """
+    JSON response whose body is rendered in the pool of an ``OffloadPolicy`` when it's sent.
+    Accessing ``body`` before renders it inline.
+
+    Args:
+        render: Function called with ``args`` to get the body.
+        args: Arguments of ``render``.
+        policy: Policy that runs the function.
+        process: Whether ``render`` can run in a process pool (picklable function and arguments).
+        etag: Add an ETag computed from the body, see ``fastack.etag``.
+    """
+
+    def __init__(
+        self,
+        render: Callable[..., bytes],
+        args: Tuple[Any, ...],
+        policy: OffloadPolicy,
+        *,
+        process: bool = False,
+        etag: bool = False,
+        status_code: int = 200,
+        headers: Optional[dict] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None,
+    ) -> None:
+        self._render = render
+        self._args = args
+        self.policy = policy
+        self.process = process
+        self.etag = etag
+        self.status_code = status_code
+        if media_type is not None:
+            self.media_type = media_type
+        self.background = background
+        # Content-Length is added once the body is rendered
+        self._body: Optional[bytes] = b""
+        self.init_headers(headers)
+        self._body = None
+
+    @property  # type: ignore[override]
+    def body(self) -> bytes:
+        if self._body is None:
+            self._set_body(self._render(*self._args))
+        return self._body  # type: ignore[return-value]
+
+    @body.setter
+    def body(self, value: bytes):
+        self._body = value
+
+    def _set_body(self, body: bytes):
+        self._body = body
+        self._args = ()
+        if b"content-length" not in (key for key, _ in self.raw_headers):
+            self.raw_headers.append((b"content-length", str(len(body)).encode()))
+
+    async def render_body(self) -> bytes:
+        """
+        Render the body in the pool, if it's not rendered yet.
+        """
+
+        if self._body is None:
+            body = await self.policy.run(
+                self._render, *self._args, process=self.process
+            )
+            self._set_body(body)
+        return self._body  # type: ignore[return-value]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.render_body()
+        if self.etag:
+            response = apply_etag(self, scope=scope)
+            if response is not self:
+                await response(scope, receive, send)
+                return
+
+        await super().__call__(scope, receive, send)
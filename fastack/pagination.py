@@ -1,6 +1,9 @@
 from abc import ABCMeta, abstractmethod
+from itertools import islice
 from typing import Sequence
 
+from .streaming import DataSource, aislice, is_async_iterable
+
 
 class Pagination(metaclass=ABCMeta):
     """
@@ -14,6 +17,15 @@ class Pagination(metaclass=ABCMeta):
     def paginate(self, data: Sequence) -> Sequence:
         pass  # pragma: no cover
 
+    def paginate_iterable(self, data: DataSource) -> DataSource:
+        """
+        Paginate an iterable or async iterable (see ``get_streaming_response``).
+        """
+
+        raise NotImplementedError(
+            f"{type(self).__name__} doesn't support iterables"
+        )  # pragma: no cover
+
 
 class PageNumberPagination(Pagination):
     """
@@ -34,3 +46,10 @@ class PageNumberPagination(Pagination):
         offset = self.get_offset()
         limit = self.get_limit()
         return data[offset : offset + limit]
+
+    def paginate_iterable(self, data: DataSource) -> DataSource:
+        offset = self.get_offset()
+        stop = offset + self.get_limit()
+        if is_async_iterable(data):
+            return aislice(data, offset, stop)  # type: ignore[arg-type]
+        return islice(data, offset, stop)  # type: ignore[arg-type]
@@ -0,0 +1,493 @@
+"""
+Rate limit plugin, token buckets per route and per client key.
+
+Add it to the ``PLUGINS`` setting:
+
+```python
+PLUGINS = [
+    "fastack.ratelimit",
+]
+RATE_LIMITS = [
+    {"path": "/auth/login", "methods": ["POST"], "rate": "5/minute"},  # (1)
+    {"path": "/report", "rate": "10/second", "burst": 20, "key": "header:X-API-Key"},  # (2)
+    {"path": "/", "rate": "100/second", "key": "user"},  # (3)
+]
+RATE_LIMIT_SHARED_FILE = "/dev/shm/fastack-ratelimit"  # (4)
+```
+
+1. The bucket of each client IP (default key) gets 5 tokens per minute.
+2. ``burst`` is the size of the bucket (default ``rate`` tokens per unit, at least 1).
+3. ``user`` is the identity of ``scope["user"]``, the IP for anonymous users. It needs an
+   ``AuthenticationMiddleware`` in ``create_app(middleware=...)``, see below.
+   A key can also be the import path of a function ``key(scope) -> Optional[str]``.
+4. (optional) Share the buckets between the workers of the machine, see ``SharedBucketTable``.
+
+Each request takes a token from the bucket of the rule with the longest path prefix matching it
+(prefixes are matched by path segments, see ``fastack.routing.PrefixTrie``).
+Requests without a token get a ``429 Too Many Requests`` response with a ``Retry-After`` header.
+
+The decision is made in a pure ASGI middleware, so rejected requests don't reach the routing.
+It's added after the middlewares of ``create_app(middleware=...)`` (e.g. ``AuthenticationMiddleware``),
+and before the ones added with ``app.add_middleware``. The rejected requests are counted in
+``RateLimiter.stats`` and in the ``fastack.metrics`` plugin (``fastack_rate_limited_total``).
+
+Other settings:
+
+* ``RATE_LIMIT_SHARDS`` - Number of shards of the bucket table (default 16).
+* ``RATE_LIMIT_MAX_KEYS`` - Maximum number of buckets kept in memory (default 100000),
+  the least recently used buckets are dropped.
+* ``RATE_LIMIT_SLOTS`` - Number of buckets of the shared table (default 65536).
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from math import ceil
+from time import monotonic
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .routing import PrefixTrie
+from .utils import Stats, import_attr
+
+if TYPE_CHECKING:
+    from .app import Fastack  # pragma: no cover
+
+KeyFunction = Callable[[Scope], Optional[str]]
+
+RATE_UNITS = {
+    "second": 1.0,
+    "minute": 60.0,
+    "hour": 3600.0,
+    "day": 86400.0,
+}
+
+
+def parse_rate(rate: Union[str, float]) -> Tuple[float, float]:
+    """
+    Parse a rate like ``10/second``, ``100/minute`` or ``5/hour``.
+
+    Returns:
+        The number of tokens per second and the number of tokens per unit.
+    """
+
+    if not isinstance(rate, str):
+        return float(rate), float(rate)
+
+    amount, _, unit = rate.partition("/")
+    unit = unit.strip().lower().rstrip("s") or "second"
+    if unit not in RATE_UNITS:
+        raise ValueError(f"Unknown rate unit {unit!r} in {rate!r}")
+    tokens = float(amount)
+    return tokens / RATE_UNITS[unit], tokens
+
+
+def client_ip(scope: Scope) -> Optional[str]:
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+def header_key(name: str) -> KeyFunction:
+    """
+    Key function that reads a header, the client IP is used if the header is missing.
+    """
+
+    raw_name = name.lower().encode("latin-1")
+
+    def key(scope: Scope) -> Optional[str]:
+        for header, value in scope.get("headers", []):
+            if header == raw_name:
+                return value.decode("latin-1")
+        return client_ip(scope)
+
+    return key
+
+
+def user_key(scope: Scope) -> Optional[str]:
+    """
+    Key function that reads the identity (or the name) of the authenticated user
+    (``scope["user"]``), the client IP is used for anonymous users.
+
+    Raises:
+        RuntimeError: If ``scope["user"]`` isn't set, the authentication middleware must run first.
+    """
+
+    if "user" not in scope:
+        raise RuntimeError(
+            'The "user" rate limit key needs an AuthenticationMiddleware in create_app(middleware=...)'
+        )
+
+    user = scope["user"]
+    if not getattr(user, "is_authenticated", False):
+        return client_ip(scope)
+
+    try:
+        identity = user.identity
+    except NotImplementedError:
+        # e.g. ``SimpleUser`` of Starlette
+        identity = user.display_name
+    return "user:" + str(identity)
+
+
+def get_key_function(key: Union[str, KeyFunction]) -> KeyFunction:
+    """
+    Get the key function of a rule: ``ip``, ``user``, ``header:<name>``,
+    the import path of a function or a function.
+    """
+
+    if callable(key):
+        return key
+    if key == "ip":
+        return client_ip
+    if key == "user":
+        return user_key
+    if key.startswith("header:"):
+        return header_key(key[7:])
+    return import_attr(key)
+
+
+class RateLimitRule:
+    """
+    Rate limit of the requests matching a path prefix.
+
+    Args:
+        path: Path prefix of the requests.
+        rate: Tokens added to a bucket, e.g. ``10/second`` or a number per second.
+        burst: Size of the buckets, default the number of tokens per unit of ``rate`` (at least 1).
+        key: Key of the buckets, ``ip`` (default), ``user``, ``header:<name>``,
+            the import path of a function or a function that returns the key of a scope.
+            Requests without a key are not limited.
+        methods: HTTP methods of the requests, ``None`` for all methods.
+        name: Name of the rule (in the metrics), default the methods and the path.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        rate: Union[str, float],
+        burst: Optional[float] = None,
+        key: Union[str, KeyFunction] = "ip",
+        methods: Optional[Sequence[str]] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        self.path = path
+        self.rate, tokens = parse_rate(rate)
+        assert self.rate > 0, "rate must be greater than 0"
+        self.burst = float(burst if burst is not None else max(tokens, 1.0))
+        self.get_key = get_key_function(key)
+        self.methods = frozenset(m.upper() for m in methods) if methods else None
+        if name is None:
+            name = " ".join(sorted(self.methods) + [path]) if self.methods else path
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"<RateLimitRule {self.name!r} {self.rate}/s burst={self.burst}>"
+
+
+def refill(
+    tokens: float, last: float, rate: float, burst: float, now: float
+) -> Tuple[float, float]:
+    """
+    Take a token from a bucket.
+
+    Returns:
+        The tokens left and ``0.0`` if a token was taken,
+        otherwise the tokens and the seconds until the next token.
+    """
+
+    if now > last:
+        tokens = min(burst, tokens + (now - last) * rate)
+    if tokens >= 1.0:
+        return tokens - 1.0, 0.0
+    return tokens, (1.0 - tokens) / rate
+
+
+class BucketTable:
+    """
+    Token buckets of the current process, in a table split into shards.
+    Each shard has its own lock and a LRU order, so the table is bounded.
+
+    Args:
+        shards: Number of shards.
+        max_keys: Maximum number of buckets (of all shards).
+    """
+
+    def __init__(self, shards: int = 16, max_keys: int = 100000) -> None:
+        assert shards > 0, "shards must be greater than 0"
+        self.shards: List["OrderedDict[str, List[float]]"] = [
+            OrderedDict() for _ in range(shards)
+        ]
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.max_keys_per_shard = max(max_keys // shards, 1)
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        """
+        Take a token from the bucket of a key.
+
+        Returns:
+            ``0.0`` if a token was taken, otherwise the seconds until the next token.
+        """
+
+        index = hash(key) % len(self.shards)
+        shard = self.shards[index]
+        with self.locks[index]:
+            bucket = shard.get(key)
+            if bucket is None:
+                bucket = shard[key] = [burst, now]
+                if len(shard) > self.max_keys_per_shard:
+                    shard.popitem(last=False)
+            else:
+                shard.move_to_end(key)
+
+            bucket[0], wait = refill(bucket[0], bucket[1], rate, burst, now)
+            bucket[1] = now
+            return wait
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+
+_slot = struct.Struct("<Qdd")
+# Number of slots probed to find a bucket, the oldest one is replaced when they are all used
+PROBES = 8
+
+
+def hash_key(key: str) -> int:
+    """
+    Hash of a key that is the same in all processes (unlike ``hash()``), never 0.
+    """
+
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class SharedBucketTable:
+    """
+    Token buckets shared by the processes of a machine, in a memory-mapped file.
+
+    The file is an array of slots (key hash, tokens, time of the last update), split into shards.
+    A bucket is found by probing a few slots of its shard, the shard is locked
+    (``fcntl.lockf`` and a thread lock) while the bucket is updated.
+    The time is read from the monotonic clock, which is shared by the processes of the machine.
+
+    The file should be in a memory file system (e.g. ``/dev/shm``) and is created if missing,
+    all workers must use the same path and number of slots. Only available on Unix.
+
+    Args:
+        path: Path of the file.
+        slots: Number of buckets in the table.
+        shards: Number of shards, the unit of locking.
+    """
+
+    def __init__(self, path: str, slots: int = 65536, shards: int = 16) -> None:
+        import fcntl
+
+        assert slots >= shards > 0, "slots must be greater than or equal to shards"
+        self._fcntl = fcntl
+        self.path = path
+        self.shards = shards
+        self.slots_per_shard = slots // shards
+        size = self.slots_per_shard * shards * _slot.size
+        self._file = open(path, "a+b")
+        if os.fstat(self._file.fileno()).st_size < size:
+            self._file.truncate(size)
+        self._m = mmap.mmap(self._file.fileno(), size)
+        self.locks = [threading.Lock() for _ in range(shards)]
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        h = hash_key(key)
+        shard = h % self.shards
+        per_shard = self.slots_per_shard
+        start = shard * per_shard * _slot.size
+        first = (h // self.shards) % per_shard
+        m = self._m
+        fd = self._file.fileno()
+        with self.locks[shard]:
+            self._fcntl.lockf(
+                fd, self._fcntl.LOCK_EX, per_shard * _slot.size, start, os.SEEK_SET
+            )
+            try:
+                offset = -1
+                oldest = oldest_offset = -1.0
+                for probe in range(min(PROBES, per_shard)):
+                    slot_offset = start + ((first + probe) % per_shard) * _slot.size
+                    slot_hash, tokens, last = _slot.unpack_from(m, slot_offset)
+                    if slot_hash == h or slot_hash == 0:
+                        offset = slot_offset
+                        break
+                    if oldest_offset < 0 or last < oldest:
+                        oldest, oldest_offset = last, slot_offset
+
+                if offset < 0 or slot_hash != h or last > now:
+                    # New bucket (or a bucket of a previous boot of the machine)
+                    if offset < 0:
+                        offset = int(oldest_offset)
+                    tokens, last = burst, now
+
+                tokens, wait = refill(tokens, last, rate, burst, now)
+                _slot.pack_into(m, offset, h, tokens, now)
+                return wait
+            finally:
+                self._fcntl.lockf(
+                    fd, self._fcntl.LOCK_UN, per_shard * _slot.size, start, os.SEEK_SET
+                )
+
+    def close(self):
+        self._m.close()
+        self._file.close()
+
+
+class RateLimitStats(Stats):
+    """
+    Statistics of a ``RateLimiter``.
+
+    Attributes:
+        allowed: Number of requests that got a token.
+        limited: Number of rejected requests.
+    """
+
+    __slots__ = ("allowed", "limited")
+
+    def __init__(self) -> None:
+        self.allowed = self.limited = 0
+
+
+class RateLimiter:
+    """
+    Find the rule of a request and take a token from its bucket.
+
+    Args:
+        rules: Rate limit rules.
+        table: Table of the buckets, default ``BucketTable()``.
+        clock: Function that returns the current time in seconds.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[RateLimitRule],
+        table: Union[BucketTable, SharedBucketTable, None] = None,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+        self.rules = list(rules)
+        self.table = table if table is not None else BucketTable()
+        self.clock = clock
+        self.stats = RateLimitStats()
+        self.trie: PrefixTrie[List[RateLimitRule]] = PrefixTrie()
+        prefixes: Dict[str, List[RateLimitRule]] = {}
+        for rule in self.rules:
+            prefixes.setdefault(rule.path, []).append(rule)
+        for prefix_rules in prefixes.values():
+            # The rules of specific methods are checked first
+            prefix_rules.sort(key=lambda rule: rule.methods is None)
+        for prefix, prefix_rules in prefixes.items():
+            self.trie.insert(prefix, prefix_rules)
+
+    def get_rule(self, scope: Scope) -> Optional[RateLimitRule]:
+        rules = self.trie.lookup(scope.get("path", ""))
+        if not rules:
+            return None
+
+        method = scope.get("method")
+        for rule in rules:
+            if rule.methods is None or method in rule.methods:
+                return rule
+        return None
+
+    def check(self, scope: Scope) -> Tuple[Optional[RateLimitRule], float]:
+        """
+        Take a token for a request.
+
+        Returns:
+            The rule of the request (``None`` if it's not limited) and
+            ``0.0`` if a token was taken, otherwise the seconds until the next token.
+        """
+
+        rule = self.get_rule(scope)
+        if rule is None:
+            return None, 0.0
+
+        key = rule.get_key(scope)
+        if key is None:
+            return None, 0.0
+
+        wait = self.table.take(
+            f"{rule.name}\0{key}", rule.rate, rule.burst, self.clock()
+        )
+        if wait:
+            self.stats.limited += 1
+        else:
+            self.stats.allowed += 1
+        return rule, wait
+
+
+class RateLimitMiddleware:
+    """
+    Reject the requests without a token with ``429 Too Many Requests``, before the routing.
+
+    Args:
+        app: ASGI application.
+        limiter: Rate limiter.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter) -> None:
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule, wait = self.limiter.check(scope)
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+
+        metrics = getattr(scope.get("app"), "metrics", None)
+        if metrics is not None:
+            metrics.rate_limited.labels(rule.name).inc()  # type: ignore[union-attr]
+
+        response = JSONResponse(
+            {"detail": "Too Many Requests"},
+            status_code=429,
+            headers={"Retry-After": str(ceil(wait))},
+        )
+        await response(scope, receive, send)
+
+
+def setup(app: "Fastack"):
+    """
+    Enable rate limits on the application, see the module documentation for the settings.
+    """
+
+    rules = [RateLimitRule(**options) for options in app.get_setting("RATE_LIMITS", [])]
+    shards = app.get_setting("RATE_LIMIT_SHARDS", 16)
+    shared_file = app.get_setting("RATE_LIMIT_SHARED_FILE")
+    table: Union[BucketTable, SharedBucketTable]
+    if shared_file:
+        table = SharedBucketTable(
+            shared_file, app.get_setting("RATE_LIMIT_SLOTS", 65536), shards
+        )
+        app.add_event_handler("shutdown", table.close)
+    else:
+        table = BucketTable(shards, app.get_setting("RATE_LIMIT_MAX_KEYS", 100000))
+
+    limiter = app.rate_limiter = RateLimiter(rules, table)
+    # Inside the middlewares of ``create_app``, so ``scope["user"]`` is set for the ``user`` key
+    app.user_middleware.append(Middleware(RateLimitMiddleware, limiter=limiter))
+    app.middleware_stack = app.build_middleware_stack()
@@ -0,0 +1,345 @@
+import asyncio
+from functools import wraps
+from time import perf_counter_ns
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+from fastapi import routing
+from fastapi.requests import Request
+from fastapi.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from .bulkhead import Bulkhead
+from .cache import CacheOptions, cached_endpoint, cached_handler
+from .constants import PRIORITY_CRITICAL, PRIORITY_NORMAL
+from .context import _ctx_stack
+from .executors import executor_endpoint
+from .timing import Timings
+
+if TYPE_CHECKING:
+    from .controller import Controller  # pragma: no cover
+
+T = TypeVar("T")
+
+
+class APIRoute(routing.APIRoute):
+    """
+    Route class used by Fastack, it adds:
+
+    * Phase timings (see ``fastack.timing``), switchable per route with ``route(timing=...)``.
+    * Response cache (see ``fastack.cache``), enabled per route with ``route(cache=...)``.
+    * Dedicated executors of sync responders (see ``fastack.executors``),
+      set with ``Controller.executor`` or ``route(executor=...)``.
+    * Concurrency limits (see ``fastack.bulkhead``), set with ``Controller.max_concurrency``
+      or ``route(max_concurrency=...)``.
+    * Load shedding priorities (see ``fastack.middleware.shedding``), set with ``Controller.priority``
+      or ``route(priority=...)``.
+    * Request metrics, if the ``fastack.metrics`` plugin is enabled.
+
+    Load shedding and concurrency limits are checked in ``handle``, when the route is matched,
+    before the body is read and the dependencies are resolved.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, endpoint, **kwargs)
+        self.bulkhead = self.get_bulkhead()
+        self.priority = self.get_priority()
+
+    def get_priority(self) -> int:
+        """
+        Get the load shedding priority of the route (see ``fastack.middleware.shedding``),
+        from ``route(priority=...)`` or the controller.
+        The routes of the application (e.g. health checks added with ``app.get``) are critical.
+        """
+
+        priority = getattr(self.endpoint, "__route_priority__", None)
+        if priority is not None:
+            return priority
+
+        controller = self.get_controller()
+        if controller is None:
+            return PRIORITY_CRITICAL
+        priority = getattr(controller, "priority", None)
+        return PRIORITY_NORMAL if priority is None else priority
+
+    def get_bulkhead(self) -> Optional[Bulkhead]:
+        """
+        Get the bulkhead of the route, from ``route(max_concurrency=...)`` or the controller.
+        """
+
+        options = getattr(self.endpoint, "__route_bulkhead__", None)
+        if options is not None:
+            return Bulkhead.create(self.name, options)
+
+        return getattr(self.get_controller(), "bulkhead", None)
+
+    def get_controller(self) -> Optional["Controller"]:
+        """
+        Get the controller of the endpoint, a responder bound to the controller
+        or a responder created by it (``__controller__``, e.g. the batch responders).
+        """
+
+        controller = getattr(self.endpoint, "__controller__", None)
+        if controller is None:
+            controller = getattr(self.endpoint, "__self__", None)
+        return controller
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        metrics = getattr(scope.get("app"), "metrics", None)
+        if metrics is None:
+            await self.handle_admitted(scope, receive, send)
+            return
+
+        # Shed and rejected requests are recorded too
+        await metrics.observe(self.name, self.handle_admitted, scope, receive, send)
+
+    async def handle_admitted(self, scope: Scope, receive: Receive, send: Send) -> None:
+        shedder = scope.get("fastack.shedder")
+        if shedder is not None and not shedder.admit(self.priority):
+            raise shedder.reject()
+
+        if self.bulkhead is None:
+            await super().handle(scope, receive, send)
+            return
+
+        async with self.bulkhead:
+            await super().handle(scope, receive, send)
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        timing = getattr(self.endpoint, "__route_timing__", None)
+        cache = CacheOptions.create(getattr(self.endpoint, "__route_cache__", None))
+        # Checked by ``Fastack.check_executors`` when the routes are added
+        self.executor = self.get_executor_name()
+        executor = None
+        if not asyncio.iscoroutinefunction(self.dependant.call):
+            executor = self.executor
+        self.dependant.call = self._timed_endpoint(self.dependant.call)  # type: ignore[arg-type]
+        if not asyncio.iscoroutinefunction(self.dependant.call):
+            # Imported here, ``fastack.middleware`` depends on this module
+            from .middleware.profiler import profile_sync
+
+            self.dependant.call = profile_sync(self.dependant.call)  # type: ignore[arg-type]
+        if executor is not None:
+            self.dependant.call = executor_endpoint(self.dependant.call, executor)  # type: ignore[arg-type]
+        if cache is not None:
+            self.dependant.call = cached_endpoint(self.dependant.call)  # type: ignore[arg-type]
+        handler = super().get_route_handler()
+        if cache is not None:
+            handler = cached_handler(handler, cache, self.name)
+        if timing is False:
+            return handler
+
+        name = self.name
+
+        async def app(request: Request) -> Response:
+            ctx = _ctx_stack.get(None)
+            if ctx is None or not (timing or getattr(ctx.app, "server_timing", False)):
+                return await handler(request)
+
+            timings = ctx.timings = Timings(ctx.started or perf_counter_ns(), name)
+            timings.route = perf_counter_ns()
+            response = await handler(request)
+            timings.done = perf_counter_ns()
+            timings.status_code = response.status_code
+            if getattr(ctx.app, "server_timing_header", True):
+                response.headers.append("Server-Timing", timings.server_timing())
+            return response
+
+        return app
+
+    def get_executor_name(self) -> Optional[str]:
+        """
+        Get the executor of the route, from ``route(executor=...)`` or the controller.
+        Only sync endpoints are called in it, async endpoints may use it for their sync calls
+        (e.g. the bulk hooks of the batch responders).
+        """
+
+        executor = getattr(self.endpoint, "__route_executor__", None)
+        if executor is None:
+            executor = getattr(self.get_controller(), "executor", None)
+        return executor
+
+    @staticmethod
+    def _timed_endpoint(func: Callable) -> Callable:
+        # The start of the handler is recorded in the context for the queueing delay
+        # (see ``fastack.middleware.shedding``), and in the phase timings if enabled.
+        if asyncio.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def endpoint(*args, **kwds):
+                ctx = _ctx_stack.get(None)
+                if ctx is None:
+                    return await func(*args, **kwds)
+
+                ctx.handler_started = perf_counter_ns()
+                timings = ctx.timings
+                if timings is None:
+                    return await func(*args, **kwds)
+
+                timings.handler_start = ctx.handler_started
+                try:
+                    return await func(*args, **kwds)
+                finally:
+                    timings.handler_end = perf_counter_ns()
+
+        else:
+
+            @wraps(func)
+            def endpoint(*args, **kwds):
+                ctx = _ctx_stack.get(None)
+                if ctx is None:
+                    return func(*args, **kwds)
+
+                ctx.handler_started = perf_counter_ns()
+                timings = ctx.timings
+                if timings is None:
+                    return func(*args, **kwds)
+
+                timings.handler_start = ctx.handler_started
+                try:
+                    return func(*args, **kwds)
+                finally:
+                    timings.handler_end = perf_counter_ns()
+
+        return endpoint
+
+
+def split_path(path: str) -> List[str]:
+    """
+    Split a path into segments, e.g. ``/user/1/`` -> ``["user", "1"]``.
+    """
+
+    return [segment for segment in path.split("/") if segment]
+
+
+class _Node:
+    __slots__ = ("children", "has_value", "value")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.has_value = False
+        self.value: Any = None
+
+
+class PrefixTrie(Generic[T]):
+    """
+    Maps path prefixes to values, ``lookup()`` returns the value of the longest prefix matching a path.
+
+    Prefixes are matched by path segments, ``/api`` matches ``/api`` and ``/api/user`` but not ``/apis``.
+
+    Args:
+        default: Value returned if no prefix matches.
+    """
+
+    def __init__(self, default: Optional[T] = None) -> None:
+        self.root = _Node()
+        self.default = default
+        self._prefixes: List[str] = []
+
+    def insert(self, prefix: str, value: T):
+        node = self.root
+        for segment in split_path(prefix):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _Node()
+            node = child
+
+        if not node.has_value:
+            self._prefixes.append("/" + "/".join(split_path(prefix)))
+        node.has_value = True
+        node.value = value
+
+    def lookup(self, path: str) -> Optional[T]:
+        node = self.root
+        value = node.value if node.has_value else self.default
+        for segment in path.split("/"):
+            if not segment:
+                continue
+            node = node.children.get(segment)  # type: ignore[assignment]
+            if node is None:
+                break
+            if node.has_value:
+                value = node.value
+        return value
+
+    def prefixes(self) -> Iterator[str]:
+        return iter(self._prefixes)
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+
+class PathScope:
+    """
+    Paths where a middleware is applied, compiled into a ``PrefixTrie``
+    so the decision costs one lookup per request.
+
+    The longest matching prefix wins, an excluded prefix wins over the same included prefix.
+    If there are no included prefixes, all paths are included except the excluded ones.
+
+    Args:
+        include: Included path prefixes.
+        exclude: Excluded path prefixes.
+        controllers: Included controllers, the prefixes where they were included
+            (``Controller.mount_prefixes``).
+
+    Raises:
+        RuntimeError: If a controller is not included in the application yet.
+    """
+
+    def __init__(
+        self,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+        controllers: Optional[Sequence["Controller"]] = None,
+    ) -> None:
+        include = list(include or [])
+        for controller in controllers or []:
+            if not controller.mount_prefixes:
+                raise RuntimeError(
+                    f"{type(controller).__name__} must be included (include_controller) "
+                    "before the middlewares limited to it are added"
+                )
+            include.extend(controller.mount_prefixes)
+
+        self.trie: PrefixTrie[bool] = PrefixTrie(default=not include)
+        for prefix in include:
+            self.trie.insert(prefix, True)
+        for prefix in exclude or []:
+            self.trie.insert(prefix, False)
+
+    @classmethod
+    def create(
+        cls,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+        controllers: Optional[Sequence["Controller"]] = None,
+    ) -> Optional["PathScope"]:
+        """
+        Create a scope, ``None`` if it includes all paths.
+        """
+
+        if not (include or exclude or controllers):
+            return None
+        return cls(include, exclude, controllers)
+
+    @property
+    def default(self) -> bool:
+        return bool(self.trie.default)
+
+    def match(self, path: str) -> bool:
+        return bool(self.trie.lookup(path))
+
+    def prefixes(self) -> Iterator[str]:
+        return self.trie.prefixes()
@@ -0,0 +1,184 @@
+"""
+Compiled serializers, a specialised encoding function is generated for each class
+(pydantic model, dataclass or object with a ``serialize`` method) the first time it is seen
+and reused for every later object of the same class.
+"""
+
+import dataclasses
+import weakref
+from enum import Enum
+from pathlib import PurePath
+from types import GeneratorType
+from typing import Any, Callable, Dict, List, MutableMapping, Tuple, Type
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Extra
+from pydantic.fields import SHAPE_SINGLETON
+from pydantic.json import ENCODERS_BY_TYPE
+
+Encoder = Callable[[Any], Any]
+
+PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+SEQUENCE_TYPES = (list, tuple, set, frozenset, GeneratorType)
+
+
+def _identity(obj: Any) -> Any:
+    return obj
+
+
+class Serializer:
+    """
+    Converts objects to JSON compatible types, with the same output as ``jsonable_encoder``.
+
+    Args:
+        native: Keep the values that a JSON backend encodes by itself (e.g. datetime, UUID, Decimal),
+            only models, dataclasses, objects with ``serialize`` and containers are converted.
+            See ``fastack.encoders``.
+    """
+
+    def __init__(self, native: bool = False) -> None:
+        self.native = native
+        # Classes created at runtime (e.g. per request) can be garbage collected
+        self._encoders: MutableMapping[type, Encoder] = weakref.WeakKeyDictionary()
+
+    def encode(self, obj: Any) -> Any:
+        try:
+            encoder = self._encoders[type(obj)]
+        except KeyError:
+            encoder = self.get_encoder(type(obj))
+        return encoder(obj)
+
+    def get_encoder(self, cls: type) -> Encoder:
+        """
+        Get the encoding function for a class, it's compiled on the first call.
+        """
+
+        encoder = self._encoders.get(cls)
+        if encoder is None:
+            encoder = self._encoders[cls] = self.compile(cls)
+        return encoder
+
+    def clear(self):
+        self._encoders.clear()
+
+    def compile(self, cls: type) -> Encoder:
+        """
+        Create the encoding function for a class.
+        """
+
+        if issubclass(cls, PRIMITIVE_TYPES) and not issubclass(cls, Enum):
+            return _identity
+
+        serialize = getattr(cls, "serialize", None)
+        if callable(serialize):
+            encode = self.encode
+            return lambda obj: encode(obj.serialize())
+
+        if issubclass(cls, BaseModel):
+            return self.compile_model(cls)
+
+        if dataclasses.is_dataclass(cls):
+            return self.compile_dataclass(cls)
+
+        if issubclass(cls, Enum):
+            encode = self.encode
+            return lambda obj: encode(obj.value)
+
+        if issubclass(cls, dict):
+            return self.compile_dict()
+
+        if issubclass(cls, SEQUENCE_TYPES):
+            encode = self.encode
+            return lambda obj: [encode(item) for item in obj]
+
+        if self.native:
+            return _identity
+
+        if issubclass(cls, PurePath):
+            return str
+
+        for base in cls.__mro__[:-1]:
+            encoder = ENCODERS_BY_TYPE.get(base)
+            if encoder is not None:
+                return encoder
+
+        return jsonable_encoder
+
+    def compile_dict(self) -> Encoder:
+        encode = self.encode
+
+        def encode_dict(obj: dict) -> dict:
+            # Like jsonable_encoder, the state of SQLAlchemy (``_sa*`` keys) is dropped
+            return {
+                encode(key): encode(value)
+                for key, value in obj.items()
+                if type(key) is not str or not key.startswith("_sa")
+            }
+
+        return encode_dict
+
+    def compile_model(self, cls: Type[BaseModel]) -> Encoder:
+        config = cls.__config__
+        if config.json_encoders or config.extra == Extra.allow:
+            # Custom encoders and extra fields are handled by jsonable_encoder
+            return jsonable_encoder
+
+        if "__root__" in cls.__fields__:
+            encode = self.encode
+            return lambda obj: encode(obj.__root__)
+
+        fields: List[Tuple[str, str, bool]] = []
+        for name, field in cls.__fields__.items():
+            field_info = field.field_info
+            if field_info.exclude is True:
+                continue
+            if field_info.exclude or field_info.include:
+                # Partial exclusion of a sub model
+                return jsonable_encoder
+
+            # Validated values of these fields are always primitive types
+            primitive = (
+                field.shape == SHAPE_SINGLETON
+                and field.outer_type_ in (str, int, float, bool)
+                and not field.sub_fields
+            )
+            fields.append((field.alias, name, primitive))
+
+        return self._generate(cls, fields, "d = obj.__dict__", "d[{!r}]")
+
+    def compile_dataclass(self, cls: type) -> Encoder:
+        fields = [(field.name, field.name, False) for field in dataclasses.fields(cls)]
+        return self._generate(cls, fields, "", "obj.{}")
+
+    def _generate(
+        self,
+        cls: type,
+        fields: List[Tuple[str, str, bool]],
+        setup: str,
+        getter: str,
+    ) -> Encoder:
+        lines = ["def encode_obj(obj):"]
+        if setup:
+            lines.append(f"    {setup}")
+        lines.append("    return {")
+        for key, name, primitive in fields:
+            value = getter.format(name)
+            if not primitive:
+                value = f"encode({value})"
+            lines.append(f"        {key!r}: {value},")
+        lines.append("    }")
+
+        namespace: Dict[str, Any] = {"encode": self.encode}
+        code = compile("\n".join(lines), f"<serializer {cls.__qualname__}>", "exec")
+        exec(code, namespace)
+        return namespace["encode_obj"]
+
+
+# Output of ``jsonable_encoder``, for ``JSONResponse`` and the ``json`` backend
+jsonable_serializer = Serializer()
+# Output for responses rendered by a native JSON backend (e.g. ``orjson``)
+native_serializer = Serializer(native=True)
+
+
+def get_serializer(native: bool = False) -> Serializer:
+    return native_serializer if native else jsonable_serializer
@@ -0,0 +1,128 @@
+"""
+Streaming of large lists as a chunked JSON array or NDJSON,
+see ``ListControllerMixin.get_streaming_response``.
+
+Items are pulled from the data, encoded and sent in chunks of ``chunk_size`` bytes.
+The next items are only read once the previous chunk has been sent to the client,
+so a slow client doesn't make the server buffer the whole response.
+"""
+
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, Union
+
+from starlette.concurrency import run_in_threadpool
+
+DataSource = Union[Iterable, AsyncIterator]
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_BATCH_SIZE = 100
+
+
+def is_async_iterable(data: Any) -> bool:
+    return hasattr(data, "__aiter__")
+
+
+async def iterate(
+    data: DataSource, batch_size: int = DEFAULT_BATCH_SIZE
+) -> AsyncIterator[Any]:
+    """
+    Iterate over an iterable or async iterable.
+
+    Iterables other than lists and tuples (generators, database cursors, ...) might block,
+    they are read in batches of ``batch_size`` items in the threadpool.
+    """
+
+    if is_async_iterable(data):
+        async for item in data:  # type: ignore[union-attr]
+            yield item
+
+    elif isinstance(data, (list, tuple)):
+        for item in data:
+            yield item
+
+    else:
+        iterator = iter(data)  # type: ignore[arg-type]
+        while True:
+            batch = await run_in_threadpool(list, islice(iterator, batch_size))
+            for item in batch:
+                yield item
+
+            if len(batch) < batch_size:
+                break
+
+
+async def aislice(
+    data: AsyncIterator, start: int, stop: Optional[int] = None
+) -> AsyncIterator[Any]:
+    """
+    ``itertools.islice`` for async iterables.
+    """
+
+    index = 0
+    async for item in data:
+        if stop is not None and index >= stop:
+            break
+
+        if index >= start:
+            yield item
+        index += 1
+
+
+class ItemStream:
+    """
+    Encode items to JSON and group them in chunks.
+
+    Args:
+        items: Items to be encoded.
+        render: Function to convert an item to bytes (encoder and JSON backend).
+        separator: Bytes between two items.
+        chunk_size: Minimum size (in bytes) of a chunk, except the last one.
+
+    Attributes:
+        count: Number of items that have been encoded.
+    """
+
+    def __init__(
+        self,
+        items: AsyncIterator[Any],
+        render: Callable[[Any], bytes],
+        *,
+        separator: bytes = b",",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        self.items = items
+        self.render = render
+        self.separator = separator
+        self.chunk_size = chunk_size
+        self.count = 0
+
+    async def chunks(
+        self, prefix: bytes = b"", suffix: Optional[Callable[[], bytes]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Generate the chunks.
+
+        Args:
+            prefix: Bytes before the first item.
+            suffix: Function called after the last item, to get the end of the body.
+        """
+
+        buffer = bytearray(prefix)
+        render = self.render
+        separator = self.separator
+        chunk_size = self.chunk_size
+        async for item in self.items:
+            if self.count and separator:
+                buffer += separator
+
+            buffer += render(item)
+            self.count += 1
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+
+        if suffix is not None:
+            buffer += suffix()
+
+        if buffer:
+            yield bytes(buffer)
@@ -0,0 +1,253 @@
+"""
+Batch of sub-requests, dispatched in-process through the application (``BATCH_REQUESTS_PATH`` setting).
+
+A client that needs several small resources sends them in one request,
+each sub-request goes through the whole ASGI stack of the application
+(middlewares, routing, dependencies) without opening a connection:
+
+```http
+POST /_batch
+[
+    {"path": "/user/1"},
+    {"path": "/order?page=2", "headers": {"Accept-Language": "id"}},
+    {"method": "POST", "path": "/cart", "body": {"product": 1}}
+]
+```
+
+The response has one result per sub-request, in the same order:
+
+```json
+{
+    "detail": "Batch",
+    "data": [
+        {"status": 200, "headers": {"content-type": "application/json", ...}, "body": {...}},
+        ...
+    ]
+}
+```
+
+Sub-requests inherit the headers of the batch request (e.g. ``Authorization``),
+the headers of a sub-request take precedence. Each one has its own request context,
+so ``fastack.globals.request`` is the sub-request inside the responders.
+
+Settings:
+
+* ``BATCH_REQUESTS_PATH`` - Path of the route, e.g. ``/_batch`` (disabled by default).
+* ``BATCH_REQUESTS_CONCURRENCY`` - Maximum number of sub-requests of a batch processed at once (default 8).
+* ``BATCH_REQUESTS_MAX`` - Maximum number of sub-requests in a batch (default 20).
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import unquote
+
+import anyio
+from fastapi import Body, HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel, validator
+from starlette.types import ASGIApp, Message, Scope
+
+logger = logging.getLogger(__name__)
+
+# Keys of the batch request scope copied to the sub-requests
+INHERITED_SCOPE_KEYS = (
+    "asgi",
+    "http_version",
+    "scheme",
+    "server",
+    "client",
+    "root_path",
+)
+# Headers of the batch request that don't apply to the sub-requests
+EXCLUDED_HEADERS = frozenset(
+    [b"content-length", b"content-type", b"accept-encoding", b"transfer-encoding"]
+)
+NESTED_BATCH_ERROR = "Nested batch requests are not allowed"
+
+
+class SubRequest(BaseModel):
+    """
+    Sub-request of a batch.
+
+    Attributes:
+        method: HTTP method.
+        path: Path of the request, with the query string.
+        headers: Headers of the request, added to the headers of the batch request.
+        body: Body of the request, sent as JSON.
+    """
+
+    method: str = "GET"
+    path: str
+    headers: Dict[str, str] = {}
+    body: Any = None
+
+    @validator("method")
+    def validate_method(cls, value: str) -> str:
+        return value.upper()
+
+    @validator("path")
+    def validate_path(cls, value: str) -> str:
+        if not value.startswith("/"):
+            raise ValueError("path must start with /")
+        return value
+
+
+def create_scope(parent: Scope, item: SubRequest, body: bytes) -> Scope:
+    """
+    Create the scope of a sub-request from the scope of the batch request.
+    """
+
+    path, _, query = item.path.partition("?")
+    overrides = {
+        name.lower().encode("latin-1"): value.encode("latin-1")
+        for name, value in item.headers.items()
+    }
+    headers = [
+        (name, value)
+        for name, value in parent.get("headers", [])
+        if name not in EXCLUDED_HEADERS and name not in overrides
+    ]
+    headers.extend(overrides.items())
+    if body:
+        if b"content-type" not in overrides:
+            headers.append((b"content-type", b"application/json"))
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+    scope = {key: parent[key] for key in INHERITED_SCOPE_KEYS if key in parent}
+    scope.update(
+        type="http",
+        method=item.method,
+        path=unquote(path),
+        raw_path=path.encode("latin-1"),
+        query_string=query.encode("latin-1"),
+        headers=headers,
+    )
+    # A batch can't be sent from a sub-request, see ``create_batch_endpoint``
+    scope["fastack.subrequest"] = True
+    return scope
+
+
+def decode_body(headers: Dict[str, str], body: bytes) -> Any:
+    """
+    Decode the body of a sub-response, JSON bodies are parsed.
+    """
+
+    if not body:
+        return None
+
+    content_type = headers.get("content-type", "").split(";")[0]
+    if content_type == "application/json" or content_type.endswith("+json"):
+        try:
+            return json.loads(body)
+        except ValueError:
+            pass
+    return body.decode("utf-8", "replace")
+
+
+async def dispatch(app: ASGIApp, parent: Scope, item: SubRequest) -> Dict[str, Any]:
+    """
+    Send a sub-request to the application and collect its response.
+
+    Returns:
+        The status, headers and body of the response.
+    """
+
+    body = json.dumps(item.body).encode() if item.body is not None else b""
+    scope = create_scope(parent, item, body)
+    status = 500
+    raw_headers: List[Any] = []
+    chunks: List[bytes] = []
+    started = False
+    request_sent = False
+    complete = anyio.Event()
+
+    async def receive() -> Message:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        # Like a client that keeps the connection open until the response is sent
+        await complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        nonlocal status, raw_headers, started
+        if message["type"] == "http.response.start":
+            started = True
+            status = message["status"]
+            raw_headers = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                complete.set()
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # The error response has been sent by the application (if it could),
+        # the other sub-requests are not affected.
+        logger.exception("Exception in sub-request %s %s", item.method, item.path)
+        if not started:
+            status, raw_headers, chunks = 500, [], [b"Internal Server Error"]
+    finally:
+        complete.set()
+
+    headers = {
+        name.decode("latin-1"): value.decode("latin-1") for name, value in raw_headers
+    }
+    return {
+        "status": status,
+        "headers": headers,
+        "body": decode_body(headers, b"".join(chunks)),
+    }
+
+
+def create_batch_endpoint(
+    path: str, concurrency: int = 8, max_requests: Optional[int] = 20
+) -> Callable[..., Any]:
+    """
+    Create the responder of the batch route.
+
+    Args:
+        path: Path of the route, sub-requests to this path are rejected.
+        concurrency: Maximum number of sub-requests of a batch processed at once.
+        max_requests: Maximum number of sub-requests in a batch, ``None`` for no limit.
+    """
+
+    assert concurrency > 0, "concurrency must be greater than 0"
+
+    async def batch(
+        request: Request, requests: List[SubRequest] = Body(...)
+    ) -> Response:
+        if request.scope.get("fastack.subrequest"):
+            # Each level would multiply the requests by ``max_requests``
+            raise HTTPException(400, NESTED_BATCH_ERROR)
+        if max_requests is not None and len(requests) > max_requests:
+            raise HTTPException(413, f"Batch is limited to {max_requests} requests")
+
+        app = request.app
+        parent = request.scope
+        results: List[Dict[str, Any]] = [{}] * len(requests)
+        semaphore = anyio.Semaphore(concurrency)
+
+        async def run(index: int, item: SubRequest):
+            if unquote(item.path.partition("?")[0]) == path:
+                results[index] = {
+                    "status": 400,
+                    "headers": {},
+                    "body": NESTED_BATCH_ERROR,
+                }
+                return
+
+            async with semaphore:
+                results[index] = await dispatch(app, parent, item)
+
+        async with anyio.create_task_group() as tg:
+            for index, item in enumerate(requests):
+                tg.start_soon(run, index, item)
+
+        return app.json_response_class({"detail": "Batch", "data": results})
+
+    return batch
@@ -0,0 +1,119 @@
+from time import perf_counter_ns
+from typing import Any, Dict, Optional
+
+from .context import _ctx_stack
+
+
+class Timings:
+    """
+    Phase timings of the current request, recorded with a monotonic clock (nanoseconds).
+
+    Phases:
+
+    * ``middleware`` - From the ASGI entry to the route (middleware chain and routing).
+    * ``dependencies`` - Body parsing and dependency resolution (e.g. ``Controller.middlewares``).
+    * ``handler`` - The responder, without ``encode`` and ``render``.
+    * ``encode`` - Serialization of data (``serialize_data`` and ``jsonable_encoder``).
+    * ``render`` - Creating the response body.
+    * ``total`` - From the ASGI entry until the response is created.
+    """
+
+    __slots__ = (
+        "started",
+        "route",
+        "handler_start",
+        "handler_end",
+        "done",
+        "finished",
+        "encode",
+        "render",
+        "name",
+        "status_code",
+    )
+
+    def __init__(self, started: int, name: Optional[str] = None) -> None:
+        self.started = started
+        self.route = self.handler_start = self.handler_end = started
+        self.done = self.finished = 0
+        self.encode = self.render = 0
+        self.name = name
+        self.status_code: Optional[int] = None
+
+    def add_encode(self, start: int) -> int:
+        """
+        Add the time since ``start`` to the ``encode`` phase.
+
+        Returns:
+            int: Current time.
+        """
+
+        now = perf_counter_ns()
+        self.encode += now - start
+        return now
+
+    def add_render(self, start: int) -> int:
+        """
+        Add the time since ``start`` to the ``render`` phase.
+
+        Returns:
+            int: Current time.
+        """
+
+        now = perf_counter_ns()
+        self.render += now - start
+        return now
+
+    def phases(self) -> Dict[str, float]:
+        """
+        Get the duration of each phase in milliseconds.
+        """
+
+        done = self.done or perf_counter_ns()
+        handler_end = max(self.handler_end, self.handler_start)
+        handler = handler_end - self.handler_start - self.encode - self.render
+        # FastAPI serializes the return value (if it's not a response) after the responder.
+        render = self.render + max(done - handler_end, 0)
+        durations = {
+            "middleware": self.route - self.started,
+            "dependencies": self.handler_start - self.route,
+            "handler": max(handler, 0),
+            "encode": self.encode,
+            "render": render,
+            "total": done - self.started,
+        }
+        return {name: value / 1e6 for name, value in durations.items()}
+
+    def server_timing(self) -> str:
+        """
+        Value of the ``Server-Timing`` header.
+        """
+
+        return ", ".join(
+            f"{name};dur={value:.3f}" for name, value in self.phases().items()
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Structured record of the request timings.
+        The ``send`` phase is the time needed to send the response,
+        so ``total`` here includes it.
+        """
+
+        record: Dict[str, Any] = {"name": self.name, "status_code": self.status_code}
+        phases = self.phases()
+        finished = self.finished or perf_counter_ns()
+        phases["send"] = max(finished - (self.done or finished), 0) / 1e6
+        phases["total"] = (finished - self.started) / 1e6
+        record.update(phases)
+        return record
+
+
+def current_timings() -> Optional[Timings]:
+    """
+    Get the timings of the current request, ``None`` if timing is disabled.
+    """
+
+    ctx = _ctx_stack.get(None)
+    if ctx is None:
+        return None
+    return ctx.timings
@@ -3,6 +3,7 @@ import sys
 from importlib import import_module
 from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Type, Union
 
+from fastapi import HTTPException
 from fastapi.routing import APIRoute
 
 if TYPE_CHECKING:
@@ -53,6 +54,31 @@ def load_app(raise_error: bool = True) -> Optional["Fastack"]:
     return app
 
 
+class Stats:
+    """
+    Base class of the statistics of a component (e.g. ``CacheStats``),
+    the counters are the ``__slots__`` of the subclass.
+    """
+
+    __slots__ = ()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def service_unavailable(retry_after: int) -> HTTPException:
+    """
+    Create the error of a request rejected because of the load (bulkheads, executors, load shedding).
+
+    Args:
+        retry_after: Value (in seconds) of the ``Retry-After`` header.
+    """
+
+    return HTTPException(
+        503, "Service Unavailable", headers={"Retry-After": str(retry_after)}
+    )
+
+
 def lookup_exception_handler(
     exception_handlers: Dict[Union[int, Type[Exception]], Callable],
     exc_or_status: Union[Exception, int],
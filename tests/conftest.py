@@ -1,8 +1,13 @@
+from types import ModuleType
+from typing import Any, Optional, Sequence, Type
 from urllib import parse
 
 import pytest
 from asgi_lifespan import LifespanManager
 from fastapi.testclient import TestClient
+from starlette.middleware import Middleware
+
+from fastack import Controller, Fastack, create_app
 
 from . import app as default_app
 
@@ -17,6 +22,48 @@ def client():
     return TestClient(default_app)
 
 
+@pytest.fixture
+def make_app():
+    """
+    Create an application from settings: ``make_app(UserController, PLUGINS=[...])``.
+    ``DEBUG`` is ``False`` by default, a new instance of each controller class is included.
+    """
+
+    def factory(
+        *controllers: Type[Controller],
+        middleware: Optional[Sequence[Middleware]] = None,
+        **options: Any,
+    ) -> Fastack:
+        settings = ModuleType("settings")
+        settings.DEBUG = False
+        for name, value in options.items():
+            setattr(settings, name, value)
+
+        app = create_app(settings, middleware=middleware)
+        for controller in controllers:
+            app.include_controller(controller())
+        return app
+
+    return factory
+
+
+@pytest.fixture
+def make_client(make_app):
+    """
+    Create a test client of a new application, see ``make_app``.
+    """
+
+    def factory(
+        *controllers: Type[Controller],
+        raise_server_exceptions: bool = True,
+        **options: Any,
+    ) -> TestClient:
+        app = make_app(*controllers, **options)
+        return TestClient(app, raise_server_exceptions=raise_server_exceptions)
+
+    return factory
+
+
 @pytest.fixture
 def host():
     return "http://testserver"
@@ -0,0 +1,7 @@
+from typing import Any, Dict, List
+
+records: List[Dict[str, Any]] = []
+
+
+def collect(record: Dict[str, Any]):
+    records.append(record)
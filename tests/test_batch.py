@@ -0,0 +1,138 @@
+import threading
+from typing import Dict, List
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+
+from fastack import ModelController
+from fastack.batch import BatchResult, BatchUpdateItem
+from fastack.constants import PRIORITY_HIGH
+
+books: Dict[int, dict] = {}
+bulk_calls = []
+
+
+class BookBody(BaseModel):
+    title: str
+    pages: int = 0
+
+
+class BookController(ModelController):
+    batch_max_size = 3
+
+    def retrieve(self, id: int) -> Response:
+        return self.json("Book", books[id])
+
+    def update(self, id: int, body: BookBody) -> Response:
+        books[id].update(body.dict())
+        return self.json("Updated", books[id])
+
+    def bulk_create(self, items: List[BookBody]):
+        bulk_calls.append(len(items))
+        results = []
+        for item in items:
+            if any(book["title"] == item.title for book in books.values()):
+                results.append(HTTPException(409, "Already exists"))
+                continue
+
+            book = {"id": len(books) + 1, **item.dict()}
+            books[book["id"]] = book
+            results.append(book)
+        return results
+
+    async def bulk_update(self, items: List[BatchUpdateItem[BookBody]]):
+        results = []
+        for item in items:
+            if item.id not in books:
+                results.append(BatchResult(404, detail="Book not found"))
+                continue
+            books[item.id].update(item.data.dict())
+            results.append(books[item.id])
+        return results
+
+
+def test_batch_responders(make_client):
+    books.clear()
+    bulk_calls.clear()
+    client = make_client(BookController)
+    # only the implemented hooks have a batch responder
+    methods = {
+        method
+        for route in client.app.routes
+        if getattr(route, "path", None) == "/book/batch"
+        for method in route.methods
+    }
+    assert methods == {"POST", "PUT"}
+
+    resp = client.post("/book/batch", json=[{"title": "A"}, {"title": "B", "pages": 2}])
+    assert resp.status_code == 200
+    assert resp.json()["data"] == [
+        {
+            "status": 201,
+            "detail": "Created",
+            "data": {"id": 1, "title": "A", "pages": 0},
+        },
+        {
+            "status": 201,
+            "detail": "Created",
+            "data": {"id": 2, "title": "B", "pages": 2},
+        },
+    ]
+    assert bulk_calls == [2]
+
+    resp = client.post("/book/batch", json=[{"title": "A"}, {"title": "C"}])
+    statuses = [(item["status"], item["detail"]) for item in resp.json()["data"]]
+    assert statuses == [(409, "Already exists"), (201, "Created")]
+
+    # validated in one pass, the hook isn't called
+    resp = client.post("/book/batch", json=[{"title": "D"}, {"pages": "x"}])
+    assert resp.status_code == 422
+    assert {tuple(error["loc"]) for error in resp.json()["detail"]} == {
+        ("body", 1, "title"),
+        ("body", 1, "pages"),
+    }
+    assert bulk_calls == [2, 2]
+
+    resp = client.post("/book/batch", json=[{"title": str(idx)} for idx in range(4)])
+    assert resp.status_code == 413
+
+    resp = client.put(
+        "/book/batch",
+        json=[{"id": 1, "data": {"title": "A2"}}, {"id": 9, "data": {"title": "Z"}}],
+    )
+    data = resp.json()["data"]
+    assert data[0] == {
+        "status": 200,
+        "detail": "OK",
+        "data": {"id": 1, "title": "A2", "pages": 0},
+    }
+    assert data[1] == {"status": 404, "detail": "Book not found", "data": None}
+
+    # single object responders still work
+    assert client.put("/book/2", json={"title": "B2"}).json()["data"]["title"] == "B2"
+    assert client.get("/book/1").json()["data"]["title"] == "A2"
+
+
+class ItemController(ModelController):
+    executor = "items"
+    max_concurrency = 2
+    priority = PRIORITY_HIGH
+
+    def bulk_create(self, items: List[BookBody]):
+        return [threading.current_thread().name for _ in items]
+
+
+def test_batch_controller_options(make_client):
+    client = make_client(ItemController, EXECUTORS={"items": {"max_workers": 1}})
+    controller = client.app.controllers[0]
+    route = next(
+        route for route in client.app.routes if route.name == "item:create_batch"
+    )
+    assert route.bulkhead is controller.bulkhead is not None
+    assert route.priority == PRIORITY_HIGH
+    assert route.executor == "items"
+
+    resp = client.post("/item/batch", json=[{"title": "A"}])
+    assert resp.json()["data"][0]["data"].startswith("fastack-items")
+    assert client.app.executors["items"].stats.completed == 1
+    assert controller.bulkhead.stats.admitted == 1
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fastapi import Depends, HTTPException, Response
+from pydantic import BaseModel
+
+from fastack import Controller
+from fastack.benchmark import make_scope, send_request
+from fastack.bulkhead import Bulkhead
+from fastack.decorators import route
+
+release = asyncio.Event()
+resolved = []
+
+
+def dependency():
+    resolved.append(1)
+
+
+class ReportBody(BaseModel):
+    name: str
+
+
+class ReportController(Controller):
+    max_concurrency = 1
+    max_queue = 1
+
+    async def get(self) -> Response:
+        await release.wait()
+        return self.json("Report")
+
+    async def post(self, body: ReportBody, _=Depends(dependency)) -> Response:
+        return self.json("Created", body.dict())
+
+    @route("/export", action=True, methods=["GET"], max_concurrency=2, max_queue=0)
+    async def export(self) -> Response:
+        await release.wait()
+        return self.json("Export")
+
+
+class OtherController(Controller):
+    async def get(self) -> Response:
+        return self.json("Other")
+
+
+def test_controller_bulkhead(make_client):
+    global release
+    resolved.clear()
+    client = make_client(ReportController, OtherController, PLUGINS=["fastack.metrics"])
+    app = client.app
+
+    async def main():
+        global release
+        release = asyncio.Event()
+        tasks = [
+            asyncio.ensure_future(send_request(app, make_scope("GET", "/report")))
+            for _ in range(2)
+        ]
+        exports = [
+            asyncio.ensure_future(
+                send_request(app, make_scope("GET", "/report/export"))
+            )
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        # the controller slot and its queue are taken, the body isn't read
+        # and the dependencies are not resolved
+        scope = make_scope("POST", "/report", [("content-type", "application/json")])
+        statuses = [
+            await send_request(app, scope, b"invalid"),
+            await send_request(app, make_scope("GET", "/report/export")),
+            await send_request(app, make_scope("GET", "/other")),
+        ]
+        release.set()
+        statuses += await asyncio.gather(*tasks, *exports)
+        return statuses
+
+    assert asyncio.run(main()) == [503, 503, 200, 200, 200, 200, 200]
+    assert resolved == []
+
+    resp = client.post("/report", json={"name": "a"})
+    assert resp.status_code == 200
+    assert resolved == [1]
+
+    bulkheads = {route.name: getattr(route, "bulkhead", None) for route in app.routes}
+    stats = bulkheads["report:get"].stats
+    assert bulkheads["report:post"] is bulkheads["report:get"]
+    assert (stats.admitted, stats.rejected, stats.active) == (3, 1, 0)
+    assert bulkheads["report:export"].stats.rejected == 1
+    assert bulkheads["other:get"] is None
+
+    text = client.get("/metrics").text
+    assert 'fastack_bulkhead_rejected_total{bulkhead="report"} 1.0' in text
+    assert 'fastack_bulkhead_active{bulkhead="report:export"} 0.0' in text
+    assert (
+        'fastack_requests_total{endpoint="report:post",method="POST",status="503"} 1.0'
+        in text
+    )
+
+
+def test_bulkhead_queue_timeout():
+    bulkhead = Bulkhead("test", 1, max_queue=None, queue_timeout=0.01, retry_after=3)
+
+    async def main():
+        await bulkhead.acquire()
+        with pytest.raises(HTTPException) as exc:
+            await bulkhead.acquire()
+        bulkhead.release()
+        async with bulkhead:
+            pass
+        return exc.value
+
+    exc = asyncio.run(main())
+    assert exc.status_code == 503
+    assert exc.headers == {"Retry-After": "3"}
+    stats = bulkhead.stats
+    assert (stats.admitted, stats.timeouts, stats.waiting, stats.active) == (2, 1, 0, 0)
@@ -0,0 +1,154 @@
+import asyncio
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from fastack import Controller
+from fastack.cache import CachedResponse, CacheOptions, MemoryCache
+from fastack.decorators import route
+
+calls = []
+
+
+class ProductController(Controller):
+    @route(cache=True)
+    def retrieve(self, id: int, q: str = "") -> Response:
+        calls.append(id)
+        if id == 0:
+            return self.json("Not found", status=404)
+        return self.json("Product", {"id": id, "q": q, "calls": len(calls)})
+
+    @route(
+        "/lang",
+        action=True,
+        methods=["GET"],
+        cache=CacheOptions(60, query_params=["page"], headers=["Accept-Language"]),
+    )
+    async def lang(self, page: int = 1, debug: bool = False) -> Response:
+        calls.append(page)
+        response = self.json("Lang", {"calls": len(calls)})
+        if debug:
+            response.set_cookie("seen", "1")
+        return response
+
+
+def authenticate(request: Request):
+    if request.headers.get("Authorization") != "Bearer secret":
+        raise HTTPException(401)
+
+
+class ReportController(Controller):
+    middlewares = [Depends(authenticate)]
+
+    @route(cache=True)
+    def retrieve(self, id: int) -> Response:
+        return self.json("Report", {"id": id})
+
+
+def test_route_cache(make_client):
+    calls.clear()
+    client = make_client(ProductController, SERVER_TIMING=True)
+    stats = client.app.response_cache.stats
+
+    first = client.get("/product/1", params={"q": "a"})
+    second = client.get("/product/1", params={"q": "a"})
+    assert (
+        second.json()
+        == first.json()
+        == {
+            "detail": "Product",
+            "data": {"id": 1, "q": "a", "calls": 1},
+        }
+    )
+    assert second.headers["content-type"] == "application/json"
+    assert "server-timing" in second.headers
+    assert stats.hits == 1 and stats.misses == 1
+
+    # path and query parameters are part of the key
+    assert client.get("/product/1", params={"q": "b"}).json()["data"]["calls"] == 2
+    assert client.get("/product/2", params={"q": "a"}).json()["data"]["calls"] == 3
+    # errors are not cached
+    client.get("/product/0")
+    client.get("/product/0")
+    assert calls.count(0) == 2
+
+    # only the selected query parameters and headers
+    calls.clear()
+    assert client.get("/product/lang", params={"debug": 0}).json()["data"]["calls"] == 1
+    assert client.get("/product/lang").json()["data"]["calls"] == 1
+    headers = {"Accept-Language": "fr"}
+    assert client.get("/product/lang", headers=headers).json()["data"]["calls"] == 2
+    assert client.get("/product/lang?page=2").json()["data"]["calls"] == 3
+    # responses with cookies are not cached
+    client.get("/product/lang?page=3&debug=1")
+    assert client.get("/product/lang?page=3").json()["data"]["calls"] == 5
+
+
+def test_route_cache_metrics(make_client):
+    client = make_client(ProductController, PLUGINS=["fastack.metrics"])
+    client.get("/product/5")
+    client.get("/product/5")
+    text = client.get("/metrics").text
+    assert "fastack_response_cache_hits_total 1.0" in text
+    assert "fastack_response_cache_misses_total 1.0" in text
+
+
+def test_memory_cache(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr("fastack.cache.time.monotonic", lambda: now)
+
+    def entry(size: int) -> CachedResponse:
+        return CachedResponse(200, [], b"x" * size)
+
+    async def main():
+        nonlocal now
+        cache = MemoryCache(max_entries=3, max_size=100)
+        await cache.set("a", entry(10), 5)
+        await cache.set("b", entry(10), 60)
+        await cache.set("c", entry(10), 60)
+        assert await cache.get("a") is not None
+        # LRU: "b" is evicted
+        await cache.set("d", entry(10), 60)
+        assert await cache.get("b") is None
+        assert cache.stats.evictions == 1
+
+        # size limit: "c" is evicted
+        await cache.set("e", entry(75), 60)
+        assert len(cache) == 3 and cache.size == 95
+        assert cache.stats.evictions == 2
+        await cache.set("f", entry(101), 60)
+        assert await cache.get("f") is None
+
+        now += 10
+        await cache.set("g", entry(1), 60)
+        assert await cache.get("e") is not None
+        assert await cache.get("a") is None
+        assert cache.stats.as_dict() == {
+            "hits": 2,
+            "misses": 3,
+            "evictions": 3,
+            "expired": 0,
+        }
+
+        await cache.set("h", entry(1), 1)
+        now += 2
+        assert await cache.get("h") is None
+        assert cache.stats.expired == 1
+        assert cache.stats.evictions == 4
+
+        await cache.clear()
+        assert len(cache) == 0 and cache.size == 0
+
+    asyncio.run(main())
+
+
+def test_route_cache_dependencies(make_client):
+    client = make_client(ReportController)
+    headers = {"Authorization": "Bearer secret"}
+    assert client.get("/report/1", headers=headers).json()["data"] == {"id": 1}
+    assert client.app.response_cache.stats.misses == 1
+
+    # the dependencies run before the cache is read
+    assert client.get("/report/1").status_code == 401
+    assert client.get("/report/1", headers={"Authorization": "x"}).status_code == 401
+    assert client.get("/report/1", headers=headers).json()["data"] == {"id": 1}
+    assert client.app.response_cache.stats.hits == 1
@@ -8,6 +8,7 @@ from typer.testing import CliRunner
 
 from fastack.app import Fastack
 from fastack.decorators import command
+from tests.resources.controllers import PluginYoiController
 
 os.environ["FASTACK_APP"] = "tests.app"
 
@@ -89,3 +90,40 @@ def test_new_command():
 def test_routes_command():
     result = execute("routes")
     assert "/api/test" in result.stdout
+
+
+def test_bench_command(app: Fastack):
+    fastack.app = app
+    result = execute('bench "POST /api/test" -n 50 -c 5 --compare')
+    assert result.exit_code == 0, result.stdout
+    lines = result.stdout.splitlines()
+    assert lines[0] == "50 requests, concurrency 5"
+    assert lines[2].startswith("fastack")
+    assert lines[3].startswith("fastapi")
+    assert "framework overhead" in lines[4]
+
+
+def test_bare_app(app: Fastack):
+    from fastapi import routing
+
+    from fastack.benchmark import make_bare_app
+    from fastack.routing import APIRoute
+
+    bare = make_bare_app(app)
+    api_routes = [r for r in bare.routes if isinstance(r, routing.APIRoute)]
+    assert api_routes
+    # plain FastAPI routes, without the per-route features of Fastack
+    assert not any(isinstance(r, APIRoute) for r in api_routes)
+    paths = {r.path for r in api_routes}
+    assert "/api/test" in paths
+
+
+def test_controllers_command(app: Fastack):
+    fastack.app = app
+    controller = PluginYoiController()
+    app.include_controller(controller)
+    result = execute("controllers")
+    assert result.exit_code == 0, result.stdout
+    lines = result.stdout.splitlines()
+    assert lines[0].split() == ["controller", "prefix", "routes", "build", "(ms)"]
+    assert any(line.split()[:3] == ["plugin-yoi", "/plugin-yoi", "1"] for line in lines)
@@ -0,0 +1,126 @@
+import gzip
+import zlib
+
+from fastapi import Header, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from fastack import Controller
+from fastack.cache import MemoryCache
+from fastack.decorators import route
+from fastack.middleware import CompressionMiddleware
+from fastack.middleware.compression import negotiate_encoding
+
+chunks_sent = []
+
+
+class ReportController(Controller):
+    etag = True
+
+    def get(self, size: int = 100) -> Response:
+        return self.json("Report", ["row"] * size)
+
+    @route("/stream", action=True, methods=["GET"])
+    def stream(self) -> Response:
+        async def generate():
+            for idx in range(5):
+                chunks_sent.append(idx)
+                yield f'{{"row": {idx}}}\n'.encode() * 50
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    @route("/image", action=True, methods=["GET"])
+    def image(self) -> Response:
+        return Response(b"x" * 1000, media_type="image/png")
+
+    @route("/text", action=True, methods=["GET"])
+    def text(self) -> Response:
+        return PlainTextResponse("text " * 200, headers={"Content-Encoding": "custom"})
+
+
+class ProfileController(Controller):
+    def get(self, user: str = Header(...)) -> Response:
+        # The version token is the same for every user, the body isn't
+        return self.json("Profile", [user] * 100, etag="v1")
+
+
+def test_negotiate_encoding():
+    encodings = ("br", "gzip", "deflate")
+    assert negotiate_encoding("gzip, deflate", encodings) == "gzip"
+    assert negotiate_encoding("deflate;q=1, gzip;q=0.5", encodings) == "deflate"
+    assert negotiate_encoding("br;q=0, *", encodings) == "gzip"
+    assert negotiate_encoding("identity", encodings) is None
+    assert negotiate_encoding("gzip;q=0", encodings) is None
+
+
+def test_compression_middleware(make_app):
+    cache = MemoryCache()
+    app = make_app(ReportController)
+    app.add_middleware(CompressionMiddleware, minimum_size=500, cache=cache)
+    client = TestClient(app)
+
+    # small responses are not compressed
+    resp = client.get(
+        "/report", params={"size": 1}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert "content-encoding" not in resp.headers
+    assert resp.headers["vary"] == "Accept-Encoding"
+
+    # requests' client decodes the body, check the raw bytes
+    for encoding, decompress in (
+        ("gzip", gzip.decompress),
+        ("deflate", zlib.decompress),
+    ):
+        resp = client.get("/report", headers={"Accept-Encoding": encoding}, stream=True)
+        raw = resp.raw.read(decode_content=False)
+        assert resp.headers["content-encoding"] == encoding
+        assert resp.headers["content-length"] == str(len(raw))
+        assert len(raw) < 200
+        assert decompress(raw).startswith(b'{"detail":"Report"')
+
+    # repeated hits are served from the cache of compressed responses
+    assert cache.stats.misses == 2
+    resp = client.get("/report", headers={"Accept-Encoding": "gzip"})
+    assert resp.json()["data"] == ["row"] * 100
+    assert cache.stats.hits == 1
+
+    # uncompressible content
+    resp = client.get("/report/image", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+    resp = client.get("/report/text", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "custom"
+
+    resp = client.get("/report", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers
+
+
+def test_compression_streaming(make_app):
+    chunks_sent.clear()
+    app = make_app(ReportController)
+    app.add_middleware(CompressionMiddleware, minimum_size=500, cache=MemoryCache())
+    client = TestClient(app)
+    resp = client.get(
+        "/report/stream", headers={"Accept-Encoding": "gzip"}, stream=True
+    )
+    raw = resp.raw.read(decode_content=False)
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "content-length" not in resp.headers
+    lines = gzip.decompress(raw).splitlines()
+    assert len(lines) == 250
+    assert lines[-1] == b'{"row": 4}'
+    assert chunks_sent == [0, 1, 2, 3, 4]
+
+
+def test_compression_cache_per_body(make_app):
+    cache = MemoryCache()
+    app = make_app(ProfileController)
+    app.add_middleware(CompressionMiddleware, minimum_size=500, cache=cache)
+    client = TestClient(app)
+
+    for user in ("alice", "bob", "alice"):
+        resp = client.get("/profile", headers={"Accept-Encoding": "gzip", "User": user})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert resp.json()["data"] == [user] * 100
+        # the compressed variant doesn't reuse the strong ETag of the identity
+        assert resp.headers["etag"] == 'W/"v1"'
+    assert (cache.stats.misses, cache.stats.hits) == (2, 1)
@@ -1,10 +1,17 @@
+from types import MethodType
 from typing import Callable
 
 import pytest
+from fastapi import Response
+from fastapi.responses import JSONResponse
 from fastapi.testclient import TestClient
 
 from fastack import Controller, Fastack
-from tests.resources.controllers import CustomController, UserController
+from tests.resources.controllers import (
+    CustomController,
+    PluginYoiController,
+    UserController,
+)
 
 
 @pytest.mark.parametrize(
@@ -47,3 +54,56 @@ def test_controller(
     response = client.delete(path)
     assert response.status_code == 200
     assert response.json() == {"detail": "Deleted", "data": {"id": uid}}
+
+
+def test_route_table():
+    table = {info.method_name: info for info in CustomController.__route_table__}
+    assert set(table) == {"create", "destroy", "list", "retrieve", "update"}
+    assert table["retrieve"].path == "/get/{id}"
+    assert table["retrieve"].name == "get_user"
+    assert table["list"].params["methods"] == ["GET"]
+
+    controller = CustomController()
+    router = controller.build()
+    assert controller.build_time is not None
+    routes = {route.name: route.path for route in router.routes}
+    assert routes["custom:get_user"] == "/custom/get/{id}"
+    # the table isn't changed by build
+    assert controller.build().routes[0].path == router.routes[0].path
+    assert table["retrieve"].path == "/get/{id}"
+
+
+class ExportController(Controller):
+    def get_http_method(self, method: str):
+        if method == "export":
+            return "GET"
+        return super().get_http_method(method)
+
+    def export(self) -> Response:
+        return self.json("Export")
+
+    @classmethod
+    def retrieve(cls, id: int) -> Response:
+        return JSONResponse({"id": id})
+
+
+def test_route_table_overrides():
+    # the class table doesn't know ``get_http_method``
+    assert {info.method_name for info in ExportController.__route_table__} == {
+        "retrieve"
+    }
+    controller = ExportController()
+    routes = {route.name: route for route in controller.build().routes}
+    assert routes["export:export"].methods == {"GET"}
+    assert routes["export:retrieve"].path == "/export/{id}"
+
+    # methods and endpoints of the instance
+    controller = PluginYoiController()
+    controller.method_endpoints = {**controller.method_endpoints, "hello": "POST"}
+    controller.hello = MethodType(lambda self: self.json("Hello"), controller)
+    routes = {route.name: route for route in controller.build().routes}
+    assert routes["plugin-yoi:hello"].methods == {"POST"}
+    assert {info.method_name for info in controller.get_route_table()} == {
+        "get",
+        "hello",
+    }
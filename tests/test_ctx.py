@@ -2,8 +2,10 @@ import pytest
 from fastapi.testclient import TestClient
 
 from fastack.app import Fastack
+from fastack.decorators import request_cached
 from fastack.globals import (
     current_app,
+    g,
     has_app_context,
     has_request_context,
     has_websocket_context,
@@ -54,3 +56,84 @@ def test_websocket_context(app: Fastack, client: TestClient):
 
     with client.websocket_connect("/websocket_ctx") as ws:
         assert ws.receive_json() == {"success": True}
+
+
+def test_bind_worker_app(make_app):
+    from fastack.context import _ctx_stack, get_worker_app
+
+    bound_app = make_app(DEBUG=True, BIND_WORKER_APP=True)
+    assert bound_app.bind_to_worker
+
+    @bound_app.get("/lazy")
+    async def lazy():
+        created = _ctx_stack.get()._connection is not None
+        return {
+            "created": created,
+            "app": current_app._get_current_object() is bound_app,
+            "path": request.url.path,
+        }
+
+    with TestClient(bound_app) as client:
+        assert get_worker_app() is bound_app
+        resp = client.get("/lazy").json()
+        assert resp == {"created": False, "app": True, "path": "/lazy"}
+
+    assert get_worker_app() is None
+
+
+def test_request_globals(app: Fastack, client: TestClient):
+    with pytest.raises(RuntimeError, match="Working outside of application context"):
+        g.user
+
+    calls = []
+
+    def get_user():
+        if "user" not in g:
+            calls.append(1)
+            g.user = request.headers.get("X-User", "anonymous")
+        return g.user
+
+    @app.get("/request_globals")
+    async def request_globals():
+        get_user()
+        return {"user": get_user(), "keys": list(g), "missing": g.get("missing", 0)}
+
+    resp = client.get("/request_globals", headers={"X-User": "john"}).json()
+    assert resp == {"user": "john", "keys": ["user"], "missing": 0}
+    resp = client.get("/request_globals").json()
+    assert resp["user"] == "anonymous"
+    assert len(calls) == 2
+
+
+def test_request_cached(app: Fastack, client: TestClient):
+    calls = []
+
+    @request_cached
+    def get_tenant(name: str):
+        calls.append(name)
+        return {"tenant": name}
+
+    @request_cached
+    async def get_flags(tenant: str, *, beta: bool = False):
+        calls.append(tenant)
+        return [tenant, beta]
+
+    @app.get("/request_cached")
+    async def cached_view():
+        tenant = get_tenant(request.headers["X-Tenant"])
+        assert get_tenant(request.headers["X-Tenant"]) is tenant
+        flags = await get_flags("a", beta=True)
+        assert await get_flags("a", beta=True) is flags
+        return {"tenant": tenant, "flags": flags}
+
+    resp = client.get("/request_cached", headers={"X-Tenant": "acme"}).json()
+    assert resp == {"tenant": {"tenant": "acme"}, "flags": ["a", True]}
+    # cache is dropped when the request is finished
+    client.get("/request_cached", headers={"X-Tenant": "acme"})
+    assert calls == ["acme", "a", "acme", "a"]
+    assert get_tenant.cache_info() == (2, 2)
+    assert get_flags.cache_info().hits == 2
+
+    # outside of a context the function is always called
+    get_tenant("acme")
+    assert get_tenant.cache_info().misses == 3
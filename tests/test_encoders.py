@@ -0,0 +1,124 @@
+import dataclasses
+import datetime
+import enum
+import json
+import uuid
+from decimal import Decimal
+from typing import List
+
+import pytest
+from fastapi import Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from fastack import Controller, ListController
+from fastack.encoders import FastJSONResponse, get_json_backend, json_response_class
+from fastack.serializers import get_serializer
+
+
+class Color(enum.Enum):
+    RED = "red"
+
+
+class Tag(BaseModel):
+    name: str
+    created: datetime.datetime
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: float
+
+
+class Item(BaseModel):
+    id: uuid.UUID
+    price: Decimal
+    color: Color
+    tags: List[Tag]
+    day: datetime.date
+
+
+def make_payload():
+    return {
+        "item": Item(
+            id=uuid.UUID(int=1),
+            price=Decimal("9.5"),
+            color=Color.RED,
+            tags=[Tag(name="new", created=datetime.datetime(2022, 1, 2, 3, 4, 5))],
+            day=datetime.date(2022, 1, 2),
+        ),
+        "point": Point(1, 2.5),
+        "when": datetime.datetime(2022, 1, 2, 3, 4, 5, 6),
+        "text": "héllo",
+        "values": {1, 2},
+    }
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_backend_output(backend: str):
+    if backend == "orjson":
+        pytest.importorskip("orjson")
+
+    payload = make_payload()
+    expected = json.loads(JSONResponse(jsonable_encoder(payload)).body)
+    instance = get_json_backend(backend)
+    content = get_serializer(native=instance.native).encode(payload)
+    assert json.loads(instance.dumps(content)) == expected
+    if instance.native:
+        assert json.loads(instance.dumps(payload)) == expected
+
+
+def test_stdlib_backend_render():
+    content = jsonable_encoder(make_payload())
+    assert get_json_backend("json").dumps(content) == JSONResponse(content).body
+
+
+def test_json_response_class():
+    response_class = json_response_class("json")
+    assert issubclass(response_class, FastJSONResponse)
+    assert json_response_class("json") is response_class
+    body = response_class({"a": "é", "b": [1, 2]}).body
+    assert body == JSONResponse({"a": "é", "b": [1, 2]}).body
+
+
+class ItemController(ListController):
+    def retrieve(self, id: int) -> Response:
+        return self.json("Item", make_payload()["item"])
+
+    def list(
+        self, page: int = Query(1, gt=0), page_size: int = Query(10, gt=0)
+    ) -> Response:
+        data = [Point(x, x / 2) for x in range(20)]
+        return self.get_paginated_response(data, page, page_size)
+
+
+class StdlibController(Controller):
+    json_response_class = JSONResponse
+
+    def get(self) -> Response:
+        return self.json("Stdlib", {"when": datetime.date(2022, 1, 2)})
+
+
+@pytest.mark.parametrize("backend", [None, "json", "orjson"])
+def test_json_backend_setting(backend, make_client):
+    if backend == "orjson":
+        pytest.importorskip("orjson")
+
+    client = make_client(
+        ItemController, StdlibController, DEBUG=True, JSON_BACKEND=backend
+    )
+    if backend:
+        assert client.app.json_response_class.backend.name == backend
+
+    data = client.get("/item/1").json()["data"]
+    assert data == jsonable_encoder(make_payload()["item"])
+
+    data = client.get("/item", params={"page": 2, "page_size": 5}).json()
+    assert data["total"] == 5
+    assert data["data"][0] == {"x": 5, "y": 2.5}
+
+    # per-controller override
+    resp = client.get("/stdlib")
+    assert resp.json()["data"] == {"when": "2022-01-02"}
@@ -51,3 +51,43 @@ def test_unknown_error_handler(app: Fastack, client: TestClient):
 
     with pytest.raises(UnknownException, match="Unknown error"):
         client.get("/", headers={"X-Unknown-Error": "1"})
+
+
+def test_exception_handler_cache(app: Fastack, client: TestClient):
+    class CachedException(Exception):
+        pass
+
+    class SubCachedException(CachedException):
+        pass
+
+    @app.middleware.process_request
+    async def raise_error(request: Request):
+        if "X-Cached-Error" in request.headers:
+            raise SubCachedException()
+        if "X-Teapot" in request.headers:
+            raise HTTPException(status.HTTP_418_IM_A_TEAPOT)
+
+    def handler(request: Request, exc: CachedException):
+        return JSONResponse({"handler": "base"}, status_code=400)
+
+    def sub_handler(request: Request, exc: CachedException):
+        return JSONResponse({"handler": "sub"}, status_code=400)
+
+    app.add_exception_handler(CachedException, handler)
+    resp = client.get("/", headers={"X-Cached-Error": "1"})
+    assert resp.json() == {"handler": "base"}
+    assert app.exception_handler_cache[(SubCachedException, None)] is handler
+
+    # the cache is cleared when a handler is added
+    app.add_exception_handler(SubCachedException, sub_handler)
+    assert app.exception_handler_cache == {}
+    resp = client.get("/", headers={"X-Cached-Error": "1"})
+    assert resp.json() == {"handler": "sub"}
+
+    def teapot_handler(request: Request, exc: HTTPException):
+        return JSONResponse({"teapot": True}, status_code=exc.status_code)
+
+    assert client.get("/", headers={"X-Teapot": "1"}).status_code == 418
+    app.add_exception_handler(418, teapot_handler)
+    resp = client.get("/", headers={"X-Teapot": "1"})
+    assert resp.json() == {"teapot": True}
@@ -0,0 +1,98 @@
+from fastapi import Response
+
+from fastack import Controller, ListController
+from fastack.decorators import route
+from fastack.etag import compute_etag, etag_matches, format_etag
+
+loads = []
+
+
+class ArticleController(ListController):
+    etag = True
+
+    async def retrieve(self, id: int) -> Response:
+        return self.json("Article", {"id": id})
+
+    def list(self, page: int = 1, page_size: int = 10) -> Response:
+        return self.get_paginated_response(list(range(25)), page, page_size)
+
+    @route("/{id}/versioned", action=True, methods=["GET"])
+    def versioned(self, id: int) -> Response:
+        version = f"v{id}"
+        response = self.not_modified(version)
+        if response is not None:
+            return response
+
+        loads.append(id)
+        return self.json("Article", {"id": id}, etag=version)
+
+
+class PlainController(Controller):
+    @route(cache=True)
+    def get(self, etag: bool = False) -> Response:
+        return self.json("Plain", {"ok": True}, etag=etag)
+
+
+def test_etag_helpers():
+    assert compute_etag(b"a") == compute_etag(b"a") != compute_etag(b"b")
+    assert format_etag("v1") == '"v1"'
+    assert format_etag('W/"v1"') == 'W/"v1"'
+    assert etag_matches('"v1"', '"v0", W/"v1"')
+    assert etag_matches('"v1"', "*")
+    assert not etag_matches('"v1"', '"v2"')
+    assert not etag_matches('"v1"', None)
+
+
+def test_computed_etag(make_client):
+    client = make_client(ArticleController, PlainController)
+    for url in ("/article/1", "/article?page=2"):
+        resp = client.get(url)
+        etag = resp.headers["etag"]
+        assert etag == compute_etag(resp.content)
+
+        resp = client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert resp.headers["etag"] == etag
+        assert "content-length" not in resp.headers
+
+        resp = client.get(url, headers={"If-None-Match": '"other"'})
+        assert resp.status_code == 200
+
+    # only for controllers that enable it
+    assert "etag" not in client.get("/plain").headers
+
+
+def test_offloaded_etag(make_client):
+    client = make_client(ArticleController, PlainController, JSON_OFFLOAD_THRESHOLD=1)
+    with client:
+        resp = client.get("/article/1")
+        etag = resp.headers["etag"]
+        assert etag == compute_etag(resp.content)
+        resp = client.get("/article/1", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert client.app.json_offload.stats.offloaded == 2
+
+
+def test_version_etag(make_client):
+    loads.clear()
+    client = make_client(ArticleController, PlainController)
+    resp = client.get("/article/1/versioned")
+    assert resp.headers["etag"] == '"v1"'
+    assert resp.json()["data"] == {"id": 1}
+
+    resp = client.get("/article/1/versioned", headers={"If-None-Match": '"v1"'})
+    assert resp.status_code == 304
+    assert loads == [1]
+
+    # another version
+    resp = client.get("/article/2/versioned", headers={"If-None-Match": '"v1"'})
+    assert resp.status_code == 200
+
+
+def test_cached_etag(make_client):
+    client = make_client(ArticleController, PlainController)
+    etag = client.get("/plain?etag=1").headers["etag"]
+    resp = client.get("/plain?etag=1", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert client.app.response_cache.stats.hits == 1
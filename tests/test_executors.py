@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException, Response
+from fastapi.testclient import TestClient
+
+from fastack import Controller
+from fastack.decorators import route
+from fastack.executors import Executor
+from fastack.globals import request
+
+EXECUTORS = {
+    "reports": {"max_workers": 2},
+    "lookups": {"max_workers": 1, "max_queue": 4},
+}
+
+
+class ReportController(Controller):
+    executor = "reports"
+
+    def get(self) -> Response:
+        thread = threading.current_thread().name
+        return self.json("Report", {"thread": thread, "path": request.url.path})
+
+    @route("/lookup", action=True, methods=["GET"], executor="lookups")
+    def lookup(self) -> Response:
+        return self.json("Lookup", threading.current_thread().name)
+
+    @route("/async", action=True, methods=["GET"])
+    async def get_async(self) -> Response:
+        return self.json("Async", threading.current_thread().name)
+
+
+class DefaultController(Controller):
+    def get(self) -> Response:
+        return self.json("Default", threading.current_thread().name)
+
+
+def test_controller_executors(make_client):
+    client = make_client(
+        ReportController,
+        DefaultController,
+        EXECUTORS=EXECUTORS,
+        PLUGINS=["fastack.metrics"],
+    )
+    data = client.get("/report").json()["data"]
+    assert data["thread"].startswith("fastack-reports")
+    # the request context is available in the pool
+    assert data["path"] == "/report"
+
+    assert client.get("/report/lookup").json()["data"].startswith("fastack-lookups")
+    assert not client.get("/report/async").json()["data"].startswith("fastack-")
+    assert not client.get("/default").json()["data"].startswith("fastack-")
+
+    stats = client.app.executors["reports"].stats
+    assert stats.submitted == stats.completed == 1
+    text = client.get("/metrics").text
+    assert 'fastack_executor_queue_seconds_count{executor="lookups"} 1.0' in text
+
+
+def test_unknown_executor(make_app):
+    with pytest.raises(LookupError, match="'reports'"):
+        make_app(ReportController, EXECUTORS={})
+
+    # routes added to the application are checked at startup
+    app = make_app(EXECUTORS={})
+
+    @app.get("/export")
+    @route(executor="exports")
+    def export():
+        return "Export"
+
+    with pytest.raises(LookupError, match="'exports'"):
+        with TestClient(app):
+            pass
+
+
+def test_executor_queue_limit():
+    executor = Executor("test", max_workers=1, max_queue=1, retry_after=5)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run(release.wait))
+        second = asyncio.ensure_future(executor.run(time.sleep, 0))
+        await asyncio.sleep(0.02)
+        assert executor.queued == 1
+        with pytest.raises(HTTPException) as exc:
+            await executor.run(time.sleep, 0)
+
+        release.set()
+        await asyncio.gather(first, second)
+        return exc.value
+
+    exc = asyncio.run(main())
+    executor.shutdown()
+    assert exc.status_code == 503
+    assert exc.headers == {"Retry-After": "5"}
+    stats = executor.stats
+    assert (stats.submitted, stats.completed, stats.rejected) == (2, 2, 1)
+    # the second call waited for the first one
+    assert stats.max_queue_seconds >= 0.01
+
+
+def test_executor_cancelled_call():
+    executor = Executor("test", max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def main():
+        task = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0.01)
+        # the thread is still busy
+        assert executor.pending == 1 and executor.is_full()
+        release.set()
+        while executor.pending:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    executor.shutdown()
+    assert executor.stats.completed == 1
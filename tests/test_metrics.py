@@ -0,0 +1,130 @@
+import multiprocessing
+import threading
+
+import pytest
+from fastapi import HTTPException, Response
+
+from fastack import Controller
+from fastack.decorators import route
+from fastack.metrics import MetricsRegistry, mark_process_dead
+
+
+class UserController(Controller):
+    def retrieve(self, id: int) -> Response:
+        if id == 0:
+            raise HTTPException(404, "User not found")
+        return self.json("User", {"id": id})
+
+    @route("/crash", action=True, methods=["GET"])
+    def crash(self) -> Response:
+        raise RuntimeError("crash")
+
+
+def parse_metrics(text: str):
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        name, _, value = line.rpartition(" ")
+        samples[name] = float(value)
+    return samples
+
+
+@pytest.mark.parametrize("multiprocess", [False, True])
+def test_metrics(tmp_path, multiprocess, make_client):
+    options = {"METRICS_DIR": str(tmp_path)} if multiprocess else {}
+    client = make_client(
+        UserController,
+        PLUGINS=["fastack.metrics"],
+        raise_server_exceptions=False,
+        **options,
+    )
+    assert client.get("/user/1").status_code == 200
+    assert client.get("/user/2").status_code == 200
+    assert client.get("/user/0").status_code == 404
+    assert client.get("/user/crash").status_code == 500
+
+    resp = client.get("/metrics")
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = parse_metrics(resp.text)
+    requests = (
+        'fastack_requests_total{endpoint="user:retrieve",method="GET",status="%s"}'
+    )
+    assert samples[requests % 200] == 2
+    assert samples[requests % 404] == 1
+    assert samples['fastack_request_errors_total{endpoint="user:crash"}'] == 1
+    assert 'fastack_request_errors_total{endpoint="user:retrieve"}' not in samples
+    assert (
+        samples['fastack_request_duration_seconds_count{endpoint="user:retrieve"}'] == 3
+    )
+    assert (
+        samples[
+            'fastack_request_duration_seconds_bucket{endpoint="user:retrieve",le="+Inf"}'
+        ]
+        == 3
+    )
+    assert samples['fastack_requests_in_progress{endpoint="user:retrieve"}'] == 0
+    assert client.app.metrics.requests.labels("user:retrieve", "GET", 200).get() == 2
+
+
+def _worker(directory: str, count: int):
+    registry = MetricsRegistry(directory)
+    counter = registry.counter("jobs", "Jobs.", ("queue",))
+    gauge = registry.gauge("busy", "Busy workers.")
+    for _ in range(count):
+        counter.labels("default").inc()
+    gauge.inc()
+
+
+def test_multiprocess_aggregation(tmp_path):
+    directory = str(tmp_path)
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_worker, args=(directory, n)) for n in (3, 4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    registry = MetricsRegistry(directory)
+    registry.counter("jobs", "Jobs.", ("queue",))
+    registry.gauge("busy", "Busy workers.")
+    samples = parse_metrics(registry.generate_latest())
+    assert samples['jobs_total{queue="default"}'] == 7
+    assert samples["busy"] == 2
+
+    mark_process_dead(workers[0].pid, directory)
+    samples = parse_metrics(registry.generate_latest())
+    assert samples['jobs_total{queue="default"}'] == 7
+    assert samples["busy"] == 1
+
+
+def test_mmap_store_grows(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    counter = registry.counter("hits", "Hits.", ("key",))
+    for idx in range(2000):
+        counter.labels("k" * 20 + str(idx)).inc(idx)
+
+    samples = parse_metrics(registry.generate_latest())
+    assert len(samples) == 2000
+    assert samples['hits_total{key="%s"}' % ("k" * 20 + "1999")] == 1999
+
+
+def test_mmap_store_threads(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    counter = registry.counter("hits", "Hits.", ("key",))
+
+    def work(thread: int):
+        for idx in range(2000):
+            counter.labels("shared").inc()
+            # new keys remap the file while the other threads update it
+            counter.labels(f"{thread}-{idx}").inc()
+
+    threads = [threading.Thread(target=work, args=(idx,)) for idx in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    samples = parse_metrics(registry.generate_latest())
+    assert samples['hits_total{key="shared"}'] == 8000
+    assert len(samples) == 8001
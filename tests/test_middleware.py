@@ -1,11 +1,15 @@
 import time
 
-from fastapi import Request, Response, WebSocket
+import pytest
+from fastapi import HTTPException, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse
 from fastapi.testclient import TestClient
 from starlette.middleware.base import RequestResponseEndpoint
 
-from fastack import Fastack
+from fastack import Controller, Fastack
 from fastack.globals import websocket
+from fastack.middleware.base import BaseMiddleware, FusedMiddleware
+from fastack.routing import PathScope, PrefixTrie
 from tests.resources.middleware import (  # noqa
     AuthMiddleware,
     process_request,
@@ -54,3 +58,188 @@ def test_middleware(app: Fastack, client: TestClient):
 
     resp = client.get("/")
     assert "X-Process-Time" in resp.headers
+
+
+def test_middleware_streaming_response(make_app):
+    app = make_app(DEBUG=True)
+    chunks_sent = []
+
+    async def stream():
+        for chunk in (b"a", b"b", b"c"):
+            chunks_sent.append(chunk)
+            yield chunk
+
+    @app.get("/stream")
+    def get_stream():
+        return StreamingResponse(stream(), media_type="text/plain")
+
+    class StreamMiddleware(BaseMiddleware):
+        async def process_response(self, response: Response, exc: Exception = None):
+            # called before the body is sent
+            assert chunks_sent == []
+            response.headers["X-Status"] = str(response.status_code)
+            response.status_code = 201
+
+    app.add_middleware(StreamMiddleware)
+    middleware = app.middleware_stack.app
+    assert isinstance(middleware, StreamMiddleware)
+    assert middleware.http_middleware is None
+    assert not middleware.has_process_request
+
+    client = TestClient(app)
+    resp = client.get("/stream")
+    assert resp.status_code == 201
+    assert resp.headers["X-Status"] == "200"
+    assert resp.text == "abc"
+
+
+def test_fused_middleware_hooks(make_app):
+    app = make_app(DEBUG=True)
+    calls = []
+
+    @app.get("/")
+    def index():
+        return {"ok": True}
+
+    def add_hooks(idx: int):
+        @app.middleware("request")
+        async def on_request(request: Request):
+            calls.append(f"request{idx}")
+            if request.headers.get("X-Fail") == str(idx):
+                raise HTTPException(400, "fail")
+
+        @app.middleware("response")
+        async def on_response(response: Response, exc: Exception = None):
+            calls.append(f"response{idx}")
+
+    add_hooks(1)
+    stack = app.middleware_stack
+    add_hooks(2)
+    # hooks are added to the same layer, the stack isn't rebuilt
+    assert app.middleware_stack is stack
+    assert len(app.user_middleware) == 1
+    assert isinstance(stack.app, FusedMiddleware)
+    assert not isinstance(stack.app.app, FusedMiddleware)
+
+    client = TestClient(app)
+    assert client.get("/").status_code == 200
+    assert calls == ["request2", "request1", "response1", "response2"]
+
+    calls.clear()
+    assert client.get("/", headers={"X-Fail": "1"}).status_code == 400
+    assert calls == ["request2", "request1", "response1", "response2"]
+
+    calls.clear()
+    # only the response hooks added after the failed hook see the error response
+    assert client.get("/", headers={"X-Fail": "2"}).status_code == 400
+    assert calls == ["request2", "response2"]
+
+    # a middleware added in between starts a new layer
+    app.add_middleware(BaseMiddleware)
+    add_hooks(3)
+    assert len(app.user_middleware) == 3
+    calls.clear()
+    assert client.get("/").status_code == 200
+    assert calls == [
+        "request3",
+        "request2",
+        "request1",
+        "response1",
+        "response2",
+        "response3",
+    ]
+
+
+def test_prefix_trie():
+    trie = PrefixTrie(default="default")
+    trie.insert("/api", "api")
+    trie.insert("/api/user/", "user")
+    assert trie.lookup("/") == "default"
+    assert trie.lookup("/apis") == "default"
+    assert trie.lookup("/api") == "api"
+    assert trie.lookup("/api/item/1") == "api"
+    assert trie.lookup("/api/user/1") == "user"
+    assert sorted(trie.prefixes()) == ["/api", "/api/user"]
+    # inserting a prefix again replaces its value
+    trie.insert("/api/", "api2")
+    assert trie.lookup("/api/item/1") == "api2"
+    assert sorted(trie.prefixes()) == ["/api", "/api/user"]
+    assert len(trie) == 2
+
+    scope = PathScope(include=["/api"], exclude=["/api/health", "/api"])
+    assert not scope.match("/api/user")
+    assert list(scope.prefixes()) == ["/api", "/api/health"]
+
+    scope = PathScope(include=["/api"], exclude=["/api/health"])
+    assert scope.match("/api/user")
+    assert not scope.match("/api/health")
+    assert not scope.match("/static/app.js")
+
+
+def test_path_scoped_middleware(make_app):
+    app = make_app(DEBUG=True)
+    calls = []
+
+    class ItemController(Controller):
+        def get(self) -> Response:
+            return self.json("Items")
+
+    item_controller = ItemController()
+    app.include_controller(item_controller)
+
+    @app.get("/health")
+    def health():
+        return {"ok": True}
+
+    class AuditMiddleware(BaseMiddleware):
+        exclude = ["/health"]
+
+        async def process_request(self, request: Request):
+            calls.append("audit")
+
+    @app.middleware("request", controllers=[item_controller])
+    async def on_item(request: Request):
+        calls.append("item")
+
+    @app.middleware.process_response(include=["/health"])
+    async def on_health(response: Response, exc: Exception = None):
+        calls.append("health")
+
+    @app.middleware.process_request
+    async def on_all(request: Request):
+        calls.append("all")
+
+    app.add_middleware(AuditMiddleware)
+    client = TestClient(app)
+    assert client.get("/item").status_code == 200
+    assert calls == ["audit", "all", "item"]
+
+    calls.clear()
+    assert client.get("/health").status_code == 200
+    assert calls == ["all", "health"]
+
+
+def test_path_scoped_middleware_prefix(make_app):
+    app = make_app()
+    calls = []
+
+    class ItemController(Controller):
+        def get(self) -> Response:
+            return self.json("Items", [])
+
+    item_controller = ItemController()
+    with pytest.raises(RuntimeError, match="ItemController must be included"):
+        PathScope(controllers=[item_controller])
+
+    # the prefix where the controller is included, not its URL prefix
+    app.include_controller(item_controller, prefix="/api/v1/items")
+    assert item_controller.mount_prefixes == ("/api/v1/items",)
+
+    @app.middleware("request", controllers=[item_controller])
+    async def authenticate(request: Request):
+        calls.append("auth")
+        raise HTTPException(401)
+
+    client = TestClient(app)
+    assert client.get("/api/v1/items").status_code == 401
+    assert calls == ["auth"]
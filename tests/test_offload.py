@@ -0,0 +1,138 @@
+import datetime
+import os
+import threading
+from typing import Any
+
+import pytest
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from fastack import Controller
+from fastack.decorators import route
+from fastack.offload import OffloadedJSONResponse, OffloadPolicy, estimate_cost
+
+
+class Item(BaseModel):
+    id: int
+    created: datetime.datetime
+
+
+def make_items(n: int):
+    return [Item(id=idx, created=datetime.datetime(2022, 1, 2)) for idx in range(n)]
+
+
+class ItemController(Controller):
+    async def list(self, size: int = 5) -> Response:
+        return self.json("Items", make_items(size))
+
+    @route("/sync", action=True, methods=["GET"])
+    def sync(self, size: int = 5) -> Response:
+        return self.json("Items", make_items(size))
+
+
+class Row:
+    def __init__(self, id: int) -> None:
+        self.id = id
+        # Not picklable
+        self.loader = lambda: id
+
+    def serialize(self):
+        thread = threading.current_thread().name
+        return {"id": self.id, "thread": thread, "pid": os.getpid()}
+
+
+class RowController(Controller):
+    async def get(self) -> Response:
+        return self.json("Rows", [Row(idx) for idx in range(20)])
+
+
+class SerializeController(Controller):
+    def serialize_data(self, obj: Any) -> Any:
+        return [{"item": item.id} for item in obj]
+
+    async def get(self) -> Response:
+        return self.json("Items", make_items(20))
+
+
+def test_estimate_cost():
+    assert estimate_cost(None) == 1
+    assert estimate_cost(Item(id=1, created=datetime.datetime.now())) == 1
+    assert estimate_cost(list(range(10))) == 10
+    assert estimate_cost({"a": list(range(10)), "b": 1}) == 12
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+@pytest.mark.parametrize("backend", [None, "json"])
+def test_offload(executor: str, backend, make_client):
+    client = make_client(
+        ItemController,
+        SerializeController,
+        JSON_OFFLOAD_THRESHOLD=10,
+        JSON_OFFLOAD_EXECUTOR=executor,
+        JSON_BACKEND=backend,
+    )
+    stats = client.app.json_offload.stats
+    expected = jsonable_encoder(make_items(20))
+    with client:
+        resp = client.get("/item", params={"size": 20})
+        assert resp.json() == {"detail": "Items", "data": expected}
+        assert resp.headers["content-length"] == str(len(resp.content))
+        assert stats.offloaded == 1
+        assert stats.max_seconds > 0
+        pool = client.app.json_offload._pool
+        assert (pool is not None) == (executor == "process")
+
+        resp = client.get("/item")
+        assert len(resp.json()["data"]) == 5
+        assert stats.inline == 1
+
+        # sync responders already run in the threadpool
+        resp = client.get("/item/sync", params={"size": 20})
+        assert resp.json()["data"] == expected
+        assert stats.as_dict()["offloaded"] == 1
+        assert stats.inline == 2
+
+        resp = client.get("/serialize")
+        assert resp.json()["data"] == [{"item": idx} for idx in range(20)]
+        assert stats.offloaded == 2
+
+
+def test_offload_metrics(make_client):
+    client = make_client(
+        ItemController,
+        SerializeController,
+        JSON_OFFLOAD_THRESHOLD=10,
+        PLUGINS=["fastack.metrics"],
+    )
+    client.get("/item", params={"size": 20})
+    client.get("/item")
+    text = client.get("/metrics").text
+    assert 'fastack_json_offload_seconds_count{executor="thread"} 1.0' in text
+    assert "fastack_json_inline_total 1.0" in text
+
+
+def test_offloaded_response_body():
+    response = OffloadedJSONResponse(
+        lambda value: value, (b'{"a":1}',), OffloadPolicy(1), headers={"X-A": "b"}
+    )
+    assert "content-length" not in response.headers
+    assert response.body == b'{"a":1}'
+    assert response.headers["content-length"] == "7"
+    assert response.headers["x-a"] == "b"
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_offload_encoding(executor: str, make_client):
+    client = make_client(
+        RowController, JSON_OFFLOAD_THRESHOLD=10, JSON_OFFLOAD_EXECUTOR=executor
+    )
+    with client:
+        data = client.get("/row").json()["data"]
+    assert [row["id"] for row in data] == list(range(20))
+    if executor == "thread":
+        # a dedicated executor, not the threadpool of the sync responders
+        assert {row["thread"] for row in data} == {"fastack-json-offload_0"}
+    else:
+        # encoded by the responder, only JSON types are sent to the process
+        assert {row["pid"] for row in data} == {os.getpid()}
@@ -0,0 +1,138 @@
+import json
+import pstats
+
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from fastack import Controller
+from fastack.middleware.profiler import sign_profile_token
+
+SECRET = "s3cr3t"
+
+
+class ProfiledController(Controller):
+    async def get(self):
+        return self.json("Profiled", {"items": list(range(10))})
+
+
+def load_items():
+    return list(range(10))
+
+
+class SyncController(Controller):
+    def get(self):
+        return self.json("Sync", {"items": load_items()})
+
+
+class ExecutorController(Controller):
+    executor = "reports"
+
+    def get(self):
+        return self.json("Executor", {"items": load_items()})
+
+
+@pytest.fixture
+def make_profiled_client(make_app, tmp_path):
+    def factory(**options) -> TestClient:
+        app = make_app(
+            ProfiledController,
+            SyncController,
+            ExecutorController,
+            DEBUG=True,
+            PROFILER_ENABLED=True,
+            PROFILER_SECRET=SECRET,
+            PROFILER_OUTPUT_DIR=str(tmp_path),
+            EXECUTORS={"reports": {"max_workers": 1}},
+            **options,
+        )
+
+        @app.middleware.process_request
+        async def audit(request: Request):
+            pass
+
+        return TestClient(app)
+
+    return factory
+
+
+def test_profile_signed_request(tmp_path, make_profiled_client):
+    client = make_profiled_client()
+    resp = client.get("/profiled")
+    assert resp.status_code == 200
+    assert list(tmp_path.iterdir()) == []
+
+    for token in ["invalid", "1.abc", sign_profile_token(SECRET, "/other")]:
+        client.get("/profiled", headers={"X-Fastack-Profile": token})
+    assert list(tmp_path.iterdir()) == []
+
+    token = sign_profile_token(SECRET, "/profiled")
+    resp = client.get("/profiled", headers={"X-Fastack-Profile": token})
+    assert resp.status_code == 200
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    assert files[0].name.endswith("-GET-profiled.prof")
+    stats = pstats.Stats(str(files[0]))
+    functions = {name for _, _, name in stats.stats}  # type: ignore[attr-defined]
+    assert {"audit", "solve_dependencies", "get", "json"} <= functions
+
+
+def test_profile_expired_token(tmp_path, make_profiled_client):
+    client = make_profiled_client()
+    token = sign_profile_token(SECRET, "/profiled", expires_in=-1)
+    client.get("/profiled", headers={"X-Fastack-Profile": token})
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profile_sampling_speedscope(tmp_path, make_profiled_client):
+    client = make_profiled_client(
+        PROFILER_SAMPLE_RATE=1.0, PROFILER_FORMAT="speedscope"
+    )
+    resp = client.get("/profiled")
+    assert resp.json()["detail"] == "Profiled"
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    data = json.loads(files[0].read_text())
+    frames = {frame["name"] for frame in data["shared"]["frames"]}
+    assert {"audit", "solve_dependencies", "get", "json"} <= frames
+    events = data["profiles"][0]["events"]
+    opened = sum(1 for e in events if e["type"] == "O")
+    assert opened == len(events) - opened
+    assert [e["at"] for e in events] == sorted(e["at"] for e in events)
+
+
+def test_invalid_format(make_profiled_client):
+    with pytest.raises(AssertionError, match="format must be one of"):
+        make_profiled_client(PROFILER_FORMAT="json")
+
+
+def test_profile_sync_responder(tmp_path, make_profiled_client):
+    client = make_profiled_client(PROFILER_SAMPLE_RATE=1.0)
+    for path in ["/sync", "/executor"]:
+        resp = client.get(path)
+        assert resp.status_code == 200
+        files = list(tmp_path.iterdir())
+        assert len(files) == 1
+        stats = pstats.Stats(str(files[0]))
+        functions = {name for _, _, name in stats.stats}  # type: ignore[attr-defined]
+        # the responder runs in a worker thread
+        assert {"audit", "solve_dependencies", "get", "load_items", "json"} <= functions
+        files[0].unlink()
+
+
+def test_profile_sync_responder_speedscope(tmp_path, make_profiled_client):
+    client = make_profiled_client(
+        PROFILER_SAMPLE_RATE=1.0, PROFILER_FORMAT="speedscope"
+    )
+    assert client.get("/sync").status_code == 200
+    files = list(tmp_path.iterdir())
+    data = json.loads(files[0].read_text())
+    frames = [frame["name"] for frame in data["shared"]["frames"]]
+    main, thread = data["profiles"]
+    assert thread["name"] == "GET /sync (thread 1)"
+    main_frames = {frames[e["frame"]] for e in main["events"]}
+    thread_frames = {frames[e["frame"]] for e in thread["events"]}
+    assert {"audit", "solve_dependencies"} <= main_frames
+    assert {"get", "load_items", "json"} <= thread_frames
+    keys = [(f["name"], f["file"], f["line"]) for f in data["shared"]["frames"]]
+    assert len(keys) == len(set(keys))
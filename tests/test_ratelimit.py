@@ -0,0 +1,143 @@
+import pytest
+from fastapi import Response
+from starlette.authentication import (
+    AuthCredentials,
+    AuthenticationBackend,
+    SimpleUser,
+)
+from starlette.middleware import Middleware
+from starlette.middleware.authentication import AuthenticationMiddleware
+
+from fastack import Controller
+from fastack.benchmark import make_scope
+from fastack.ratelimit import (
+    BucketTable,
+    RateLimiter,
+    RateLimitRule,
+    SharedBucketTable,
+    parse_rate,
+)
+
+
+class ReportController(Controller):
+    def get(self) -> Response:
+        return self.json("Report")
+
+    def post(self) -> Response:
+        return self.json("Created")
+
+
+def test_parse_rate():
+    assert parse_rate("10/second") == (10.0, 10.0)
+    assert parse_rate("120/minutes") == (2.0, 120.0)
+    assert parse_rate("5") == (5.0, 5.0)
+    assert parse_rate(0.5) == (0.5, 0.5)
+    with pytest.raises(ValueError):
+        parse_rate("1/week")
+
+
+def test_rate_limiter():
+    now = 0.0
+    rules = [
+        RateLimitRule("/report", "1/second", burst=2),
+        RateLimitRule("/report", "1/minute", methods=["POST"], key="header:X-Key"),
+    ]
+    limiter = RateLimiter(rules, BucketTable(shards=2), clock=lambda: now)
+
+    scope = make_scope("GET", "/report/1")
+    assert limiter.check(scope)[1] == 0.0
+    assert limiter.check(scope)[1] == 0.0
+    rule, wait = limiter.check(scope)
+    assert rule is rules[0] and wait == 1.0
+    # another client
+    other = dict(scope, client=("10.0.0.1", 1000))
+    assert limiter.check(other)[1] == 0.0
+
+    now = 0.5
+    assert limiter.check(scope)[1] == 0.5
+    now = 1.0
+    assert limiter.check(scope)[1] == 0.0
+
+    post = make_scope("POST", "/report", [("X-Key", "a")])
+    assert limiter.check(post) == (rules[1], 0.0)
+    assert limiter.check(post) == (rules[1], 60.0)
+    assert limiter.check(make_scope("POST", "/report", [("X-Key", "b")]))[1] == 0.0
+
+    # not limited
+    assert limiter.check(make_scope("GET", "/other")) == (None, 0.0)
+    assert (limiter.stats.allowed, limiter.stats.limited) == (6, 3)
+
+
+def test_bucket_table_eviction():
+    table = BucketTable(shards=1, max_keys=2)
+    for key in ("a", "b", "a", "c"):
+        table.take(key, 1.0, 1.0, 0.0)
+    assert list(table.shards[0]) == ["a", "c"]
+
+
+def test_shared_bucket_table(tmp_path):
+    path = str(tmp_path / "ratelimit")
+    table = SharedBucketTable(path, slots=64, shards=4)
+    assert table.take("key", 1.0, 3.0, 10.0) == 0.0
+
+    # the buckets are shared with the other workers
+    worker = SharedBucketTable(path, slots=64, shards=4)
+    assert worker.take("key", 1.0, 3.0, 10.0) == 0.0
+    assert worker.take("key", 1.0, 3.0, 10.0) == 0.0
+    worker.close()
+    assert table.take("key", 1.0, 3.0, 10.0) == 1.0
+    # keys that collide on the probed slots replace the oldest bucket
+    waits = [table.take(f"k{idx}", 1.0, 1.0, 11.0 + idx) for idx in range(200)]
+    assert waits == [0.0] * 200
+    table.close()
+
+
+def test_rate_limit_plugin(make_client):
+    client = make_client(
+        ReportController,
+        PLUGINS=["fastack.metrics", "fastack.ratelimit"],
+        RATE_LIMITS=[{"path": "/report", "rate": "2/minute", "methods": ["POST"]}],
+    )
+    assert client.post("/report").status_code == 200
+    assert client.post("/report").status_code == 200
+    resp = client.post("/report")
+    assert resp.status_code == 429
+    assert resp.json() == {"detail": "Too Many Requests"}
+    assert resp.headers["retry-after"] == "30"
+    assert client.get("/report").status_code == 200
+
+    assert client.app.rate_limiter.stats.limited == 1
+    text = client.get("/metrics").text
+    assert 'fastack_rate_limited_total{rule="POST /report"} 1.0' in text
+
+
+class TokenBackend(AuthenticationBackend):
+    async def authenticate(self, conn):
+        token = conn.headers.get("Authorization")
+        if token is not None:
+            return AuthCredentials(["authenticated"]), SimpleUser(token)
+
+
+def test_rate_limit_user_key(make_client):
+    client = make_client(
+        ReportController,
+        middleware=[Middleware(AuthenticationMiddleware, backend=TokenBackend())],
+        PLUGINS=["fastack.ratelimit"],
+        RATE_LIMITS=[{"path": "/report", "rate": "1/minute", "key": "user"}],
+    )
+    # one bucket per user, the IP for anonymous users
+    assert client.get("/report", headers={"Authorization": "alice"}).status_code == 200
+    assert client.get("/report", headers={"Authorization": "bob"}).status_code == 200
+    assert client.get("/report").status_code == 200
+    assert client.get("/report", headers={"Authorization": "alice"}).status_code == 429
+    assert client.get("/report").status_code == 429
+
+
+def test_rate_limit_user_key_without_authentication(make_client):
+    client = make_client(
+        ReportController,
+        PLUGINS=["fastack.ratelimit"],
+        RATE_LIMITS=[{"path": "/report", "rate": "1/minute", "key": "user"}],
+    )
+    with pytest.raises(RuntimeError, match="AuthenticationMiddleware"):
+        client.get("/report")
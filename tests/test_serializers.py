@@ -0,0 +1,142 @@
+import dataclasses
+import datetime
+import enum
+import gc
+import uuid
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Extra, Field
+
+from fastack.serializers import Serializer
+
+
+class Color(enum.Enum):
+    RED = "red"
+
+
+class Tag(BaseModel):
+    name: str
+    created: datetime.datetime
+
+
+class Item(BaseModel):
+    id: uuid.UUID
+    name: str = Field(..., alias="itemName")
+    price: Decimal
+    count: Optional[int] = None
+    color: Color
+    tags: List[Tag] = []
+    meta: Dict[str, Tag] = {}
+
+
+class Names(BaseModel):
+    __root__: List[str]
+
+
+class CustomEncoded(BaseModel):
+    when: datetime.date
+
+    class Config:
+        json_encoders = {datetime.date: lambda d: d.strftime("%d/%m/%Y")}
+
+
+class Account(BaseModel):
+    name: str
+    password: str = Field(..., exclude=True)
+    tag: Tag = Field(None, exclude={"created"})
+
+
+class Extras(BaseModel):
+    name: str
+
+    class Config:
+        extra = Extra.allow
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    tag: Tag
+
+
+class User:
+    def __init__(self, id: int) -> None:
+        self.id = id
+
+    def serialize(self):
+        return {"id": self.id, "color": Color.RED}
+
+
+def make_data():
+    now = datetime.datetime(2022, 1, 2, 3, 4, 5)
+    tag = Tag(name="new", created=now)
+    return [
+        Item(
+            id=uuid.UUID(int=1),
+            itemName="item",
+            price=Decimal("1.5"),
+            color=Color.RED,
+            tags=[tag],
+            meta={"first": tag},
+        ),
+        Names(__root__=["a", "b"]),
+        CustomEncoded(when=datetime.date(2022, 1, 2)),
+        Extras(name="extra", other=1),
+        {"point": Point(1, tag), Color.RED: (1, 2)},
+        User(1),
+        None,
+    ]
+
+
+def test_serializer():
+    serializer = Serializer()
+    for obj in make_data():
+        if isinstance(obj, (dict, User)):
+            # jsonable_encoder doesn't call serialize() and doesn't encode dataclass fields
+            continue
+        assert serializer.encode(obj) == jsonable_encoder(obj)
+
+    data = make_data()
+    assert serializer.encode(data[4]) == {
+        "point": {"x": 1, "tag": {"name": "new", "created": "2022-01-02T03:04:05"}},
+        "red": [1, 2],
+    }
+    assert serializer.encode(data[5]) == {"id": 1, "color": "red"}
+    assert serializer.get_encoder(Item) is serializer.get_encoder(Item)
+
+
+def test_native_serializer():
+    serializer = Serializer(native=True)
+    item = make_data()[0]
+    data = serializer.encode(item)
+    assert data["id"] == uuid.UUID(int=1)
+    assert data["price"] == Decimal("1.5")
+    assert data["color"] == "red"
+    assert data["tags"][0]["created"] == datetime.datetime(2022, 1, 2, 3, 4, 5)
+
+
+def test_serializer_exclude():
+    serializer = Serializer()
+    now = datetime.datetime(2022, 1, 2)
+    account = Account(name="a", password="secret")
+    assert serializer.encode(account) == jsonable_encoder(account)
+    assert "password" not in serializer.encode(account)
+    account.tag = Tag(name="t", created=now)
+    assert serializer.encode(account) == jsonable_encoder(account)
+    assert serializer.encode(account) == {"name": "a", "tag": {"name": "t"}}
+
+    # state of SQLAlchemy instances
+    data = {"id": 1, "_sa_instance_state": object(), "_other": 2}
+    assert serializer.encode(data) == jsonable_encoder(data) == {"id": 1, "_other": 2}
+
+
+def test_serializer_weak_classes():
+    serializer = Serializer()
+    cls = type("Temporary", (BaseModel,), {"__annotations__": {"name": str}})
+    assert serializer.encode(cls(name="a")) == {"name": "a"}
+    assert len(serializer._encoders) == 1
+    del cls
+    gc.collect()
+    assert len(serializer._encoders) == 0
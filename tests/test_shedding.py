@@ -0,0 +1,125 @@
+from fastapi import Depends, Response
+from fastapi.testclient import TestClient
+
+from fastack import Controller
+from fastack.constants import (
+    PRIORITY_CRITICAL,
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+)
+from fastack.decorators import route
+from fastack.middleware import LoadSheddingMiddleware
+from fastack.middleware.shedding import LoadShedder
+
+resolved = []
+
+
+def dependency():
+    resolved.append(1)
+
+
+class ReportController(Controller):
+    priority = PRIORITY_LOW
+
+    def get(self, _=Depends(dependency)) -> Response:
+        return self.json("Report")
+
+    @route("/status", action=True, methods=["GET"], priority=PRIORITY_CRITICAL)
+    def status(self) -> Response:
+        return self.json("Status")
+
+
+class HealthController(Controller):
+    priority = PRIORITY_CRITICAL
+
+    def get(self) -> Response:
+        return self.json("OK")
+
+
+def test_load_shedder():
+    values = iter([0.4, 0.9])
+    shedder = LoadShedder(
+        target=0.01, interval=1.0, step=0.5, random=lambda: next(values)
+    )
+    shedder.observe(0.05, now=0.0)
+    assert shedder.admit(PRIORITY_LOW, now=0.5)
+    shedder.observe(0.02, now=0.6)
+
+    # minimum delay of the interval is twice the target
+    assert not shedder.admit(PRIORITY_LOW, now=1.0)
+    assert shedder.pressure == 1.0
+    assert shedder.stats.min_delay == 0.02
+    assert shedder.admit(PRIORITY_NORMAL, now=1.0)
+    assert shedder.admit(PRIORITY_CRITICAL, now=1.0)
+
+    # below the target, the pressure is lowered by a step
+    shedder.observe(0.001, now=1.5)
+    assert not shedder.admit(PRIORITY_LOW, now=2.0)
+    assert shedder.pressure == 0.5
+    assert shedder.admit(PRIORITY_LOW, now=2.0)
+    # idle intervals
+    assert shedder.admit(PRIORITY_LOW, now=4.0)
+    assert shedder.pressure == 0.0
+
+    stats = shedder.stats
+    assert (stats.admitted, stats.shed, stats.overloaded) == (5, 2, 1)
+
+    shedder.pressure = 3.0
+    assert not shedder.admit(PRIORITY_HIGH, now=4.0)
+    assert shedder.admit(PRIORITY_CRITICAL, now=4.0)
+
+
+def find_middleware(app, cls):
+    node = app.middleware_stack
+    while node is not None and not isinstance(node, cls):
+        node = getattr(node, "app", None)
+    return node
+
+
+def test_load_shedding_middleware(make_app):
+    resolved.clear()
+    app = make_app(PLUGINS=["fastack.metrics"])
+    app.add_middleware(LoadSheddingMiddleware, interval=60, exclude=["/metrics"])
+    app.include_controller(ReportController())
+    app.include_controller(HealthController())
+
+    @app.get("/ping")
+    def ping():
+        return "pong"
+
+    client = TestClient(app)
+
+    assert client.get("/report").status_code == 200
+    assert resolved == [1]
+
+    middleware = find_middleware(app, LoadSheddingMiddleware)
+    shedder = middleware.shedder
+    assert shedder._min_delay > 0
+    shedder.pressure = float(PRIORITY_CRITICAL)
+    resp = client.get("/report")
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+    # rejected before the dependencies are resolved
+    assert resolved == [1]
+
+    assert client.get("/health").status_code == 200
+    assert client.get("/report/status").status_code == 200
+    # routes of the application are critical
+    assert client.get("/ping").status_code == 200
+
+    text = client.get("/metrics").text
+    assert (
+        'fastack_load_shedding_decisions_total{decision="shed",priority="0"} 1.0'
+        in text
+    )
+    assert (
+        'fastack_load_shedding_decisions_total{decision="admitted",priority="3"} 3.0'
+        in text
+    )
+    # shed requests are counted
+    assert (
+        'fastack_requests_total{endpoint="report:get",method="GET",status="503"} 1.0'
+        in text
+    )
+    assert "fastack_queue_delay_seconds_count 4.0" in text
@@ -0,0 +1,110 @@
+import asyncio
+import json
+from typing import Optional
+
+import pytest
+from fastapi import Response
+from pydantic import BaseModel
+
+from fastack import ListController
+from fastack.streaming import ItemStream, aislice, iterate
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+
+
+def generate(n: int):
+    for idx in range(n):
+        yield Item(id=idx, name=f"item {idx}")
+
+
+async def agenerate(n: int):
+    for item in generate(n):
+        await asyncio.sleep(0)
+        yield item
+
+
+class ItemController(ListController):
+    stream_chunk_size = 64
+
+    def list(
+        self,
+        source: str = "list",
+        page: Optional[int] = None,
+        page_size: Optional[int] = None,
+        ndjson: bool = False,
+    ) -> Response:
+        data = {
+            "list": lambda: list(generate(25)),
+            "iterable": lambda: generate(25),
+            "async": lambda: agenerate(25),
+        }[source]()
+        return self.get_streaming_response(data, page, page_size, ndjson=ndjson)
+
+
+@pytest.mark.parametrize("source", ["list", "iterable", "async"])
+def test_streaming_response(source: str, make_client):
+    client = make_client(ItemController, DEBUG=True, JSON_BACKEND="json")
+    resp = client.get("/item", params={"source": source})
+    assert resp.headers["content-type"] == "application/json"
+    body = resp.json()
+    assert body["total"] == 25
+    assert body["paging"] == {"next": None, "prev": None, "pages": [1]}
+    assert body["data"][3] == {"id": 3, "name": "item 3"}
+
+    resp = client.get("/item", params={"source": source, "page": 3, "page_size": 10})
+    body = resp.json()
+    assert body["total"] == 5
+    assert [item["id"] for item in body["data"]] == list(range(20, 25))
+    pages = [1, 2, 3] if source == "list" else None
+    assert body["paging"] == {"next": None, "prev": 2, "pages": pages}
+
+    # the total of an iterable is unknown, next page is guessed from a full page
+    resp = client.get("/item", params={"source": source, "page": 2, "page_size": 10})
+    assert resp.json()["paging"]["next"] == 3
+
+    resp = client.get("/item", params={"source": source, "ndjson": True})
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    lines = resp.text.splitlines()
+    assert len(lines) == 25
+    assert json.loads(lines[-1]) == {"id": 24, "name": "item 24"}
+
+
+def test_streaming_response_empty(make_client):
+    client = make_client(ItemController, DEBUG=True)
+    resp = client.get("/item", params={"page": 5, "page_size": 10})
+    assert resp.json() == {
+        "data": [],
+        "total": 0,
+        "paging": {"next": None, "prev": None, "pages": [1, 2, 3]},
+    }
+    resp = client.get("/item", params={"page": 5, "ndjson": True})
+    assert resp.content == b""
+
+
+def test_stream_backpressure():
+    consumed = []
+
+    async def source():
+        for idx in range(100):
+            consumed.append(idx)
+            yield idx
+
+    async def main():
+        stream = ItemStream(
+            iterate(source()), lambda obj: str(obj).encode(), chunk_size=10
+        )
+        chunks = stream.chunks(b"[", lambda: b"]")
+        first = await chunks.__anext__()
+        # items are only read when the next chunk is requested by the sender
+        assert len(consumed) < 10
+        rest = [chunk async for chunk in chunks]
+        assert json.loads(first + b"".join(rest)) == list(range(100))
+        assert stream.count == 100
+
+        items = [item async for item in aislice(iterate(range(10)), 2, 5)]
+        assert items == [2, 3, 4]
+
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+import anyio
+from fastapi import Header, Response
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from fastack import Controller
+from fastack.decorators import route
+from fastack.globals import request
+from fastack.subrequests import SubRequest, create_scope, dispatch
+
+active = []
+peak = []
+
+
+class ItemBody(BaseModel):
+    name: str
+
+
+class ItemController(Controller):
+    async def retrieve(self, id: int, user: str = Header("anonymous")) -> Response:
+        active.append(id)
+        peak.append(len(active))
+        await anyio.sleep(0.01)
+        active.remove(id)
+        return self.json("Item", {"id": id, "user": user, "path": request.url.path})
+
+    def post(self, body: ItemBody) -> Response:
+        return self.json("Created", body.dict(), status=201)
+
+
+class TextController(Controller):
+    def get(self, q: str = "") -> Response:
+        return PlainTextResponse(f"text {q}")
+
+    @route("/fail", action=True, methods=["GET"])
+    def fail(self) -> Response:
+        raise RuntimeError("boom")
+
+
+def test_batch_requests(make_client):
+    peak.clear()
+    client = make_client(
+        ItemController,
+        TextController,
+        BATCH_REQUESTS_PATH="/_batch",
+        BATCH_REQUESTS_CONCURRENCY=2,
+    )
+    resp = client.post(
+        "/_batch",
+        json=[
+            {"path": "/item/1"},
+            {"path": "/item/2", "headers": {"User": "bob"}},
+            {"path": "/item/3"},
+            {"method": "post", "path": "/item", "body": {"name": "new"}},
+            {"path": "/text?q=a%20b"},
+            {"path": "/item/x"},
+        ],
+        headers={"User": "alice"},
+    )
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    # each sub-request has its own request context
+    assert data[0]["body"]["data"] == {"id": 1, "user": "alice", "path": "/item/1"}
+    assert data[1]["body"]["data"] == {"id": 2, "user": "bob", "path": "/item/2"}
+    assert data[2]["status"] == 200
+    assert data[3]["status"] == 201
+    assert data[3]["body"]["data"] == {"name": "new"}
+    assert data[4]["body"] == "text a b"
+    assert data[4]["headers"]["content-type"].startswith("text/plain")
+    assert data[5]["status"] == 422
+    assert max(peak) == 2
+
+
+def test_batch_requests_errors(make_client):
+    client = make_client(
+        ItemController,
+        TextController,
+        BATCH_REQUESTS_PATH="/_batch",
+        BATCH_REQUESTS_MAX=2,
+    )
+    resp = client.post("/_batch", json=[{"path": "/item/1"}] * 3)
+    assert resp.status_code == 413
+
+    resp = client.post("/_batch", json=[{"path": "item/1"}])
+    assert resp.status_code == 422
+
+    resp = client.post("/_batch", json=[{"path": "/text/fail"}, {"path": "/_batch"}])
+    data = resp.json()["data"]
+    assert data[0]["status"] == 500
+    assert data[1]["status"] == 400
+
+    # the path is unquoted like the path of the sub-request
+    peak.clear()
+    nested = [{"path": "/item/1"}]
+    resp = client.post(
+        "/_batch", json=[{"method": "post", "path": "/%5Fbatch", "body": nested}]
+    )
+    assert resp.json()["data"][0]["status"] == 400
+    assert peak == []
+
+    # disabled by default
+    assert (
+        make_client(ItemController, TextController).post("/_batch").status_code == 404
+    )
+
+
+def test_nested_batch_scope(make_app):
+    app = make_app(ItemController, BATCH_REQUESTS_PATH="/_batch")
+    item = SubRequest(method="POST", path="/_batch", body=[{"path": "/item/1"}])
+    parent = {"type": "http", "headers": []}
+    scope = create_scope(parent, item, b"[]")
+    assert scope["fastack.subrequest"] is True
+
+    # a batch sent from a sub-request is rejected, whatever its path
+    peak.clear()
+    result = anyio.run(dispatch, app, parent, item)
+    assert result["status"] == 400
+    assert result["body"] == {"detail": "Nested batch requests are not allowed"}
+    assert peak == []
@@ -0,0 +1,101 @@
+from fastapi import Depends, Query, Response
+
+from fastack import Controller, ListController
+from fastack.decorators import route
+from tests.resources import timing
+
+
+def slow_dependency():
+    return sum(range(1000))
+
+
+class TimedController(ListController):
+    middlewares = [Depends(slow_dependency)]
+
+    async def retrieve(self, id: int) -> Response:
+        return self.json("Timed", {"id": id})
+
+    def list(
+        self, page: int = Query(1, gt=0), page_size: int = Query(10, gt=0)
+    ) -> Response:
+        data = [{"id": x} for x in range(100)]
+        return self.get_paginated_response(data, page, page_size)
+
+    @route("/actions/untimed", action=True, methods=["GET"], timing=False)
+    def untimed(self) -> Response:
+        return self.json("Untimed")
+
+
+class OptInController(Controller):
+    @route(timing=True)
+    def get(self) -> Response:
+        return self.json("Opt-in")
+
+    @route("/default", action=True, methods=["GET"])
+    def default(self) -> Response:
+        return self.json("Default")
+
+
+def parse_server_timing(value: str):
+    phases = {}
+    for item in value.split(", "):
+        name, _, dur = item.partition(";dur=")
+        phases[name] = float(dur)
+    return phases
+
+
+def test_server_timing(make_client):
+    client = make_client(
+        TimedController,
+        OptInController,
+        DEBUG=True,
+        SERVER_TIMING=True,
+        SERVER_TIMING_LISTENERS=["tests.resources.timing.collect"],
+    )
+    timing.records.clear()
+    resp = client.get("/timed/1")
+    assert resp.json() == {"detail": "Timed", "data": {"id": 1}}
+    phases = parse_server_timing(resp.headers["Server-Timing"])
+    assert list(phases) == [
+        "middleware",
+        "dependencies",
+        "handler",
+        "encode",
+        "render",
+        "total",
+    ]
+    assert all(value >= 0 for value in phases.values())
+    assert phases["total"] >= phases["handler"] + phases["encode"]
+
+    record = timing.records[-1]
+    assert record["name"] == "timed:retrieve"
+    assert record["status_code"] == 200
+    assert record["total"] >= record["send"]
+
+    resp = client.get("/timed", params={"page_size": 50})
+    assert resp.json()["total"] == 50
+    assert parse_server_timing(resp.headers["Server-Timing"])["encode"] > 0
+    assert timing.records[-1]["name"] == "timed:list"
+
+    resp = client.get("/timed/actions/untimed")
+    assert resp.status_code == 200
+    assert "Server-Timing" not in resp.headers
+    assert len(timing.records) == 2
+
+
+def test_server_timing_per_route(make_client):
+    client = make_client(TimedController, OptInController, DEBUG=True)
+    assert "Server-Timing" not in client.get("/timed/1").headers
+    assert "Server-Timing" not in client.get("/opt-in/default").headers
+    assert "Server-Timing" in client.get("/opt-in").headers
+
+
+def test_server_timing_without_header(make_client):
+    client = make_client(
+        TimedController,
+        OptInController,
+        DEBUG=True,
+        SERVER_TIMING=True,
+        SERVER_TIMING_HEADER=False,
+    )
+    assert "Server-Timing" not in client.get("/opt-in").headers